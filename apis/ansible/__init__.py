@@ -1,2 +1,9 @@
 # -*- coding: utf-8 -*-
-from apis.ansible.ansible import AdHoc
+from apis.utils.lazy import lazy_import
+
+_ATTRS = {
+    "AdHoc": "apis.ansible.ansible",
+}
+
+__all__ = list(_ATTRS)
+__getattr__, __dir__ = lazy_import(__name__, _ATTRS)
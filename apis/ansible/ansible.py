@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import json
+import threading
 
 from ansible import context
 from ansible.errors import AnsibleError
@@ -14,6 +15,12 @@ from pyrsistent import freeze
 
 from apis.utils import AttrDict
 
+# the loader, inventory and variable manager of an AdHoc are not thread
+# safe, its temporary files are cleaned up after every run and
+# context.CLIARGS is global to the process, so runs are serialized. Hosts
+# of one run are executed in parallel by the Ansible forks.
+_RUN_LOCK = threading.Lock()
+
 
 class ResultsCallback(CallbackBase):
     """
@@ -60,17 +67,40 @@ class AdHoc(object):
         return freeze(self.__inv_mgr.groups["topology"].hosts)
 
     def run(self, hosts, module_name, *args, **kwargs):
-        rc = ResultsCallback()
-        tqm = TaskQueueManager(
-            inventory=self.__inv_mgr,
-            variable_manager=self.__var_mgr,
-            loader=self.__loader,
-            passwords=self.__passwords,
-            stdout_callback=rc,
-        )
+        """
+        Runs module `module_name` on `hosts`, `forks` sets the number of
+        hosts run in parallel (the forks of ansible.cfg by default).
+
+        Returns:
+            An AttrDict of host name -> result.
+
+        Raises:
+            AnsibleError: if any host is unreachable.
+        """
+        rc = self.__execute(hosts, module_name, args, kwargs)
+        if rc.unreachable:
+            raise AnsibleError(
+                f"Host unreachable\n{json.dumps(rc.unreachable)}"
+            )
 
-        ori_cliargs = context.CLIARGS
-        tmp_cliargs = dict(ori_cliargs)
+        return rc.contacted
+
+    def run_each(self, hosts, module_name, *args, **kwargs):
+        """
+        Like run, but an unreachable host does not raise, its result has
+        `unreachable` set instead, e.g. to gather the facts of many hosts
+        by one run.
+        """
+        rc = self.__execute(hosts, module_name, args, kwargs)
+        results = AttrDict(rc.contacted)
+        for name, result in rc.unreachable.items():
+            results[name] = AttrDict(ok=False, failed=True, unreachable=True)
+            results[name].update(result)
+        return results
+
+    def __execute(self, hosts, module_name, args, kwargs):
+        forks = kwargs.pop("forks", None)
+        overrides = dict()
         for arg_name in (
             "connection",
             "user",
@@ -80,7 +110,7 @@ class AdHoc(object):
             "module_path",
         ):
             v = kwargs.pop(arg_name, None)
-            v and tmp_cliargs.update({arg_name: v})
+            v and overrides.update({arg_name: v})
         # Assemble module argument string
         if args:
             kwargs.update(dict(_raw_params=" ".join(args)))
@@ -94,23 +124,30 @@ class AdHoc(object):
             ]
         )
 
-        # Create play object, playbook objects use .load instead of init or new methods,
-        # this will also automatically create the task objects from the info provided in play_source
-        play = Play().load(play_source, variable_manager=self.__var_mgr, loader=self.__loader)
-        context.CLIARGS = ImmutableDict(tmp_cliargs)
-        # Actually run it
-        try:
-            tqm.run(play)  # most interesting data for a play is actually sent to the callback's methods
-        finally:
-            # Always need to cleanup child procs and the structures we use
-            # to communicate with them.
-            context.CLIARGS = ori_cliargs
-            tqm.cleanup()
-            self.__loader.cleanup_all_tmp_files()
-
-        if rc.unreachable:
-            raise AnsibleError(
-                f"Host unreachable\n{json.dumps(rc.unreachable)}"
+        rc = ResultsCallback()
+        with _RUN_LOCK:
+            # Create play object, playbook objects use .load instead of init or new methods,
+            # this will also automatically create the task objects from the info provided in play_source
+            play = Play().load(play_source, variable_manager=self.__var_mgr, loader=self.__loader)
+            tqm = TaskQueueManager(
+                inventory=self.__inv_mgr,
+                variable_manager=self.__var_mgr,
+                loader=self.__loader,
+                passwords=self.__passwords,
+                stdout_callback=rc,
+                forks=forks,
             )
-
-        return rc.contacted
+            ori_cliargs = context.CLIARGS
+            if overrides:
+                context.CLIARGS = ImmutableDict(dict(ori_cliargs, **overrides))
+            try:
+                # Actually run it
+                tqm.run(play)  # most interesting data for a play is actually sent to the callback's methods
+            finally:
+                context.CLIARGS = ori_cliargs
+                # Always need to cleanup child procs and the structures we use
+                # to communicate with them.
+                tqm.cleanup()
+                self.__loader.cleanup_all_tmp_files()
+
+        return rc
@@ -1,21 +1,19 @@
 # -*- coding: utf-8 -*-
 import json
 import logging
+import os
 import re
 from pathlib import Path
 
 import pytest
 import yaml
 from _pytest.monkeypatch import MonkeyPatch
-from ansible import constants
-from ansible import context
-from ansible.module_utils.common.collections import ImmutableDict
-from ansible.utils import display
-from scapy.all import Packet
-from scapy.utils import hexdump
-from snappi.snappi import OpenApiObject
 
-from apis.ansible import AdHoc
+from apis.utils.lazy import when_imported
+
+# NOTE: ansible, snappi and scapy are imported within the fixtures rather
+# than at plugin load, test sessions which do not use them (e.g. DUT shell
+# tests) do not pay for importing them.
 
 
 def _str_presenter(dumper, data):
@@ -34,6 +32,12 @@ yaml.add_representer(str, _str_presenter)
 
 @pytest.fixture(scope="session")
 def adhoc(request):
+    from ansible import context
+    from ansible.module_utils.common.collections import ImmutableDict
+    from ansible.utils import display
+
+    from apis.ansible import AdHoc
+
     # since the API is constructed for CLI it expects certain options to always
     # be set in the context object
     context.CLIARGS = ImmutableDict(
@@ -58,10 +62,31 @@ def adhoc(request):
 
 @pytest.fixture(scope="session", autouse=True)
 def monkeypatch_session():
+    from ansible import constants
+    from ansible.utils import display
+
     m = MonkeyPatch()
 
-    m.setattr(OpenApiObject, "__repr__", lambda self: self.serialize())
-    m.setattr(Packet, "__repr__", lambda self: f"\n{hexdump(self, dump=True)}")
+    # snappi and scapy are patched once imported (by the test modules or
+    # the lazy apis packages), if the tests use them
+    def _patch_snappi(module):
+        m.setattr(
+            module.OpenApiObject, "__repr__", lambda self: self.serialize()
+        )
+
+    def _patch_scapy(module):
+        from scapy.utils import hexdump
+
+        m.setattr(
+            module.Packet,
+            "__repr__",
+            lambda self: f"\n{hexdump(self, dump=True)}",
+        )
+
+    unhooks = [
+        when_imported("snappi.snappi", _patch_snappi),
+        when_imported("scapy.packet", _patch_scapy),
+    ]
 
     def _ansible_disply_verbose(self, msg, host=None, caplevel=2):
         if self.verbosity < caplevel:
@@ -144,12 +169,57 @@ def monkeypatch_session():
 
     yield m
 
+    for unhook in unhooks:
+        unhook()
     m.undo()
 
 
+@pytest.fixture(scope="session")
+def tg_lease():
+    """
+    Leases a port slice of the traffic generator session broker (see
+    apis.traffic_generator.pool) for the current pytest-xdist worker, the
+    broker is located by the `TG_POOL_ADDRESS` and `TG_POOL_AUTHKEY`
+    environment variables.
+    """
+    from apis.traffic_generator.pool import LeasedTrafficGenerator
+    from apis.traffic_generator.pool import worker_id
+
+    address = os.environ.get("TG_POOL_ADDRESS")
+    if not address:
+        pytest.skip("TG_POOL_ADDRESS is not set")
+
+    tg = LeasedTrafficGenerator(
+        address,
+        worker_id(),
+        os.environ.get("TG_POOL_AUTHKEY", "").encode(),
+    )
+    yield tg
+    tg.release()
+
+
 @pytest.fixture(scope="module", autouse=True)
 def init_tg(topo):
     if hasattr(topo, "tg"):
         topo.tg.clear_all()
         port_list = [p.name for p in topo.tg.config.ports]
         topo.tg.link_up_ports(*port_list)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def tg_api_calls(request, topo):
+    """Logs the number of traffic generator REST calls made by each test."""
+    if not hasattr(topo, "tg"):
+        yield
+        return
+
+    before = topo.tg.api_calls.copy()
+    yield
+    calls = topo.tg.api_calls - before
+    request.node.user_properties.append(
+        ("tg_rest_calls", sum(calls.values()))
+    )
+    logging.info(
+        f"traffic generator REST calls of {request.node.name}: "
+        f"{sum(calls.values())} {dict(calls)}"
+    )
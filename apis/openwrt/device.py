@@ -1,8 +1,40 @@
 # -*- coding: utf-8 -*-
+import functools
 import logging
+import shlex
 import subprocess
+import time
 
+from apis.openwrt import dvt as dvt_api
+from apis.openwrt import ssh
 from apis.openwrt.errors import OpenwrtError
+from apis.openwrt.facts import FactCache
+from apis.openwrt.facts import gather_facts
+from apis.openwrt.klog import KLOG_GRACE
+from apis.openwrt.klog import KernelLogTailer
+from apis.openwrt.netns import FramedShell
+from apis.openwrt.netns import ns_ssh_argv
+from apis.openwrt.transfer import FileTransfer
+from apis.openwrt.transfer import use_compression
+
+
+def _raw_error(name, result):
+    if result.get("unreachable"):
+        return OpenwrtError(f"{name} is unreachable: {result.get('msg')}")
+    return OpenwrtError(
+        f"Error occurred while execute raw commands on "
+        f"{name}\n"
+        f"return_code: {result.get('rc')}\n"
+        f"stderr: {result.get('stderr')}"
+    )
+
+
+def _raw_each(adhoc, forks, names, cmd):
+    results = adhoc.run_each(names, "raw", cmd, forks=forks or len(names))
+    return {
+        name: _raw_error(name, result) if result.failed else result.stdout
+        for name, result in results.items()
+    }
 
 
 class Dut(object):
@@ -25,6 +57,7 @@ class Dut(object):
         self.namespace_name = host.vars.get("namespace_name")
         self.remote_host = host.vars.get("remote_host")
         self.remote_user = host.vars.get("remote_user")
+        self.grpc_port = host.vars.get("grpc_port")
 
         self.__adhoc = adhoc
         self.__handler_chain = []
@@ -37,6 +70,23 @@ class Dut(object):
         self.__board_info = None
         self.__port_map = {}
         self.__chip_config = {}
+        self.__facts = FactCache(
+            self.name,
+            self.__raw,
+            ttl=host.vars.get("facts_ttl", 3600),
+            cache_dir=host.vars.get(
+                "facts_cache_dir", adhoc.group_vars.get("facts_cache_dir")
+            ),
+        )
+        self.__facts_loaded = None
+        self.__klog_enabled = host.vars.get("klog_stream", True)
+        # seconds Dut.shell waits for the kernel log of a command to arrive
+        self.klog_grace = host.vars.get("klog_grace", KLOG_GRACE)
+        self.ssh_port = host.vars.get("ansible_port", 22)
+        self.__klog = None
+        self.__ns_shell = None
+        self.__ssh = None
+        self.__transfer = None
 
         # handler = None
         # for h in handler_chain:
@@ -52,7 +102,89 @@ class Dut(object):
 
         #     handler = next_handler
 
+    @property
+    def klog(self):
+        """
+        The kernel log tailer of the DUT, it is started at the first access
+        and is None if it is disabled by `klog_stream: false` of the host
+        vars or could not be started. A tailer which died is restarted.
+        """
+        if self.__klog is not None and not self.__klog.alive:
+            logging.warning(
+                f"{self.name}: the kernel log tailer died, restarting it"
+            )
+            self.__klog.stop()
+            self.__klog = None
+
+        if self.__klog is None and self.__klog_enabled:
+            tailer = KernelLogTailer(
+                self.ipaddr,
+                self.username,
+                self.password,
+                port=self.ssh_port,
+            )
+            try:
+                tailer.start()
+            except Exception as e:
+                logging.warning(
+                    f"{self.name}: failed to follow the kernel log, "
+                    f"falling back to dmesg -c: {e}"
+                )
+                self.__klog_enabled = False
+                return None
+            self.__klog = tailer
+
+        return self.__klog
+
+    def close(self):
+        """Stops the kernel log tailer and closes the DVT channel."""
+        if self.__klog is not None:
+            self.__klog.stop()
+            self.__klog = None
+        if self.__grpc_stub is not None:
+            self.__grpc_stub.close()
+            self.__grpc_stub = None
+        if self.__ns_shell is not None:
+            self.__ns_shell.close()
+            self.__ns_shell = None
+        if self.__ssh is not None:
+            self.__ssh.close()
+            self.__ssh = self.__transfer = None
+
     def shell(self, cmd, **kwargs):
+        """
+        Executes `cmd` on the DUT.
+
+        Returns:
+            A tuple of (stdout, kernel log during the command), the kernel
+            log is sliced from the kernel log tailer, or bracketed by
+            `dmesg -c` if the tailer is not available. The slice waits up
+            to `klog_grace` seconds of the host vars for late lines.
+        """
+        klog = self.klog
+        if klog is None or not klog.alive:
+            return self.__shell_dmesg(cmd, **kwargs)
+
+        start = time.time()
+        result = self.__adhoc.run([self.name], "raw", cmd, **kwargs)
+        kernel_log = "\n".join(
+            klog.lines(start, time.time(), grace=self.klog_grace)
+        )
+
+        if result[self.name].failed:
+            raise OpenwrtError(
+                f"Error occurred while execute shell commands on "
+                f"{self.name}\n"
+                f"command: {cmd}\n"
+                f"return_code: {result[self.name].rc}\n"
+                f"stdout: {result[self.name].stdout}\n"
+                f"stderr: {result[self.name].stderr}\n"
+                f"kernel_log: {kernel_log}"
+            )
+
+        return result[self.name].stdout.strip(), kernel_log.strip()
+
+    def __shell_dmesg(self, cmd, **kwargs):
         clear_log_result = self.__adhoc.run([self.name], "raw", "dmesg -c", **kwargs)
         if clear_log_result[self.name].failed:
             print(f"Failed to clear kernel log: {clear_log_result[self.name].stderr}")
@@ -75,6 +207,189 @@ class Dut(object):
 
         return result[self.name].stdout.strip(), kernel_log.strip()
 
+    @property
+    def ssh(self):
+        """A persistent paramiko.SSHClient of the DUT."""
+        transport = self.__ssh and self.__ssh.get_transport()
+        if transport is None or not transport.is_active():
+            self.__ssh = ssh.connect(
+                self.ipaddr,
+                self.username,
+                self.password,
+                port=self.ssh_port,
+            )
+            self.__transfer = None
+        return self.__ssh
+
+    @property
+    def transfer(self):
+        """
+        The FileTransfer of the DUT, tar streams are gzipped if the DUT has
+        more than one CPU.
+        """
+        client = self.ssh
+        if self.__transfer is None:
+            try:
+                cpus = self.resources.get("cpus")
+            except Exception as e:
+                logging.warning(f"{self.name}: unknown CPU count: {e}")
+                cpus = None
+            self.__transfer = FileTransfer(
+                client, compress=use_compression(cpus)
+            )
+        return self.__transfer
+
+    def put_files(self, paths, dest, compress=None):
+        """
+        Copies local files/directories to remote directory `dest` by one
+        tar stream, see FileTransfer.put.
+        """
+        self.transfer.put(paths, dest, compress)
+
+    def get_files(self, paths, dest, compress=None):
+        """
+        Copies remote files/directories to local directory `dest` by one
+        tar stream, see FileTransfer.get.
+        """
+        return self.transfer.get(paths, dest, compress)
+
+    def put_script(self, script, name="script.sh"):
+        """
+        Copies a script to the DUT unless it is cached there already, see
+        FileTransfer.put_script.
+
+        Returns:
+            The remote path of the script.
+        """
+        return self.transfer.put_script(script, name)
+
+    def run_script(self, script, *args, name="script.sh", **kwargs):
+        """Runs a (cached) script by Dut.shell, see put_script."""
+        path = self.put_script(script, name)
+        argv = ["sh", path, *map(str, args)]
+        return self.shell(" ".join(map(shlex.quote, argv)), **kwargs)
+
+    def __raw(self, cmd):
+        result = self.__adhoc.run([self.name], "raw", cmd)[self.name]
+        if result.failed:
+            raise _raw_error(self.name, result)
+        return result.stdout
+
+    def init(self):
+        """
+        Checks the connectivity, gathers the facts and starts the kernel log
+        tailer of the DUT, see apis.openwrt.topology.init_duts for many
+        DUTs.
+        """
+        self.facts
+        self.klog
+
+    @staticmethod
+    def gather_facts(duts, forks=None):
+        """
+        Gathers the facts of `duts` missing in memory by one Ansible run per
+        command for all of them, the hosts of a run are executed in
+        parallel by `forks` processes (one per DUT if None).
+
+        Returns:
+            A dict of DUT name -> exception of the DUTs which failed.
+        """
+        groups = dict()
+        for dut in duts:
+            groups.setdefault(dut.__adhoc, list()).append(dut)
+
+        errors = dict()
+        for group in groups.values():
+            run = functools.partial(_raw_each, group[0].__adhoc, forks)
+            errors.update(gather_facts([d.__facts for d in group], run))
+        return errors
+
+    @property
+    def facts(self):
+        """
+        The facts of the DUT gathered by one batched command, they are
+        cached for `facts_ttl` seconds of the host vars and persisted to
+        `facts_cache_dir` if it is set, see apis.openwrt.facts.
+        """
+        if self.__port_status_changed:
+            self.invalidate_facts()
+
+        facts = self.__facts.get()
+        if facts is not self.__facts_loaded:
+            self.__facts_loaded = facts
+            self.__info = facts.release
+            self.__board_info = facts.board
+            self.__ports = facts.ports
+            self.__resources = facts.resources
+            self.__port_map = facts.links
+        return facts
+
+    def invalidate_facts(self, persisted=False):
+        """
+        Drops the cached facts, e.g. after reboot or port changes, see
+        FactCache.invalidate for `persisted`.
+        """
+        self.__facts.invalidate(persisted)
+        self.__port_status_changed = False
+
+    @property
+    def port_status_changed(self):
+        """Set it after changing ports, the facts are gathered again."""
+        return self.__port_status_changed
+
+    @port_status_changed.setter
+    def port_status_changed(self, changed):
+        self.__port_status_changed = changed
+
+    @property
+    def info(self):
+        """The variables of /etc/openwrt_release."""
+        self.facts
+        return self.__info
+
+    @property
+    def board_info(self):
+        """The output of `ubus call system board`."""
+        self.facts
+        return self.__board_info
+
+    @property
+    def ports(self):
+        """The role -> device names of /etc/board.json."""
+        self.facts
+        return self.__ports
+
+    @property
+    def resources(self):
+        """CPUs, memory, load and uptime, as of the last fact gathering."""
+        self.facts
+        return self.__resources
+
+    @property
+    def port_map(self):
+        """The interface name -> mac and operstate."""
+        self.facts
+        return self.__port_map
+
+    @property
+    def dvt(self):
+        """The DVT client of the DUT, it shares one channel per DUT."""
+        if self.__grpc_stub is None:
+            if not self.grpc_port:
+                raise OpenwrtError(f"{self.name}: grpc_port is not configured")
+            self.__grpc_stub = dvt_api.DvtClient(
+                f"{self.ipaddr}:{self.grpc_port}"
+            )
+        return self.__grpc_stub
+
+    def dvt_shell(self, *cmds, **kwargs):
+        """
+        Executes chip-level DVT commands over gRPC instead of SSH, commands
+        are pipelined and their outputs are returned in order.
+        """
+        results = self.dvt.process_many(cmds, **kwargs)
+        return [r.output.strip() for r in results]
+
     def exec_cmd(self, cmd):
         """Helper method to execute a command and return the output."""
         try:
@@ -84,12 +399,44 @@ class Dut(object):
             logging.error(f"Command failed: {self.name}: {cmd}\nError: {e.stderr.strip()}")
             raise OpenwrtError(f"Command execution failed: {e.stderr.strip()}")
 
+    def shell_ns(self, cmd, timeout=None, check=True):
+        """
+        Executes `cmd` on `remote_host` through SSH inside the local network
+        namespace `namespace_name`. The SSH session is persistent, so only
+        the first command pays sudo, netns entry and the SSH handshake.
+
+        Returns:
+            A tuple of (stdout, kernel log during the command).
+
+        Raises:
+            OpenwrtError: if the command fails and `check` is set.
+            TimeoutError: if the command does not finish in `timeout`.
+        """
+        if self.__ns_shell is None:
+            self.__ns_shell = FramedShell(
+                ns_ssh_argv(
+                    self.namespace_name, self.remote_user, self.remote_host
+                )
+            )
+
+        result = self.__ns_shell.run(cmd, timeout=timeout)
+        if check and result.rc != 0:
+            raise OpenwrtError(
+                f"Error occurred while execute shell commands on "
+                f"{self.remote_host} in namespace {self.namespace_name}\n"
+                f"command: {cmd}\n"
+                f"return_code: {result.rc}\n"
+                f"stdout: {result.stdout}\n"
+                f"stderr: {result.stderr}\n"
+                f"kernel_log: {result.kernel_log}"
+            )
+
+        return result.stdout.strip(), result.kernel_log.strip()
+
     def shell_local_ns(self, cmd, **kwargs):
-        """Execute a command in a local network namespace via SSH."""
-        # Clear the kernel log
-        clear_log_cmd = f"sudo ip netns exec {self.namespace_name} ssh -o StrictHostKeyChecking=no -o HostKeyAlgorithms=+ssh-rsa {self.remote_user}@{self.remote_host} 'dmesg -c'"
-        self.exec_cmd(clear_log_cmd)
-
-        # Execute the provided command
-        command_to_run = f"sudo ip netns exec {self.namespace_name} ssh -o StrictHostKeyChecking=no -o HostKeyAlgorithms=+ssh-rsa {self.remote_user}@{self.remote_host} '{cmd};dmesg -c'"
-        return self.exec_cmd(command_to_run)
+        """
+        Execute a command in a local network namespace via SSH, returns the
+        output followed by the kernel log, see shell_ns.
+        """
+        stdout, kernel_log = self.shell_ns(cmd, check=False, **kwargs)
+        return "\n".join(filter(None, (stdout, kernel_log)))
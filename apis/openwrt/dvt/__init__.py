@@ -1,4 +1,14 @@
 # -*- coding: utf-8 -*-
-from apis.sonic.dvt.dvt_pb2 import ClingResetParams
-from apis.sonic.dvt.dvt_pb2 import CmdMsg
-from apis.sonic.dvt.dvt_pb2_grpc import DVTStub
+from apis.utils.lazy import lazy_import
+
+_ATTRS = {
+    "AsyncDvtClient": "apis.openwrt.dvt.client",
+    "DvtClient": "apis.openwrt.dvt.client",
+    "DvtResult": "apis.openwrt.dvt.client",
+    "ClingResetParams": "apis.openwrt.dvt.dvt_pb2",
+    "CmdMsg": "apis.openwrt.dvt.dvt_pb2",
+    "DVTStub": "apis.openwrt.dvt.dvt_pb2_grpc",
+}
+
+__all__ = list(_ATTRS)
+__getattr__, __dir__ = lazy_import(__name__, _ATTRS)
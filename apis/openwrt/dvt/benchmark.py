@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Client side load benchmark of the DVT service against LocalDVTServicer.
+
+Usage:
+
+    pipenv run python -m apis.openwrt.dvt.benchmark [requests] [latency_ms]
+
+Every pattern reports RPCs/sec and the p50/p99 latency of a request (for
+the batched pattern, the latency of a whole batch):
+
+    unary: DvtClient.process one request at a time
+    concurrent: all requests in flight at once on a raw stub
+    batched: DvtClient.process_batch with `window` requests in flight
+    aio: `window` coroutines calling AsyncDvtClient.process of one client
+"""
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+from apis.openwrt.dvt.client import AsyncDvtClient
+from apis.openwrt.dvt.client import DvtClient
+from apis.openwrt.dvt.client import acquire_channel
+from apis.openwrt.dvt.client import release_channel
+from apis.openwrt.dvt.dvt_pb2 import CmdMsg
+from apis.openwrt.dvt.dvt_pb2_grpc import DVTStub
+from apis.openwrt.dvt.server import LocalDVTServicer
+from apis.openwrt.dvt.server import serve
+
+
+def _report(name, count, elapsed, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return dict(
+        name=name,
+        requests=count,
+        rps=count / elapsed,
+        p50_ms=statistics.median(latencies) * 1000,
+        p99_ms=p99 * 1000,
+    )
+
+
+def bench_unary(target, count):
+    client = DvtClient(target)
+    latencies = list()
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        client.process(f"cmd {i}")
+        latencies.append(time.perf_counter() - t)
+    client.close()
+
+    return _report("unary", count, time.perf_counter() - start, latencies)
+
+
+def bench_concurrent(target, count):
+    stub = DVTStub(acquire_channel(target))
+    latencies = list()
+    done = threading.Semaphore(0)
+
+    def _on_done(t):
+        def _callback(future):
+            latencies.append(time.perf_counter() - t)
+            done.release()
+
+        return _callback
+
+    start = time.perf_counter()
+    for i in range(count):
+        future = stub.process.future(CmdMsg(command=f"cmd {i}"))
+        future.add_done_callback(_on_done(time.perf_counter()))
+    for _ in range(count):
+        done.acquire()
+    release_channel(target)
+
+    return _report("concurrent", count, time.perf_counter() - start, latencies)
+
+
+def bench_batched(target, count, batch_size=256, window=64):
+    client = DvtClient(target)
+    cmds = [f"cmd {i}" for i in range(count)]
+    latencies = list()
+    start = time.perf_counter()
+    for i in range(0, count, batch_size):
+        t = time.perf_counter()
+        client.process_batch(cmds[i:i + batch_size], window=window)
+        latencies.append(time.perf_counter() - t)
+    client.close()
+
+    return _report(
+        f"batched(window={window})",
+        count,
+        time.perf_counter() - start,
+        latencies,
+    )
+
+
+def bench_async(target, count, window=64):
+    latencies = list()
+
+    async def _run():
+        async with AsyncDvtClient(target) as client:
+            semaphore = asyncio.Semaphore(window)
+
+            async def _one(i):
+                async with semaphore:
+                    t = time.perf_counter()
+                    await client.process(f"cmd {i}")
+                    latencies.append(time.perf_counter() - t)
+
+            await asyncio.gather(*(_one(i) for i in range(count)))
+
+    start = time.perf_counter()
+    asyncio.run(_run())
+
+    return _report(
+        f"aio(window={window})",
+        count,
+        time.perf_counter() - start,
+        latencies,
+    )
+
+
+def run(count=2000, latency=0):
+    server, target = serve(LocalDVTServicer(latency=latency), max_workers=64)
+    try:
+        return [
+            bench_unary(target, count),
+            bench_concurrent(target, count),
+            bench_batched(target, count),
+            bench_async(target, count),
+        ]
+    finally:
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0
+    print(f"{'pattern':<20}{'rps':>12}{'p50(ms)':>12}{'p99(ms)':>12}")
+    for r in run(count, latency):
+        print(
+            f"{r['name']:<20}{r['rps']:>12.1f}"
+            f"{r['p50_ms']:>12.3f}{r['p99_ms']:>12.3f}"
+        )
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextlib
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import grpc
+
+from apis.openwrt.dvt.dvt_pb2 import CmdMsg
+from apis.openwrt.dvt.dvt_pb2 import PROCESS_FAILURE
+from apis.openwrt.dvt.dvt_pb2 import PROCESS_MORE_INPUT
+from apis.openwrt.dvt.dvt_pb2 import RET_VLAUE_TYPE_FLOAT
+from apis.openwrt.dvt.dvt_pb2 import RET_VLAUE_TYPE_STRING
+from apis.openwrt.dvt.dvt_pb2 import RET_VLAUE_TYPE_UINT
+from apis.openwrt.dvt.dvt_pb2_grpc import DVTStub
+from apis.openwrt.errors import OpenwrtError
+
+
+# keepalive pings keep idle channels (and the NAT/conntrack entries in front
+# of the DUT) alive between test steps, the backoff settings make the
+# channel reconnect quickly after the DUT reboots.
+CHANNEL_OPTIONS = (
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 200),
+    ("grpc.min_reconnect_backoff_ms", 200),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+)
+
+# target -> [channel, number of clients holding it]
+_CHANNELS = dict()
+_CHANNELS_LOCK = threading.Lock()
+
+
+def acquire_channel(target):
+    """
+    Returns the long-lived channel of `target`, a channel is created at the
+    first call and shared by every client of the same target afterwards.
+    Every acquire_channel must be paired with a release_channel.
+    """
+    with _CHANNELS_LOCK:
+        entry = _CHANNELS.get(target)
+        if entry is None:
+            entry = _CHANNELS[target] = [
+                grpc.insecure_channel(target, options=CHANNEL_OPTIONS),
+                0,
+            ]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_channel(target):
+    """Closes the channel of `target` once no client holds it."""
+    with _CHANNELS_LOCK:
+        entry = _CHANNELS.get(target)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del _CHANNELS[target]
+    entry[0].close()
+
+
+@dataclass
+class DvtResult:
+    """
+    The decoded ResultValue of a DVT command, `value` is typed according to
+    ResultValue.type.
+    """
+
+    cmd: str
+    status: int
+    valid: bool
+    value: object
+    output: str
+
+    @property
+    def ok(self):
+        return self.status != PROCESS_FAILURE
+
+
+def decode_result(cmd, result):
+    if result.type == RET_VLAUE_TYPE_STRING:
+        value = result.output
+    elif result.type == RET_VLAUE_TYPE_FLOAT:
+        try:
+            value = float(result.output)
+        except ValueError:
+            value = None
+    elif result.type == RET_VLAUE_TYPE_UINT:
+        value = result.ret_int & 0xFFFFFFFF
+    else:
+        value = result.ret_int
+
+    return DvtResult(
+        cmd=cmd,
+        status=result.status,
+        valid=result.isValid,
+        value=value,
+        output=result.output,
+    )
+
+
+def _split_lines(cmd):
+    return cmd.splitlines() or [cmd]
+
+
+def _check_result(target, cmd, result):
+    if result.status == PROCESS_FAILURE:
+        raise OpenwrtError(
+            f"Error occurred while execute DVT command on {target}\n"
+            f"command: {cmd}\n"
+            f"output: {result.output}\n"
+            f"ret_int: {result.ret_int}"
+        )
+    return result
+
+
+class _InputGate(object):
+    """
+    Single lines are sent concurrently (shared), the lines of a multi-line
+    block are sent exclusively, so no other line reaches the service
+    between them. A shared hold lasts until the answer of the line, and a
+    waiting block stops new lines from starting.
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition()
+        self.__shared = 0
+        self.__exclusive = False
+        self.__waiting = 0
+
+    def acquire_shared(self):
+        with self.__cond:
+            while self.__exclusive or self.__waiting:
+                self.__cond.wait()
+            self.__shared += 1
+
+    def release_shared(self, *args):
+        with self.__cond:
+            self.__shared -= 1
+            if not self.__shared:
+                self.__cond.notify_all()
+
+    @contextlib.contextmanager
+    def shared(self):
+        self.acquire_shared()
+        try:
+            yield
+        finally:
+            self.release_shared()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self.__cond:
+            self.__waiting += 1
+            try:
+                while self.__exclusive or self.__shared:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__exclusive = True
+        try:
+            yield
+        finally:
+            with self.__cond:
+                self.__exclusive = False
+                self.__cond.notify_all()
+
+
+class _AsyncInputGate(object):
+    """The asyncio version of _InputGate."""
+
+    def __init__(self):
+        self.__cond = asyncio.Condition()
+        self.__shared = 0
+        self.__exclusive = False
+        self.__waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def shared(self):
+        async with self.__cond:
+            await self.__cond.wait_for(
+                lambda: not (self.__exclusive or self.__waiting)
+            )
+            self.__shared += 1
+        try:
+            yield
+        finally:
+            async with self.__cond:
+                self.__shared -= 1
+                self.__cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self):
+        async with self.__cond:
+            self.__waiting += 1
+            try:
+                await self.__cond.wait_for(
+                    lambda: not (self.__exclusive or self.__shared)
+                )
+            finally:
+                self.__waiting -= 1
+            self.__exclusive = True
+        try:
+            yield
+        finally:
+            async with self.__cond:
+                self.__exclusive = False
+                self.__cond.notify_all()
+
+
+class DvtClient(object):
+    """
+    A synchronous client of the DVT service, clients of the same target
+    share one channel, which is acquired at the first request and released
+    by `close`.
+
+    Args:
+        target: The "host:port" of the DVT service.
+        timeout: Default deadline (in seconds) of each RPC.
+
+    Typical usage example:
+
+    client = DvtClient("192.168.1.1:50051")
+    result = client.execute("port show 1")
+    results = client.process_batch(["port show 1", "port show 2"])
+    client.close()
+    """
+
+    def __init__(self, target, timeout=30):
+        self.target = target
+        self.timeout = timeout
+        self.__stub = None
+        self.__stub_lock = threading.Lock()
+        # continuation lines must reach the server back to back, single
+        # lines of concurrent callers overlap
+        self.__gate = _InputGate()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.target})"
+
+    def __get_stub(self):
+        with self.__stub_lock:
+            if self.__stub is None:
+                self.__stub = DVTStub(acquire_channel(self.target))
+            return self.__stub
+
+    def __process(self, cmd, timeout):
+        return self.__get_stub().process(
+            CmdMsg(command=cmd),
+            timeout=timeout or self.timeout,
+            wait_for_ready=True,
+        )
+
+    def process(self, cmd, timeout=None):
+        """
+        Sends a single line to the DVT service, returns ResultValue. Calls
+        of concurrent threads are in flight at the same time.
+        """
+        with self.__gate.shared():
+            return self.__process(cmd, timeout)
+
+    def execute(self, cmd, timeout=None):
+        """
+        Executes a (multi-line) command. Lines are sent one by one while the
+        service answers `PROCESS_MORE_INPUT`, an empty line is sent to close
+        the block if the last line still expects more input.
+
+        Returns:
+            The ResultValue of the last line.
+
+        Raises:
+            OpenwrtError: An error occurred if the service answers
+                `PROCESS_FAILURE` or the block is never completed.
+        """
+        return _check_result(self.target, cmd, self.__execute(cmd, timeout))
+
+    def __execute(self, cmd, timeout):
+        with self.__gate.exclusive():
+            for line in _split_lines(cmd):
+                result = self.__process(line, timeout)
+                if result.status == PROCESS_FAILURE:
+                    break
+            if result.status == PROCESS_MORE_INPUT:
+                result = self.__process("", timeout)
+            if result.status == PROCESS_MORE_INPUT:
+                raise OpenwrtError(
+                    f"DVT command is not completed on {self.target}\n"
+                    f"command: {cmd}"
+                )
+        return result
+
+    def process_many(self, cmds, window=32, check=True, timeout=None):
+        """Pipelines commands over the shared channel, see process_batch."""
+        return self.process_batch(
+            cmds, window=window, check=check, timeout=timeout
+        )
+
+    def process_batch(self, cmds, window=32, check=True, timeout=None):
+        """
+        Submits commands with at most `window` requests in flight, which
+        hides the round trip of each command without flooding the DVT
+        service. A multi-line command waits for the requests in flight and
+        is executed in place through `execute`, so the commands reach the
+        service in the order of `cmds`.
+
+        Args:
+            cmds: An iterable of commands.
+            window: The maximum number of in-flight requests.
+            check: Raise OpenwrtError on the first `PROCESS_FAILURE` result.
+            timeout: The deadline (in seconds) of each request.
+
+        Returns:
+            A list of DvtResult in the order of `cmds`.
+        """
+        results = list()
+        inflight = deque()
+
+        def _collect():
+            cmd, future = inflight.popleft()
+            result = future.result()
+            if check:
+                _check_result(self.target, cmd, result)
+            results.append(decode_result(cmd, result))
+
+        stub = self.__get_stub()
+        try:
+            for cmd in cmds:
+                if len(_split_lines(cmd)) > 1:
+                    while inflight:
+                        _collect()
+                    result = self.__execute(cmd, timeout)
+                    if check:
+                        _check_result(self.target, cmd, result)
+                    results.append(decode_result(cmd, result))
+                    continue
+
+                if len(inflight) >= window:
+                    _collect()
+                # the hold of a line ends with its answer
+                self.__gate.acquire_shared()
+                try:
+                    future = stub.process.future(
+                        CmdMsg(command=cmd),
+                        timeout=timeout or self.timeout,
+                        wait_for_ready=True,
+                    )
+                except BaseException:
+                    self.__gate.release_shared()
+                    raise
+                future.add_done_callback(self.__gate.release_shared)
+                inflight.append((cmd, future))
+            while inflight:
+                _collect()
+        finally:
+            for _, future in inflight:
+                future.cancel()
+
+        return results
+
+    def apply_config(self, cmd, timeout=None):
+        return _check_result(
+            self.target,
+            cmd,
+            self.__get_stub().apply_config(
+                CmdMsg(command=cmd),
+                timeout=timeout or self.timeout,
+                wait_for_ready=True,
+            ),
+        )
+
+    def close(self):
+        """Releases the shared channel, the next request acquires it again."""
+        with self.__stub_lock:
+            if self.__stub is None:
+                return
+            self.__stub = None
+        release_channel(self.target)
+
+
+class AsyncDvtClient(object):
+    """
+    The `grpc.aio` variant of DvtClient. A channel of grpc.aio is bound to
+    the running event loop, so each client owns its channel.
+
+    Typical usage example:
+
+    async with AsyncDvtClient("192.168.1.1:50051") as client:
+        results = await client.process_batch(cmds, window=64)
+    """
+
+    def __init__(self, target, timeout=30):
+        self.target = target
+        self.timeout = timeout
+        self.__channel = None
+        self.__stub = None
+        self.__gate = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.target})"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __get_stub(self):
+        if self.__stub is None:
+            self.__channel = grpc.aio.insecure_channel(
+                self.target, options=CHANNEL_OPTIONS
+            )
+            self.__stub = DVTStub(self.__channel)
+            self.__gate = _AsyncInputGate()
+        return self.__stub
+
+    async def __process(self, stub, cmd, timeout):
+        return await stub.process(
+            CmdMsg(command=cmd),
+            timeout=timeout or self.timeout,
+            wait_for_ready=True,
+        )
+
+    async def process(self, cmd, timeout=None):
+        stub = self.__get_stub()
+        async with self.__gate.shared():
+            return await self.__process(stub, cmd, timeout)
+
+    async def __execute(self, stub, cmd, timeout):
+        async with self.__gate.exclusive():
+            for line in _split_lines(cmd):
+                result = await self.__process(stub, line, timeout)
+                if result.status == PROCESS_FAILURE:
+                    break
+            if result.status == PROCESS_MORE_INPUT:
+                result = await self.__process(stub, "", timeout)
+        if result.status == PROCESS_MORE_INPUT:
+            raise OpenwrtError(
+                f"DVT command is not completed on {self.target}\n"
+                f"command: {cmd}"
+            )
+        return result
+
+    async def execute(self, cmd, timeout=None):
+        stub = self.__get_stub()
+        result = await self.__execute(stub, cmd, timeout)
+        return _check_result(self.target, cmd, result)
+
+    async def process_many(self, cmds, window=32, check=True, timeout=None):
+        """The coroutine version of DvtClient.process_many."""
+        return await self.process_batch(
+            cmds, window=window, check=check, timeout=timeout
+        )
+
+    async def process_batch(self, cmds, window=32, check=True, timeout=None):
+        """The coroutine version of DvtClient.process_batch."""
+        stub = self.__get_stub()
+        semaphore = asyncio.Semaphore(window)
+        results = list()
+        inflight = list()
+
+        async def _one(cmd):
+            try:
+                async with self.__gate.shared():
+                    return await self.__process(stub, cmd, timeout)
+            finally:
+                semaphore.release()
+
+        async def _collect():
+            for cmd, result in zip(
+                [c for c, _ in inflight],
+                await asyncio.gather(*(t for _, t in inflight)),
+            ):
+                if check:
+                    _check_result(self.target, cmd, result)
+                results.append(decode_result(cmd, result))
+            inflight.clear()
+
+        try:
+            for cmd in cmds:
+                if len(_split_lines(cmd)) > 1:
+                    await _collect()
+                    result = await self.__execute(stub, cmd, timeout)
+                    if check:
+                        _check_result(self.target, cmd, result)
+                    results.append(decode_result(cmd, result))
+                    continue
+
+                await semaphore.acquire()
+                inflight.append((cmd, asyncio.ensure_future(_one(cmd))))
+            await _collect()
+        finally:
+            for _, task in inflight:
+                task.cancel()
+
+        return results
+
+    async def close(self):
+        if self.__channel is not None:
+            await self.__channel.close()
+        self.__channel = None
+        self.__stub = None
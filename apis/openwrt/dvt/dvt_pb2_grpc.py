@@ -3,7 +3,7 @@
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
 
-import apis.sonic.dvt.dvt_pb2 as dvt__pb2
+import apis.openwrt.dvt.dvt_pb2 as dvt__pb2
 
 
 class DVTStub(object):
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent import futures
+
+import grpc
+
+from apis.openwrt.dvt.dvt_pb2 import PROCESS_FAILURE
+from apis.openwrt.dvt.dvt_pb2 import PROCESS_SUCCESS
+from apis.openwrt.dvt.dvt_pb2 import ResultValue
+from apis.openwrt.dvt.dvt_pb2 import RET_VLAUE_TYPE_INT
+from apis.openwrt.dvt.dvt_pb2 import RET_VLAUE_TYPE_STRING
+from apis.openwrt.dvt.dvt_pb2_grpc import add_DVTServicer_to_server
+from apis.openwrt.dvt.dvt_pb2_grpc import DVTServicer
+
+
+def _echo(cmd):
+    return ResultValue(
+        status=PROCESS_SUCCESS,
+        type=RET_VLAUE_TYPE_STRING,
+        isValid=True,
+        output=cmd,
+    )
+
+
+def _to_result(value):
+    if isinstance(value, ResultValue):
+        return value
+    if isinstance(value, bool) or value is None:
+        return ResultValue(
+            status=PROCESS_FAILURE if value is False else PROCESS_SUCCESS,
+            isValid=True,
+        )
+    if isinstance(value, int):
+        return ResultValue(
+            status=PROCESS_SUCCESS,
+            type=RET_VLAUE_TYPE_INT,
+            isValid=True,
+            ret_int=value,
+        )
+    return ResultValue(
+        status=PROCESS_SUCCESS,
+        type=RET_VLAUE_TYPE_STRING,
+        isValid=True,
+        output=str(value),
+    )
+
+
+class LocalDVTServicer(DVTServicer):
+    """
+    An in-process stand-in of the DVT service. It is meant for measuring the
+    client side overhead without hardware.
+
+    Args:
+        responder: A callable takes the command and returns the response,
+            echo the command by default.
+        script: A dict of scripted responses, keys are exact commands or
+            compiled regular expressions, values are ResultValue/str/int/bool
+            or a list of them which are answered in turn (the last one
+            repeats).
+        latency: Seconds of latency injected to every request.
+        jitter: Seconds of uniformly distributed extra latency.
+
+    Typical usage example:
+
+    servicer = LocalDVTServicer(
+        script={
+            "port show 1": "link up",
+            re.compile(r"^reg read"): 0x1234,
+            "init": ["busy", "done"],
+        },
+        latency=0.002,
+    )
+    """
+
+    def __init__(self, responder=None, script=None, latency=0, jitter=0):
+        self.responder = responder or _echo
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = Counter()
+        self.__exact = dict()
+        self.__patterns = list()
+        self.__lock = threading.Lock()
+
+        for key, value in (script or dict()).items():
+            answers = list(value) if isinstance(value, list) else [value]
+            if isinstance(key, re.Pattern):
+                self.__patterns.append((key, answers))
+            else:
+                self.__exact[key] = answers
+
+    def __respond(self, cmd):
+        with self.__lock:
+            self.calls[cmd] += 1
+            answers = self.__exact.get(cmd)
+            if answers is None:
+                answers = next(
+                    (a for p, a in self.__patterns if p.search(cmd)), None
+                )
+            if answers is not None:
+                answer = answers.pop(0) if len(answers) > 1 else answers[0]
+
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if answers is None:
+            return self.responder(cmd)
+        return _to_result(answer)
+
+    def process(self, request, context):
+        return self.__respond(request.command)
+
+    def apply_config(self, request, context):
+        return self.__respond(request.command)
+
+    def cling_reset(self, request, context):
+        return ResultValue(status=PROCESS_SUCCESS, isValid=True)
+
+
+def serve(servicer=None, address="127.0.0.1:0", max_workers=16):
+    """
+    Starts a DVT server in the current process.
+
+    Returns:
+        A tuple of (grpc.Server, target), call `server.stop(None)` to
+        shut it down.
+    """
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    add_DVTServicer_to_server(servicer or LocalDVTServicer(), server)
+    port = server.add_insecure_port(address)
+    server.start()
+
+    return server, f"{address.rsplit(':', 1)[0]}:{port}"
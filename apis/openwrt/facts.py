@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+from apis.utils import AttrDict
+from apis.utils import TTLCache
+
+# every section is printed after a marker line, so all facts are gathered
+# by one command in one round trip
+_MARKER = "@@mspsuck@@"
+FACT_COMMANDS = {
+    "board": "ubus call system board",
+    "board_json": "cat /etc/board.json",
+    "system": "ubus call system info",
+    "release": "cat /etc/openwrt_release",
+    "cpus": "grep -c ^processor /proc/cpuinfo",
+    "boot_id": "cat /proc/sys/kernel/random/boot_id",
+    "links": (
+        "for i in /sys/class/net/*; do "
+        'echo "${i##*/} $(cat $i/address) $(cat $i/operstate)"; done'
+    ),
+}
+# facts which change without a firmware upgrade (load, uptime, link
+# states, boot id), they are not persisted but gathered again by the probe
+VOLATILE_FACTS = ("system", "boot_id", "links")
+# the firmware revision, a cheap check of persisted facts
+PROBE_COMMAND = ". /etc/openwrt_release; echo $DISTRIB_REVISION"
+
+_RELEASE_RE = re.compile(r"^(\w+)=['\"]?(.*?)['\"]?$")
+
+
+def facts_command(names=None):
+    """
+    Returns the command printing the FACT_COMMANDS sections of `names`, all
+    of them if None.
+    """
+    return "; ".join(
+        f"echo '{_MARKER}{name}'; {FACT_COMMANDS[name]} 2>/dev/null"
+        for name in (FACT_COMMANDS if names is None else names)
+    )
+
+
+def probe_command():
+    """
+    Returns the command printing the firmware revision and the
+    VOLATILE_FACTS sections, the rest is read from persisted facts.
+    """
+    return f"echo '{_MARKER}revision'; {PROBE_COMMAND}; " + facts_command(
+        VOLATILE_FACTS
+    )
+
+
+def _split_sections(output):
+    sections = dict()
+    name = None
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            name = line[len(_MARKER):].strip()
+            sections[name] = list()
+        elif name is not None:
+            sections[name].append(line)
+    return {k: "\n".join(v).strip() for k, v in sections.items()}
+
+
+def _json(text):
+    try:
+        return json.loads(text, object_hook=AttrDict) if text else AttrDict()
+    except ValueError:
+        return AttrDict()
+
+
+def parse_ports(board):
+    """
+    Returns the role -> device names of /etc/board.json, e.g.
+    {"lan": ["lan1", "lan2"], "wan": ["wan"]}.
+    """
+    ports = AttrDict()
+    for role, conf in board.get("network", dict()).items():
+        if "ports" in conf:
+            ports[role] = list(conf["ports"])
+        elif "device" in conf:
+            ports[role] = [conf["device"]]
+        elif "ifname" in conf:
+            ports[role] = conf["ifname"].split()
+    return ports
+
+
+def parse_facts(output):
+    """
+    Parses the output of facts_command.
+
+    Returns:
+        An AttrDict of
+            board: the output of `ubus call system board`
+            ports: role -> device names, see parse_ports
+            release: the variables of /etc/openwrt_release
+            resources: cpus, memory, load, uptime and root of
+                `ubus call system info`
+            links: interface name -> AttrDict(mac, operstate)
+            boot_id: changes at every boot
+            revision: the firmware revision (DISTRIB_REVISION)
+    """
+    return _parse_sections(_split_sections(output))
+
+
+def _parse_sections(sections):
+    release = AttrDict()
+    for line in sections.get("release", "").splitlines():
+        match = _RELEASE_RE.match(line.strip())
+        if match:
+            release[match.group(1)] = match.group(2)
+
+    links = AttrDict()
+    for line in sections.get("links", "").splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            links[fields[0]] = AttrDict(mac=fields[1], operstate=fields[2])
+
+    resources = _json(sections.get("system"))
+    cpus = sections.get("cpus", "")
+    resources["cpus"] = int(cpus) if cpus.isdigit() else None
+
+    return AttrDict(
+        board=_json(sections.get("board")),
+        ports=parse_ports(_json(sections.get("board_json"))),
+        release=release,
+        resources=resources,
+        links=links,
+        boot_id=sections.get("boot_id", ""),
+        revision=release.get("DISTRIB_REVISION", ""),
+    )
+
+
+class FactCache(object):
+    """
+    Facts of a DUT gathered by one batched command, they are cached for
+    `ttl` seconds and optionally persisted to `cache_dir` between sessions.
+
+    Persisted facts are stored per host along with the firmware revision,
+    so they are read back after a cheap probe of the revision instead of
+    gathering all facts again, and are replaced after a firmware upgrade.
+    The VOLATILE_FACTS are not persisted, the probe gathers them along with
+    the revision.
+
+    Args:
+        name: The host name.
+        run: A function of shell command -> stdout on the DUT.
+        ttl: Seconds the facts are valid, in memory and on disk.
+        cache_dir: The directory of persisted facts, None to disable.
+    """
+
+    def __init__(self, name, run, ttl=3600, cache_dir=None):
+        self.name = name
+        self.__run = run
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.__cache = TTLCache(ttl)
+
+    def get(self):
+        """Returns the facts, they are gathered if missing or expired."""
+        return self.__cache.get_or_set("facts", self.__load)
+
+    def invalidate(self, persisted=False):
+        """
+        Drops the facts in memory, e.g. after reboot or port changes, the
+        persisted facts are still valid for the same firmware revision and
+        are only dropped if `persisted`.
+        """
+        self.__cache.invalidate()
+        if persisted and self.cache_dir is not None:
+            self.__path().unlink(missing_ok=True)
+
+    def __path(self):
+        return self.cache_dir / f"{self.name}.json"
+
+    @property
+    def loaded(self):
+        """Whether the facts are in memory and not expired."""
+        return "facts" in self.__cache
+
+    def restore(self, output):
+        """
+        Loads the facts persisted for the firmware revision of `output`
+        (the output of probe_command) if they are not expired, with the
+        VOLATILE_FACTS of `output`.
+
+        Returns:
+            The facts, None if they are not persisted.
+        """
+        if self.cache_dir is None:
+            return None
+
+        probed = _split_sections(output)
+        path = self.__path()
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if entry["revision"] != probed.pop("revision", ""):
+                return None
+            if time.time() - entry["fetched_at"] >= self.ttl:
+                return None
+            sections = dict(entry["sections"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        logging.debug(f"{self.name}: facts loaded from {path}")
+        sections.update(probed)
+        facts = _parse_sections(sections)
+        self.__cache.set("facts", facts)
+        return facts
+
+    def update(self, output):
+        """Sets the facts to the output of facts_command and persists them."""
+        sections = _split_sections(output)
+        facts = _parse_sections(sections)
+        if self.cache_dir is not None:
+            self.__save(facts.revision, sections)
+        self.__cache.set("facts", facts)
+        return facts
+
+    def __load(self):
+        if self.cache_dir is not None:
+            facts = self.restore(self.__run(probe_command()))
+            if facts is not None:
+                return facts
+        return self.update(self.__run(facts_command()))
+
+    def __save(self, revision, sections):
+        path = self.__path()
+        sections = {
+            k: v for k, v in sections.items() if k not in VOLATILE_FACTS
+        }
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(
+                    dict(
+                        fetched_at=time.time(),
+                        revision=revision,
+                        sections=sections,
+                    ),
+                    f,
+                )
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"{self.name}: failed to persist facts: {e}")
+
+
+def gather_facts(caches, run):
+    """
+    Loads the facts of many DUTs by one call of `run` per command for all
+    of them, the facts in memory are kept.
+
+    Args:
+        caches: A list of FactCache.
+        run: A function of (host names, shell command) -> a dict of host
+            name -> stdout, or the exception of the host if it failed.
+
+    Returns:
+        A dict of host name -> exception of the DUTs which failed.
+    """
+    errors = dict()
+
+    def _run(cmd, pending):
+        outputs = run([c.name for c in pending], cmd)
+        for cache in pending:
+            output = outputs.get(cache.name)
+            if output is None:
+                output = KeyError(f"{cache.name}: no output")
+            if isinstance(output, Exception):
+                errors[cache.name] = output
+            else:
+                yield cache, output
+
+    pending = [c for c in caches if not c.loaded]
+    stale = [c for c in pending if c.cache_dir is None]
+    probed = [c for c in pending if c.cache_dir is not None]
+    if probed:
+        for cache, output in _run(probe_command(), probed):
+            if cache.restore(output) is None:
+                stale.append(cache)
+    if stale:
+        for cache, output in _run(facts_command(), stale):
+            cache.update(output)
+    return errors
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import deque
+
+from apis.openwrt import ssh
+
+# follows the kernel log, busybox dmesg has no -w so the kernel messages of
+# logd are followed instead
+KLOG_COMMAND = "dmesg -w 2>/dev/null || logread -f -e kernel"
+# seconds to wait for the kernel log of a command by default, the lines a
+# command triggers reach the tailer a few milliseconds after the command
+# returned, a quiet log waits the whole grace as no later line shows the
+# tail is up to date
+KLOG_GRACE = 0.2
+
+
+class KernelLogTailer(object):
+    """
+    Follows the kernel log of a DUT over one persistent SSH channel, lines
+    are timestamped when they are received and kept in a bounded buffer, so
+    the kernel log of a command is sliced by time without extra round trips
+    and without clearing the ring buffer of the DUT.
+
+    Args:
+        host: The address of the DUT.
+        username, password: SSH credentials.
+        port: SSH port.
+        maxlen: Max number of lines kept in the buffer.
+        command: The command following the kernel log.
+
+    Typical usage example:
+
+    tailer = KernelLogTailer("192.168.1.1", "root", "")
+    tailer.start()
+    start = time.time()
+    ...
+    tailer.lines(start, time.time())
+    """
+
+    def __init__(
+        self,
+        host,
+        username,
+        password=None,
+        port=22,
+        maxlen=10000,
+        command=KLOG_COMMAND,
+        timeout=10,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.command = command
+        self.timeout = timeout
+        self.__buffer = deque(maxlen=maxlen)
+        self.__lock = threading.Lock()
+        self.__received = threading.Condition(self.__lock)
+        self.__received_at = 0.0
+        self.__client = None
+        self.__channel = None
+        self.__thread = None
+
+    @property
+    def alive(self):
+        return (
+            self.__thread is not None
+            and self.__thread.is_alive()
+            and not self.__channel.exit_status_ready()
+        )
+
+    def start(self, backlog_quiet=0.3, backlog_timeout=1.0):
+        """
+        Connects and starts following, the backlog printed by the command
+        at start is dropped once the channel is quiet for `backlog_quiet`
+        seconds, or after `backlog_timeout` seconds if the log is busy.
+        """
+        client = ssh.connect(
+            self.host,
+            self.username,
+            self.password,
+            port=self.port,
+            timeout=self.timeout,
+        )
+        channel = client.get_transport().open_session()
+        channel.exec_command(self.command)
+
+        self.__client, self.__channel = client, channel
+        self.__received_at = time.time()
+        self.__thread = threading.Thread(
+            target=self.__read, name=f"klog-{self.host}", daemon=True
+        )
+        self.__thread.start()
+
+        deadline = time.monotonic() + backlog_timeout
+        while time.monotonic() < deadline:
+            quiet = time.time() - self.__received_at
+            if quiet >= backlog_quiet:
+                break
+            time.sleep(backlog_quiet - quiet)
+
+        with self.__lock:
+            self.__buffer.clear()
+
+    def stop(self):
+        if self.__client is not None:
+            self.__client.close()
+        if self.__thread is not None:
+            self.__thread.join(self.timeout)
+        self.__client = self.__channel = self.__thread = None
+
+    def __read(self):
+        pending = b""
+        try:
+            while True:
+                data = self.__channel.recv(65536)
+                if not data:
+                    break
+                now = time.time()
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                with self.__lock:
+                    self.__received_at = now
+                    self.__buffer.extend(
+                        (now, line.decode(errors="replace").rstrip("\r"))
+                        for line in lines
+                    )
+                    self.__received.notify_all()
+        except Exception as e:
+            logging.warning(f"{self.host}: kernel log tailer stopped: {e}")
+        finally:
+            with self.__lock:
+                self.__received.notify_all()
+
+    def lines(self, start, end=None, grace=0.0):
+        """
+        Returns the lines received between `start` and `end` (time.time()
+        values). Lines are received a bit later than they are logged, with
+        `grace` the call waits up to `grace` seconds until a line received
+        after `end` shows the tail has reached it, and includes the lines
+        received in the wait.
+        """
+        if end is None:
+            end = time.time()
+        until = end + grace
+
+        with self.__received:
+            while self.__received_at <= end:
+                remaining = until - time.time()
+                if remaining <= 0 or not self.alive:
+                    break
+                self.__received.wait(remaining)
+
+            upper = min(until, max(end, self.__received_at))
+            return [line for t, line in self.__buffer if start <= t <= upper]
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import logging
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+
+from apis.openwrt.errors import OpenwrtError
+from apis.utils import AttrDict
+
+SSH_OPTIONS = (
+    "-o",
+    "StrictHostKeyChecking=no",
+    "-o",
+    "HostKeyAlgorithms=+ssh-rsa",
+    "-o",
+    "ServerAliveInterval=30",
+)
+
+# `_mspsuck_klog` prints the kernel log after the mark of the previous call
+# (the line count and the last line, the lines after its old position or
+# after its last occurrence if the ring buffer wrapped) and marks the end
+# of it, so dmesg runs once per command and the ring buffer is not cleared.
+# It marks the start when the shell starts, the lines logged between two
+# commands are printed with the later one.
+_SETUP = """_mspsuck_klog() {
+    dmesg 2>/dev/null | awk -v n="$_mspsuck_n" -v k="$_mspsuck_last" \\
+        -v mark=/tmp/.mspsuck_klog.$$ '{ l[NR] = $0 } $0 == k { m = NR }
+        END {
+            if (l[n] == k) m = n
+            for (i = m + 1; i <= NR; i++) print l[i]
+            print NR > mark; print l[NR] > mark
+        }'
+    { read -r _mspsuck_n; IFS= read -r _mspsuck_last; } </tmp/.mspsuck_klog.$$
+    rm -f /tmp/.mspsuck_klog.$$
+}
+_mspsuck_klog >/dev/null
+"""
+# the stderr of a command is kept in a file of the remote shell, so stdout,
+# stderr and kernel log are framed separately on one stream
+_FRAME = """{{ {cmd}
+}} </dev/null 2>/tmp/.mspsuck_err.$$
+printf '\\n{id} rc %d\\n' $?
+cat /tmp/.mspsuck_err.$$; rm -f /tmp/.mspsuck_err.$$
+printf '\\n{id} err\\n'
+_mspsuck_klog
+printf '\\n{id} klog\\n'
+"""
+
+
+def ns_ssh_argv(namespace, user, host, options=SSH_OPTIONS):
+    """The argv of a remote shell over SSH inside network `namespace`."""
+    return [
+        "sudo",
+        "ip",
+        "netns",
+        "exec",
+        namespace,
+        "ssh",
+        "-T",
+        *options,
+        f"{user}@{host}",
+        "sh",
+    ]
+
+
+class FramedShell(object):
+    """
+    A persistent shell process, every command is written to its stdin and
+    framed by unique markers, so commands reuse one sudo, netns entry and
+    SSH handshake instead of paying them per command.
+
+    Commands are serialized, a command that times out kills the process and
+    the next command starts a new one.
+
+    Args:
+        argv: The argv of the shell process, see ns_ssh_argv.
+        timeout: Default seconds to wait for a command.
+
+    Typical usage example:
+
+    shell = FramedShell(ns_ssh_argv("ns1", "root", "192.168.1.1"))
+    result = shell.run("ifconfig br-lan", timeout=10)
+    result.rc, result.stdout, result.stderr, result.kernel_log
+    """
+
+    def __init__(self, argv, timeout=30):
+        self.argv = list(argv)
+        self.timeout = timeout
+        self.__proc = None
+        self.__buffer = bytearray()
+        self.__stderr = deque(maxlen=20)
+        self.__readers = list()
+        self.__cond = threading.Condition()
+        self.__lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.__proc is not None and self.__proc.poll() is None
+
+    def __start(self):
+        self.__proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        # every process gets its own buffers, so late output of a killed
+        # process can not leak into the frames of the next one
+        self.__buffer = bytearray()
+        self.__stderr = deque(maxlen=20)
+        self.__readers = [
+            threading.Thread(target=target, args=args, daemon=True)
+            for target, args in (
+                (self.__read_stdout, (self.__proc.stdout, self.__buffer)),
+                (self.__read_stderr, (self.__proc.stderr, self.__stderr)),
+            )
+        ]
+        for reader in self.__readers:
+            reader.start()
+
+    def __read_stdout(self, pipe, buffer):
+        while True:
+            # unbuffered, returns as soon as any output is available
+            data = pipe.read(65536)
+            with self.__cond:
+                if data:
+                    buffer.extend(data)
+                self.__cond.notify_all()
+            if not data:
+                return
+
+    @staticmethod
+    def __read_stderr(pipe, stderr):
+        for line in pipe:
+            stderr.append(line.decode(errors="replace").rstrip())
+
+    def close(self):
+        with self.__lock:
+            self.__kill()
+
+    def __kill(self, force=False):
+        if self.__proc is None:
+            return
+        proc, self.__proc = self.__proc, None
+        readers, self.__readers = self.__readers, list()
+        try:
+            proc.stdin.close()
+            proc.wait(0 if force else 1)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+        # the pipes may be held open by children of the process (e.g. ssh
+        # under sudo), a reader still blocked only writes to its own buffer
+        for reader in readers:
+            reader.join(1)
+
+    def run(self, cmd, timeout=None):
+        """
+        Runs `cmd` in the shell.
+
+        Returns:
+            An AttrDict of rc, stdout, stderr and kernel_log (the kernel log
+            printed while the command ran).
+
+        Raises:
+            TimeoutError: if the command does not finish in `timeout`
+                seconds, the shell process is killed.
+            OpenwrtError: if the shell process exits.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self.__lock:
+            frame_id = uuid.uuid4().hex
+            end = f"\n{frame_id} klog\n".encode()
+            script = _FRAME.format(cmd=cmd, id=frame_id)
+            if not self.alive:
+                self.__kill()
+                self.__start()
+                script = _SETUP + script
+            try:
+                self.__proc.stdin.write(script.encode())
+            except OSError as e:
+                self.__kill()
+                raise OpenwrtError(f"shell {self.argv} is gone: {e}")
+
+            frame = self.__wait(end, time.monotonic() + timeout)
+            if frame is None:
+                # the readers take the condition, the process is killed
+                # after it is released
+                exited = self.__proc.poll() is not None
+                self.__kill(force=not exited)
+                if exited:
+                    stderr = "\n".join(self.__stderr)
+                    raise OpenwrtError(
+                        f"shell {self.argv} exited while running "
+                        f"{cmd}\nstderr: {stderr}"
+                    )
+                raise TimeoutError(f"{cmd} did not finish in {timeout}s")
+
+        return self.__parse(frame.decode(errors="replace"), frame_id)
+
+    def __wait(self, end, deadline):
+        # returns the output until `end`, None if the process exited or
+        # `deadline` passed
+        with self.__cond:
+            while True:
+                pos = self.__buffer.find(end)
+                if pos >= 0:
+                    frame = bytes(self.__buffer[:pos])
+                    del self.__buffer[: pos + len(end)]
+                    return frame
+                if self.__proc.poll() is not None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.__cond.wait(min(remaining, 0.5))
+
+    @staticmethod
+    def __parse(frame, frame_id):
+        stdout, _, rest = frame.partition(f"\n{frame_id} rc ")
+        rc, _, rest = rest.partition("\n")
+        stderr, _, kernel_log = rest.partition(f"\n{frame_id} err\n")
+        return AttrDict(
+            rc=int(rc),
+            stdout=stdout,
+            stderr=stderr,
+            kernel_log=kernel_log,
+        )
+
+    def __del__(self):
+        try:
+            self.__kill()
+        except Exception as e:
+            logging.debug(f"failed to stop shell {self.argv}: {e}")
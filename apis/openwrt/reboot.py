@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Reboots DUTs in parallel and times their boot phases by asyncio probes,
+every probe is sent at a fixed interval without waiting for the previous
+one, so a DUT dropping packets does not stretch the resolution to the
+probe timeout.
+"""
+import asyncio
+import logging
+import socket
+import struct
+import time
+
+from apis.openwrt import ssh
+from apis.openwrt.errors import OpenwrtError
+from apis.utils import AttrDict
+
+BOOT_ID_COMMAND = "cat /proc/sys/kernel/random/boot_id"
+
+
+class Milestone(object):
+    """
+    A readiness check of a DUT after its SSH port is up.
+
+    Args:
+        name: Name of the milestone in the report.
+        port: A TCP port which accepts connections when ready.
+        cmd: A command which exits with 0 when ready, used if `port` is
+            None.
+    """
+
+    def __init__(self, name, port=None, cmd=None):
+        if (port is None) == (cmd is None):
+            raise ValueError(f"{name}: either port or cmd is required")
+        self.name = name
+        self.port = port
+        self.cmd = cmd
+
+
+DEFAULT_MILESTONES = (
+    Milestone("ubus", cmd="ubus call system board >/dev/null"),
+    Milestone(
+        "lan",
+        cmd="ubus call network.interface.lan status "
+        "| grep -q '\"up\": true'",
+    ),
+)
+
+
+async def _tcp_probe(host, port, timeout):
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    # the socket is released before the next probe is opened
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        pass
+    return True
+
+
+def _icmp_echo(seq):
+    header = struct.pack("!BBHHH", 8, 0, 0, 0, seq)
+    payload = b"mspsuck-reboot"
+    data = header + payload
+    if len(data) % 2:
+        data += b"\0"
+    csum = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    csum = (csum >> 16) + (csum & 0xFFFF)
+    csum = ~(csum + (csum >> 16)) & 0xFFFF
+    return header[:2] + struct.pack("!H", csum) + header[4:] + payload
+
+
+async def _icmp_probe(host, seq, timeout):
+    # an unprivileged ping socket, see net.ipv4.ping_group_range
+    sock = socket.socket(
+        socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP
+    )
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.sock_connect(sock, (host, 0))
+        await loop.sock_sendall(sock, _icmp_echo(seq))
+        deadline = loop.time() + timeout
+        while True:
+            reply = await asyncio.wait_for(
+                loop.sock_recv(sock, 1024), deadline - loop.time()
+            )
+            if reply[0] == 0 and struct.unpack("!H", reply[6:8])[0] == seq:
+                return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        sock.close()
+
+
+async def _watch(probe, interval, deadline, down=True):
+    """
+    Sends `probe` every `interval` seconds until `deadline`.
+
+    Returns:
+        The monotonic time the first probe failing was sent, and the time
+        the first probe succeeding after it was sent, or only the latter
+        if not `down`. None if not observed before `deadline`.
+    """
+    sent = list()
+    went_down = None if down else -1.0
+    try:
+        while time.monotonic() < deadline:
+            sent.append((time.monotonic(), asyncio.ensure_future(probe())))
+            # results are taken in the order the probes were sent
+            while sent and sent[0][1].done():
+                at, task = sent.pop(0)
+                if not task.result():
+                    if went_down is None:
+                        went_down = at
+                elif went_down is not None:
+                    return (went_down, at) if down else at
+            await asyncio.sleep(interval)
+    finally:
+        for _, task in sent:
+            task.cancel()
+
+    return (went_down, None) if down else None
+
+
+class _Reboot(object):
+    def __init__(self, dut, milestones, command, interval, probe_timeout):
+        self.dut = dut
+        self.milestones = list(milestones)
+        if dut.grpc_port and all(m.name != "dvt" for m in self.milestones):
+            self.milestones.append(Milestone("dvt", port=dut.grpc_port))
+        self.command = command
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.ssh_port = dut.ssh_port
+        self.timeline = AttrDict(
+            name=dut.name,
+            down=None,
+            icmp_up=None,
+            ssh_up=None,
+            milestones={m.name: None for m in self.milestones},
+            rebooted=None,
+            error=None,
+        )
+        self.__seq = 0
+
+    def __trigger(self):
+        client = self.dut.ssh
+        boot_id = ssh.run(client, BOOT_ID_COMMAND, timeout=10).stdout.strip()
+        channel = client.get_transport().open_session()
+        # the connection dies with the DUT, so the exit is not waited for
+        channel.exec_command(self.command)
+        return boot_id, time.monotonic()
+
+    async def run(self, timeout, icmp):
+        try:
+            await self.__run(timeout, icmp)
+        except Exception as e:
+            self.timeline.error = f"{type(e).__name__}: {e}"
+        finally:
+            # the facts, kernel log tailer and SSH connections of the old
+            # boot are stale, they are dropped off the event loop as
+            # closing may block
+            await asyncio.to_thread(self.dut.close)
+            await asyncio.to_thread(self.dut.invalidate_facts)
+        return self.timeline
+
+    async def __run(self, timeout, icmp):
+        boot_id, t0 = await asyncio.to_thread(self.__trigger)
+        deadline = t0 + timeout
+        host = self.dut.ipaddr
+
+        def since(at):
+            return None if at is None else at - t0
+
+        # pings come back before SSH, they must not hold the milestones
+        pings = None
+        if icmp:
+            pings = asyncio.ensure_future(
+                _watch(
+                    lambda: _icmp_probe(host, self.__next_seq(), 1.0),
+                    self.interval,
+                    deadline,
+                )
+            )
+        try:
+            down, ssh_up = await _watch(
+                lambda: _tcp_probe(host, self.ssh_port, self.probe_timeout),
+                self.interval,
+                deadline,
+            )
+            self.timeline.down = since(down)
+            self.timeline.ssh_up = since(ssh_up)
+            if ssh_up is None:
+                raise OpenwrtError(
+                    f"SSH did not {'come back' if down else 'go down'} "
+                    f"in {timeout}s"
+                )
+            await self.__milestones(boot_id, deadline, since)
+            if pings is not None and pings.done():
+                self.timeline.icmp_up = since(pings.result()[1])
+        finally:
+            if pings is not None and not pings.done():
+                pings.cancel()
+
+        milestones = self.timeline.milestones
+        missed = [m for m, at in milestones.items() if at is None]
+        if missed:
+            raise OpenwrtError(
+                f"milestones {', '.join(missed)} not reached in {timeout}s"
+            )
+        if not self.timeline.rebooted:
+            raise OpenwrtError(f"boot id {boot_id} did not change")
+
+    async def __milestones(self, boot_id, deadline, since):
+        client = await asyncio.to_thread(self.__connect, deadline)
+        try:
+            reached = await asyncio.gather(
+                *(
+                    self.__milestone(m, client, deadline)
+                    for m in self.milestones
+                )
+            )
+            for m, at in zip(self.milestones, reached):
+                self.timeline.milestones[m.name] = since(at)
+
+            result = await asyncio.to_thread(
+                ssh.run, client, BOOT_ID_COMMAND, timeout=10
+            )
+            self.timeline.rebooted = result.stdout.strip() != boot_id
+        finally:
+            client.close()
+
+    def __next_seq(self):
+        self.__seq = (self.__seq + 1) & 0xFFFF
+        return self.__seq
+
+    def __connect(self, deadline):
+        # the port accepts connections a bit before sshd can serve them
+        while True:
+            try:
+                return ssh.connect(
+                    self.dut.ipaddr,
+                    self.dut.username,
+                    self.dut.password,
+                    port=self.ssh_port,
+                    timeout=max(1, self.probe_timeout),
+                )
+            except Exception:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(self.interval)
+
+    async def __milestone(self, milestone, client, deadline):
+        if milestone.port is not None:
+            return await _watch(
+                lambda: _tcp_probe(
+                    self.dut.ipaddr, milestone.port, self.probe_timeout
+                ),
+                self.interval,
+                deadline,
+                down=False,
+            )
+
+        # commands are polled one at a time, they are heavier than probes
+        while time.monotonic() < deadline:
+            at = time.monotonic()
+            try:
+                result = await asyncio.to_thread(
+                    ssh.run, client, milestone.cmd, timeout=10
+                )
+                if result.rc == 0:
+                    return at
+            except Exception as e:
+                logging.debug(f"{self.dut.name}: {milestone.name}: {e}")
+            await asyncio.sleep(self.interval)
+        return None
+
+
+def reboot_duts(
+    duts,
+    milestones=DEFAULT_MILESTONES,
+    command="reboot",
+    timeout=300,
+    interval=0.05,
+    probe_timeout=0.5,
+    icmp=False,
+):
+    """
+    Reboots DUTs at once and times their boot phases, the times are
+    seconds since the reboot command was sent:
+
+    - down: the SSH port stops accepting connections
+    - icmp_up: the DUT answers pings again, if `icmp`
+    - ssh_up: the SSH port accepts connections again
+    - milestones: each Milestone is reached, a "dvt" milestone of the DVT
+      gRPC port is added for DUTs with a `grpc_port`
+
+    Args:
+        duts: A list of Dut objects.
+        milestones: A list of Milestone checked after SSH is up.
+        command: The reboot command.
+        timeout: Seconds for a DUT to reach all milestones.
+        interval: Seconds between probes.
+        probe_timeout: Seconds to wait for a TCP probe.
+        icmp: Probes by ICMP echo too, it needs ping sockets to be allowed
+            for the group of the user (net.ipv4.ping_group_range).
+
+    Returns:
+        A list of AttrDict(name, down, icmp_up, ssh_up, milestones,
+        rebooted, error) in the order of `duts`, `rebooted` is whether the
+        boot id changed.
+
+    Raises:
+        OpenwrtError: if any DUT failed, the report is in the `report`
+            attribute of the exception.
+
+    Typical usage example:
+
+    report = reboot_duts([topo.dut1, topo.dut2], icmp=True)
+    report[0].ssh_up, report[0].milestones["lan"]
+    """
+    if icmp and not _ping_socket_allowed():
+        logging.warning(
+            "ICMP probes are disabled, ping sockets are not allowed for "
+            "the user, see net.ipv4.ping_group_range"
+        )
+        icmp = False
+
+    async def _run():
+        return await asyncio.gather(
+            *(
+                _Reboot(d, milestones, command, interval, probe_timeout).run(
+                    timeout, icmp
+                )
+                for d in duts
+            )
+        )
+
+    report = asyncio.run(_run())
+    log_report(report)
+
+    failed = [r for r in report if r.error]
+    if failed:
+        error = OpenwrtError(
+            "Failed to reboot "
+            + ", ".join(f"{r.name} ({r.error})" for r in failed)
+        )
+        error.report = report
+        raise error
+
+    return report
+
+
+def _ping_socket_allowed():
+    try:
+        socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP
+        ).close()
+    except PermissionError:
+        return False
+    return True
+
+
+def log_report(report):
+    """Logs the boot phase timings of reboot_duts."""
+    names = sorted({m for r in report for m in r.milestones})
+    columns = ["down", "icmp_up", "ssh_up", *names]
+    lines = ["host".ljust(24) + "".join(f"{c:>10}" for c in columns)]
+    for r in report:
+        values = [r.down, r.icmp_up, r.ssh_up]
+        values += [r.milestones.get(m) for m in names]
+        lines.append(
+            f"{r.name:<24}"
+            + "".join(
+                f"{'-':>10}" if v is None else f"{v:>10.2f}" for v in values
+            )
+            + f"  {r.error or ('rebooted' if r.rebooted else 'not rebooted')}"
+        )
+    logging.info("reboot timings\n" + "\n".join(lines))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from apis.utils import AttrDict
+
+
+def connect(host, username, password=None, port=22, timeout=10):
+    """
+    Returns a connected paramiko.SSHClient, every exec/transfer opens a
+    channel on its transport instead of a new connection.
+    """
+    # paramiko takes ~0.2s to import, it is only needed once a DUT is
+    # connected
+    import paramiko
+
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(
+        host,
+        port=port,
+        username=username,
+        password=password,
+        timeout=timeout,
+        look_for_keys=password is None,
+        allow_agent=password is None,
+    )
+    client.get_transport().set_keepalive(30)
+    return client
+
+
+def run(client, cmd, stdin=None, timeout=None):
+    """
+    Runs `cmd` on a new channel of `client`, `stdin` is bytes written to
+    the command.
+
+    Returns:
+        An AttrDict of rc, stdout and stderr.
+    """
+    channel = client.get_transport().open_session(timeout=timeout)
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(cmd)
+        if stdin:
+            channel.sendall(stdin)
+        channel.shutdown_write()
+
+        stdout = channel.makefile("rb").read()
+        stderr = channel.makefile_stderr("rb").read()
+        return AttrDict(
+            rc=channel.recv_exit_status(),
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+        )
+    finally:
+        channel.close()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from concurrent.futures import ALL_COMPLETED
+from concurrent.futures import FIRST_EXCEPTION
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from apis.openwrt.device import Dut
+from apis.openwrt.errors import OpenwrtError
+from apis.utils import AttrDict
+
+
+def _init(dut, facts_seconds):
+    # the facts are in memory already, only the kernel log tailer starts
+    start = time.monotonic()
+    dut.init()
+    return facts_seconds + time.monotonic() - start
+
+
+def _error(e):
+    return f"{type(e).__name__}: " + str(e).strip().splitlines()[0]
+
+
+def init_duts(duts, timeout=120, max_workers=None, fail_fast=False):
+    """
+    Initializes DUTs (see Dut.init) in parallel, so a test bed is ready in
+    the time of its slowest DUT instead of the sum of all DUTs.
+
+    The facts of all DUTs are gathered first by one Ansible run per command
+    (see Dut.gather_facts), Ansible executes the hosts in parallel forks
+    and is bounded by its own connection timeout. The kernel log tailers
+    are then started on a thread pool.
+
+    Args:
+        duts: A list of Dut objects.
+        timeout: Seconds to wait for the kernel log tailers, a DUT still
+            initializing after `timeout` is reported as timed out.
+        max_workers: Number of DUTs initialized at once, all of them if
+            None.
+        fail_fast: Stops at the first failure.
+
+    Returns:
+        A list of AttrDict(name, seconds, error) in the order of `duts`,
+        `error` is None if the DUT is ready.
+
+    Raises:
+        OpenwrtError: if any DUT failed or timed out, the report is in the
+            `report` attribute of the exception.
+    """
+    duts = list(duts)
+    report = [AttrDict(name=d.name, seconds=None, error=None) for d in duts]
+    if not duts:
+        return report
+
+    start = time.monotonic()
+    errors = Dut.gather_facts(duts, forks=max_workers)
+    facts_seconds = time.monotonic() - start
+    for row in report:
+        if row.name in errors:
+            row.error = _error(errors[row.name])
+
+    futures = dict()
+    if not (errors and fail_fast):
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(duts), thread_name_prefix="topo"
+        )
+        futures = {
+            d.name: executor.submit(_init, d, facts_seconds)
+            for d in duts
+            if d.name not in errors
+        }
+        wait(
+            futures.values(),
+            timeout,
+            FIRST_EXCEPTION if fail_fast else ALL_COMPLETED,
+        )
+        # a hung DUT must not block the session, its thread is left behind
+        executor.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.monotonic() - start
+
+    for row in report:
+        future = futures.get(row.name)
+        if row.error:
+            continue
+        if future is None:
+            row.error = "skipped after a failure"
+        elif future.cancelled():
+            row.error = f"not started within {timeout}s"
+        elif not future.done():
+            row.error = f"timed out after {timeout}s"
+        elif future.exception() is not None:
+            row.error = _error(future.exception())
+        else:
+            row.seconds = future.result()
+
+    log_report(report, elapsed)
+
+    failed = [r for r in report if r.error]
+    if failed:
+        error = OpenwrtError(
+            "Failed to set up "
+            + ", ".join(f"{r.name} ({r.error})" for r in failed)
+        )
+        error.report = report
+        raise error
+
+    return report
+
+
+def log_report(report, elapsed):
+    """Logs the timing report of init_duts."""
+    lines = [f"{'host':<24}{'seconds':>10}  status"]
+    for r in sorted(report, key=lambda r: -(r.seconds or float("inf"))):
+        seconds = "-" if r.seconds is None else f"{r.seconds:.2f}"
+        lines.append(f"{r.name:<24}{seconds:>10}  {r.error or 'ready'}")
+
+    total = sum(r.seconds for r in report if r.seconds is not None)
+    lines.append(
+        f"{len(report)} DUTs set up in {elapsed:.2f}s "
+        f"(serial would take {total:.2f}s)"
+    )
+    logging.info("topology setup\n" + "\n".join(lines))
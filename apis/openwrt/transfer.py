@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+File transfer to/from DUTs as tar streams over channels of one persistent
+SSH connection, so many files cost one channel instead of one Ansible
+`copy` task (and its round trips) per file.
+"""
+import gzip
+import hashlib
+import io
+import logging
+import os
+import posixpath
+import shlex
+import tarfile
+from pathlib import Path
+
+from apis.openwrt import ssh
+from apis.openwrt.errors import OpenwrtError
+
+# the remote cache of scripts, /tmp of OpenWrt is a tmpfs which lives until
+# the next reboot
+SCRIPT_CACHE_DIR = "/tmp/.mspsuck"
+
+
+def use_compression(cpus):
+    """
+    gzip is only worth it when the DUT has a spare core to decompress while
+    receiving, on a single core MIPS/ARM it is slower than the LAN.
+    """
+    return bool(cpus) and cpus >= 2
+
+
+class _ChannelWriter(object):
+    """A minimal writable file of a paramiko channel for tarfile."""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def write(self, data):
+        self.channel.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _check(channel, cmd):
+    stderr = channel.makefile_stderr("rb").read().decode(errors="replace")
+    rc = channel.recv_exit_status()
+    if rc != 0:
+        raise OpenwrtError(
+            f"Error occurred while transferring files\n"
+            f"command: {cmd}\n"
+            f"return_code: {rc}\n"
+            f"stderr: {stderr}"
+        )
+
+
+class FileTransfer(object):
+    """
+    Args:
+        client: A connected paramiko.SSHClient, see apis.openwrt.ssh.
+        compress: Whether tar streams are gzipped.
+        timeout: Seconds of channel inactivity before giving up.
+    """
+
+    def __init__(self, client, compress=False, timeout=300):
+        self.client = client
+        self.compress = compress
+        self.timeout = timeout
+        self.__scripts = dict()
+
+    def __channel(self, cmd):
+        channel = self.client.get_transport().open_session()
+        channel.settimeout(self.timeout)
+        channel.exec_command(cmd)
+        return channel
+
+    def put(self, paths, dest, compress=None):
+        """
+        Copies local files/directories `paths` into remote directory `dest`
+        by one tar stream, directories are copied recursively.
+
+        Args:
+            paths: Local paths, or a dict of remote name (relative to
+                `dest`) -> local path or bytes.
+        """
+        compress = self.compress if compress is None else compress
+        if not isinstance(paths, dict):
+            paths = {Path(p).name: p for p in paths}
+
+        cmd = (
+            f"mkdir -p {shlex.quote(dest)} && "
+            f"tar -x{'z' if compress else ''}f - -C {shlex.quote(dest)}"
+        )
+        channel = self.__channel(cmd)
+        try:
+            stream = _ChannelWriter(channel)
+            if compress:
+                # the fastest level, the host should never be the bottleneck
+                stream = gzip.GzipFile(
+                    fileobj=stream, mode="wb", compresslevel=1
+                )
+            with tarfile.open(fileobj=stream, mode="w|") as tar:
+                for name, source in paths.items():
+                    self.__add(tar, name, source)
+            if compress:
+                stream.close()
+            channel.shutdown_write()
+            _check(channel, cmd)
+        finally:
+            channel.close()
+
+    @staticmethod
+    def __add(tar, name, source):
+        if not isinstance(source, (bytes, bytearray)):
+            tar.add(os.fspath(source), arcname=name)
+            return
+
+        info = tarfile.TarInfo(name)
+        info.size = len(source)
+        info.mode = 0o755
+        tar.addfile(info, io.BytesIO(source))
+
+    def get(self, paths, dest, compress=None):
+        """
+        Copies remote files/directories `paths` into local directory
+        `dest` by one tar stream, they are extracted with their absolute
+        remote paths under `dest`.
+
+        Returns:
+            A list of the extracted local paths.
+        """
+        compress = self.compress if compress is None else compress
+        members = " ".join(
+            shlex.quote(posixpath.relpath(p, "/")) for p in paths
+        )
+        cmd = f"tar -c{'z' if compress else ''}f - -C / {members}"
+        channel = self.__channel(cmd)
+        channel.shutdown_write()
+        extracted = list()
+        try:
+            with tarfile.open(
+                fileobj=channel.makefile("rb"),
+                mode="r|gz" if compress else "r|",
+            ) as tar:
+                for member in tar:
+                    tar.extract(member, dest, filter="data")
+                    extracted.append(os.path.join(dest, member.name))
+            _check(channel, cmd)
+        finally:
+            channel.close()
+
+        return extracted
+
+    def put_script(self, script, name="script.sh"):
+        """
+        Copies `script` (text or bytes) to the DUT unless the same content
+        is already there, scripts are cached by their sha256 under
+        SCRIPT_CACHE_DIR.
+
+        Returns:
+            The remote path of the script.
+        """
+        if isinstance(script, str):
+            script = script.encode()
+
+        digest = hashlib.sha256(script).hexdigest()
+        path = posixpath.join(SCRIPT_CACHE_DIR, digest[:16], name)
+        if self.__scripts.get(digest) == path:
+            return path
+
+        exists = ssh.run(
+            self.client, f"test -f {shlex.quote(path)}", timeout=self.timeout
+        )
+        if exists.rc != 0:
+            # moved into place once complete, an interrupted transfer never
+            # leaves a partial script in the cache
+            cache_dir = posixpath.dirname(path)
+            part = f"{cache_dir}.part"
+            self.put({name: script}, part, compress=False)
+            moved = ssh.run(
+                self.client,
+                f"rm -rf {shlex.quote(cache_dir)} && "
+                f"mv {shlex.quote(part)} {shlex.quote(cache_dir)}",
+                timeout=self.timeout,
+            )
+            if moved.rc != 0:
+                raise OpenwrtError(
+                    f"Failed to cache script {path}\nstderr: {moved.stderr}"
+                )
+        else:
+            logging.debug(f"script {path} is cached on the DUT")
+
+        self.__scripts[digest] = path
+        return path
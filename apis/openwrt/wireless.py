@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from apis.utils import AttrDict
+from apis.utils.template import parse_output
+
+# the poller samples all metrics every interval, each sample is framed by
+# "@@sample <uptime>" ... "@@end" and every metric output by "@@metric <i>"
+_POLLER_SCRIPT = """#!/bin/sh
+# generated by apis.openwrt.wireless, $1: interval in microseconds
+
+# prints the kernel log lines after the last line seen, the ring buffer is
+# not cleared (the last line is found at its old position, or by its last
+# occurrence if the ring buffer wrapped)
+klog() {{
+    out=$(dmesg 2>/dev/null)
+    printf '%s\\n' "$out" | awk -v n="$klog_n" -v k="$klog_last" \\
+        '{{ l[NR] = $0 }} $0 == k {{ m = NR }}
+        END {{ if (l[n] == k) m = n; for (i = m + 1; i <= NR; i++) print l[i] }}'
+    klog_n=$(printf '%s\\n' "$out" | wc -l)
+    klog_last=$(printf '%s\\n' "$out" | tail -n 1)
+}}
+klog >/dev/null
+
+# the uptime in microseconds, /proc/uptime has two decimals
+now_us() {{
+    read uptime idle < /proc/uptime
+    now=$(( ${{uptime%.*}}${{uptime#*.}} * 10000 ))
+}}
+# samples are scheduled every interval from the start, so the time the
+# commands take does not drift the period, missed intervals are skipped
+now_us
+next=$now
+while :; do
+    echo "@@sample $uptime"
+{metrics}
+    echo "@@end"
+    next=$((next + $1))
+    now_us
+    if [ $next -le $now ]; then
+        next=$((now + $1 - (now - next) % $1))
+    fi
+    delay=$((next - now))
+    usleep $delay 2>/dev/null ||
+        sleep $((delay / 1000000)).$(printf %06d $((delay % 1000000)))
+    now_us
+done
+"""
+_METRIC = """    echo "@@metric {index}"
+    {cmd} 2>&1{klog}"""
+# `iwpriv ... show` of some drivers prints to the kernel log
+_KLOG = "\n    klog"
+
+
+class WirelessMetric(object):
+    """
+    A command sampled by WirelessPoller.
+
+    Args:
+        name: Name of the metric.
+        cmd: The command, e.g. "iw dev phy0-ap0 station dump".
+        template: A TextFSM template (see apis.utils.template) parsing the
+            output to rows.
+        parse: A function of output -> rows, used if `template` is None.
+            Without both the raw output is kept.
+        klog: Appends the kernel log printed by the command to its output,
+            e.g. for "iwpriv rax0 show pleinfo".
+    """
+
+    def __init__(self, name, cmd, template=None, parse=None, klog=False):
+        self.name = name
+        self.cmd = cmd
+        self.template = template
+        self.parse = parse
+        self.klog = klog
+
+    def rows(self, output):
+        if self.template is not None:
+            return parse_output(self.template, output)
+        if self.parse is not None:
+            return self.parse(output)
+        return output
+
+
+class WirelessPoller(object):
+    """
+    Samples wireless driver stats by a script running on the DUT, the
+    script is cached on the DUT (see Dut.put_script) and streams all
+    samples back over one SSH channel, so it can sample many times per
+    second without a round trip per sample.
+
+    Samples are timestamped by /proc/uptime of the DUT (10ms resolution)
+    and parsed on the host by TextFSM templates compiled once.
+
+    Args:
+        dut: <type apis.openwrt.Dut>
+        metrics: A list of WirelessMetric.
+        interval: Seconds between samples.
+        maxlen: Max number of samples kept per metric.
+
+    Typical usage example:
+
+    metrics = [
+        WirelessMetric(
+            "stations",
+            "iw dev phy0-ap0 station dump",
+            template="iw_station_dump.tmpl",
+        ),
+        WirelessMetric("ple", "iwpriv rax0 show pleinfo", klog=True),
+    ]
+    with WirelessPoller(topo.dut1, metrics, interval=0.1) as poller:
+        time.sleep(10)
+
+    times, signal = poller.series(
+        "stations", "SIGNAL", key=("STATION", "00:11:22:33:44:55")
+    )
+    """
+
+    def __init__(self, dut, metrics, interval=0.1, maxlen=100000):
+        self.dut = dut
+        self.metrics = list(metrics)
+        self.interval = interval
+        self.errors = 0
+        self.__samples = {
+            m.name: deque(maxlen=maxlen) for m in self.metrics
+        }
+        self.__channel = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def script(self):
+        """Returns the poller script of the metrics."""
+        return _POLLER_SCRIPT.format(
+            metrics="\n".join(
+                _METRIC.format(
+                    index=i, cmd=m.cmd, klog=_KLOG if m.klog else ""
+                )
+                for i, m in enumerate(self.metrics)
+            )
+        )
+
+    def start(self):
+        path = self.dut.put_script(self.script(), name="wireless_poller.sh")
+        channel = self.dut.ssh.get_transport().open_session()
+        channel.exec_command(f"sh {path} {int(self.interval * 1e6)}")
+        channel.shutdown_write()
+        self.__channel = channel
+        self.__thread = threading.Thread(
+            target=self.__read,
+            args=(channel.makefile("rb"),),
+            name=f"wireless-{self.dut.name}",
+            daemon=True,
+        )
+        self.__thread.start()
+
+    def stop(self):
+        # the script is killed by SIGPIPE at its next write
+        if self.__channel is not None:
+            self.__channel.close()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.__channel = self.__thread = None
+
+    def __read(self, stream):
+        uptime, index, outputs = None, None, dict()
+        try:
+            for raw in stream:
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                if line.startswith("@@sample "):
+                    uptime, index, outputs = float(line[9:]), None, dict()
+                elif line.startswith("@@metric "):
+                    index = int(line[9:])
+                    outputs[index] = list()
+                elif line == "@@end":
+                    if uptime is not None:
+                        self.__record(uptime, outputs)
+                    uptime, index = None, None
+                elif index is not None:
+                    outputs[index].append(line)
+        except Exception as e:
+            if self.__channel is not None and not self.__channel.closed:
+                logging.warning(f"{self.dut.name}: wireless poller: {e}")
+
+    def __record(self, uptime, outputs):
+        received_at = time.time()
+        for index, lines in outputs.items():
+            metric = self.metrics[index]
+            try:
+                rows = metric.rows("\n".join(lines))
+            except Exception as e:
+                self.errors += 1
+                logging.warning(f"failed to parse {metric.name}: {e}")
+                continue
+
+            with self.__lock:
+                self.__samples[metric.name].append(
+                    AttrDict(
+                        uptime=uptime, received_at=received_at, rows=rows
+                    )
+                )
+
+    def __metric(self, name):
+        for metric in self.metrics:
+            if metric.name == name:
+                return metric
+        raise KeyError(name)
+
+    def samples(self, name):
+        """
+        Returns:
+            A list of AttrDict(uptime, received_at, rows) of metric `name`.
+        """
+        with self.__lock:
+            return list(self.__samples[name])
+
+    def series(self, name, field, key=None):
+        """
+        Returns a time series of a numeric field of a parsed metric.
+
+        Args:
+            name: Name of the metric.
+            field: The field of the rows, e.g. "SIGNAL".
+            key: A tuple of (field, value) selecting the row, e.g.
+                ("STATION", "00:11:22:33:44:55"), the first row if None.
+
+        Returns:
+            A tuple of (uptime, values) NumPy arrays, NaN if the row is
+            missing in a sample.
+
+        Raises:
+            ValueError: if the metric has neither a template nor a parse
+                function, see `samples` for its raw output.
+        """
+        metric = self.__metric(name)
+        if metric.template is None and metric.parse is None:
+            raise ValueError(
+                f"metric {name} is not parsed to rows, see samples() for "
+                "its raw output"
+            )
+        samples = self.samples(name)
+        times = np.fromiter((s.uptime for s in samples), float, len(samples))
+        values = np.full(len(samples), np.nan)
+        for i, sample in enumerate(samples):
+            for row in sample.rows:
+                if key is None or row.get(key[0]) == key[1]:
+                    try:
+                        values[i] = float(row[field])
+                    except (TypeError, ValueError):
+                        pass
+                    break
+        return times, values
@@ -1,5 +1,46 @@
 # -*- coding: utf-8 -*-
-from apis.traffic_generator.capture import Capture
-from apis.traffic_generator.flow import *
-from apis.traffic_generator.setting import Setting
-from apis.traffic_generator.traffic_generator import TrafficGenerator
+from apis.utils.lazy import lazy_import
+
+_FLOW_ATTRS = (
+    "Flow",
+    "PortTxRx",
+    "DeviceTxRx",
+    "FixedSize",
+    "IncrementSize",
+    "RandomSize",
+    "Pps",
+    "Bps",
+    "Kbps",
+    "Mbps",
+    "Gbps",
+    "Percentage",
+    "BytesDelay",
+    "NanosecondsDelay",
+    "MicrosecondsDelay",
+    "FixedPackets",
+    "FixedSeconds",
+    "Burst",
+    "Continuous",
+    "Metrics",
+)
+
+_ATTRS = {
+    "BgpConvergenceTracker": "apis.traffic_generator.convergence",
+    "Capture": "apis.traffic_generator.capture",
+    "FlowImpact": "apis.traffic_generator.impact",
+    "TrafficImpact": "apis.traffic_generator.impact",
+    "FlowLatency": "apis.traffic_generator.latency",
+    "LatencyCollector": "apis.traffic_generator.latency",
+    "DutCounters": "apis.traffic_generator.soak",
+    "SoakRunner": "apis.traffic_generator.soak",
+    "BgpMetric": "apis.traffic_generator.metrics",
+    "FlowMetric": "apis.traffic_generator.metrics",
+    "PortMetric": "apis.traffic_generator.metrics",
+    "Setting": "apis.traffic_generator.setting",
+    "ThroughputTest": "apis.traffic_generator.rfc2544",
+    "TrafficGenerator": "apis.traffic_generator.traffic_generator",
+}
+_ATTRS.update((name, "apis.traffic_generator.flow") for name in _FLOW_ATTRS)
+
+__all__ = list(_ATTRS)
+__getattr__, __dir__ = lazy_import(__name__, _ATTRS)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import numpy as np
+
+from apis.utils import AttrDict
+from apis.utils import PeriodicSampler
+from apis.utils import Record
+
+
+class PeerConvergence(Record):
+    """
+    Convergence timeline of a BGP peer, times are seconds since the tracker
+    started.
+
+    Attributes:
+        name: Name of the peer.
+        state: The last sampled session_state.
+        transitions: A list of (time, session_state) when the state changed.
+        up_at: Time of the last transition to "up".
+        routes: The last sampled routes_received.
+        routes_changed_at: Time of the last change of routes_received.
+        converged_at: Time when routes_received plateaued with the session
+            up, None if not converged yet.
+    """
+
+    __slots__ = (
+        "name",
+        "state",
+        "transitions",
+        "up_at",
+        "routes",
+        "routes_changed_at",
+        "converged_at",
+    )
+
+
+def _distribution(values):
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=float)
+    p50, p90, p99 = np.percentile(arr, (50, 90, 99))
+    return AttrDict(
+        min=float(arr.min()),
+        p50=float(p50),
+        p90=float(p90),
+        p99=float(p99),
+        max=float(arr.max()),
+    )
+
+
+class BgpConvergenceTracker(object):
+    """
+    Samples BGP peer metrics in a background thread until stopped and
+    records when each peer comes up and when its routes_received plateaus.
+    Sampling goes on after convergence, so a peer flapping later is
+    reconverged in the report.
+
+    Args:
+        tg: <type apis.traffic_generator.TrafficGenerator>
+        version: 4 or 6, samples get_bgpv4_stats or get_bgpv6_stats.
+        peers: Names of peers to track, all sampled peers if None.
+        interval: Seconds between samples.
+        plateau: routes_received is considered converged once it has not
+            changed for `plateau` seconds.
+        expected_routes: If set, a peer only converges after receiving at
+            least this many routes.
+
+    Typical usage example:
+
+    with BgpConvergenceTracker(tg, interval=0.1) as tracker:
+        tg.start_protocol()
+        tracker.wait(timeout=300)
+
+    report = tracker.report()
+    report.convergence.p99
+    """
+
+    def __init__(
+        self,
+        tg,
+        version=4,
+        peers=None,
+        interval=0.1,
+        plateau=1.0,
+        expected_routes=None,
+    ):
+        self.__get_stats = getattr(tg, f"get_bgpv{version}_stats")
+        self.__names = set(peers) if peers else None
+        self.interval = interval
+        self.plateau = plateau
+        self.expected_routes = expected_routes
+        self.peers = dict()
+        self.samples = 0
+        self.__start = None
+        self.__sampler = None
+        self.__lock = threading.Lock()
+        self.__converged = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self.peers = dict()
+        self.samples = 0
+        self.__converged.clear()
+        self.__start = time.monotonic()
+        self.__sampler = PeriodicSampler(
+            self.__poll, self.interval, name="bgp-convergence"
+        )
+        self.__sampler.start()
+
+    def stop(self):
+        if self.__sampler is not None:
+            self.__sampler.stop(check=False)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every peer converged or `timeout` seconds elapsed,
+        the tracker keeps sampling until it is stopped.
+
+        Returns:
+            True if all peers converged.
+        """
+        self.__converged.wait(timeout)
+        if self.__sampler is not None:
+            self.__sampler.check()
+        return self.__converged.is_set()
+
+    def __poll(self):
+        try:
+            stats = self.__get_stats()
+            with self.__lock:
+                self.__sample(stats)
+                converged = self.__is_converged()
+        except Exception:
+            # wakes up wait() to raise the error
+            self.__converged.set()
+            raise
+
+        if converged:
+            self.__converged.set()
+
+    def __sample(self, stats):
+        now = time.monotonic() - self.__start
+        self.samples += 1
+        for name, m in stats.items():
+            if self.__names is not None and name not in self.__names:
+                continue
+
+            peer = self.peers.get(name)
+            if peer is None:
+                peer = PeerConvergence(
+                    name, None, list(), None, None, now, None
+                )
+                self.peers[name] = peer
+
+            if m.session_state != peer.state:
+                peer.state = m.session_state
+                peer.transitions.append((now, m.session_state))
+                if m.session_state == "up":
+                    peer.up_at = now
+                peer.converged_at = None
+
+            if m.routes_received != peer.routes:
+                peer.routes = m.routes_received
+                peer.routes_changed_at = now
+                peer.converged_at = None
+
+            if peer.converged_at is not None or peer.state != "up":
+                continue
+
+            settled_at = max(peer.routes_changed_at, peer.up_at)
+            if now - settled_at >= self.plateau and (
+                self.expected_routes is None
+                or (peer.routes or 0) >= self.expected_routes
+            ):
+                peer.converged_at = settled_at
+
+    def __is_converged(self):
+        if not self.peers:
+            return False
+        if self.__names is not None and len(self.peers) < len(self.__names):
+            return False
+        return all(p.converged_at is not None for p in self.peers.values())
+
+    def report(self):
+        """
+        Returns a summary of the tracked peers, for example:
+
+        {
+            "peers": 200,
+            "converged": 198,
+            "not_converged": ["dev17", "dev42"],
+            "session_up": {"min": .., "p50": .., "p90": .., "p99": .., "max": ..},
+            "convergence": {"min": .., "p50": .., "p90": .., "p99": .., "max": ..},
+            "samples": 1234,
+        }
+        """
+        with self.__lock:
+            return self.__report()
+
+    def __report(self):
+        peers = self.peers.values()
+        return AttrDict(
+            peers=len(self.peers),
+            converged=sum(p.converged_at is not None for p in peers),
+            not_converged=sorted(
+                p.name for p in peers if p.converged_at is None
+            ),
+            session_up=_distribution(
+                [p.up_at for p in peers if p.up_at is not None]
+            ),
+            convergence=_distribution(
+                [p.converged_at for p in peers if p.converged_at is not None]
+            ),
+            samples=self.samples,
+        )
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
 
-from scapy.all import Packet
+from scapy.packet import Packet
 
 from apis.traffic_generator.packet import serialize
 from apis.utils import AttrDict
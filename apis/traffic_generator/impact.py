@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import time
+
+import numpy as np
+
+from apis.utils import AttrDict
+from apis.utils import PeriodicSampler
+from apis.utils import Record
+from apis.utils import SampleBuffer
+
+# columns of a counter sample
+_TX, _RX = range(2)
+
+
+class FlowImpact(Record):
+    """
+    Impact of an event on a flow, times are seconds since the event
+    started.
+
+    Attributes:
+        name: Name of the flow.
+        tx_rate: Frames per second transmitted during the baseline.
+        lost: Frames lost since the event started.
+        outage: Seconds of traffic lost, `lost` / `tx_rate`.
+        loss_start: Time when frames started to be lost, None if no loss.
+        converged_at: Time after which no more frames were lost, None if
+            the flow did not converge in time.
+    """
+
+    __slots__ = (
+        "name",
+        "tx_rate",
+        "lost",
+        "outage",
+        "loss_start",
+        "converged_at",
+    )
+
+
+def _counters(metric):
+    return (float(metric.frames_tx or 0), float(metric.frames_rx or 0))
+
+
+class TrafficImpact(object):
+    """
+    Measures frame loss of flows while a DUT event happens, e.g. reboot,
+    link flap or config reload. Flow counters are sampled by a background
+    thread, the frames lost by a flow are its frames_tx - frames_rx since
+    the event, and its outage is the lost frames over its transmit rate, so
+    the outage resolution is one frame instead of one sample.
+
+    The flows must be continuous (`Continuous` duration) with a constant
+    rate, the lost frames converge once the same number of frames is
+    received as transmitted again.
+
+    Args:
+        tg: <type apis.traffic_generator.TrafficGenerator>
+        flows: Names of flows to measure, all flows if None.
+        interval: Seconds between samples.
+        baseline: Seconds of traffic sampled before the event, the transmit
+            rate of flows is measured in the baseline.
+        settle: The measurement stops once no flow lost frames for
+            `settle` seconds after the event returned.
+        transmit: Starts transmit before the baseline and stops it after
+            the measurement, so the last counters include every frame in
+            flight. Otherwise the flows must be transmitting.
+        capacity: Initial number of samples to allocate, the buffer grows
+            when it is full.
+
+    Typical usage example:
+
+    tg.start_traffic(
+        Flow("f1", PortTxRx("port1", "port2"), duration=Continuous(), ...)
+    )
+    impact = TrafficImpact(tg, transmit=False)
+    report = impact.run(reboot_duts, [topo.dut1], timeout=300)
+    report.flows["f1"].outage, report.flows["f1"].converged_at
+    """
+
+    def __init__(
+        self,
+        tg,
+        flows=None,
+        interval=0.05,
+        baseline=2.0,
+        settle=3.0,
+        transmit=True,
+        capacity=4096,
+    ):
+        self.__tg = tg
+        self.names = list(flows) if flows else None
+        self.interval = interval
+        self.baseline = baseline
+        self.settle = settle
+        self.transmit = transmit
+        self.__capacity = capacity
+        self.__buffer = None
+        self.__event = None
+        self.__sampler = None
+
+    @property
+    def samples(self):
+        return 0 if self.__buffer is None else self.__buffer.size
+
+    def __sample(self):
+        stats = self.__tg.get_flow_stats()
+        now = time.monotonic()
+        if self.names is None:
+            self.names = list(stats)
+        if self.__buffer is None:
+            self.__buffer = SampleBuffer(
+                len(self.names), 2, self.__capacity, fill=0.0
+            )
+
+        # a flow missing in a sample keeps its last counters
+        last = self.__buffer.last()
+        self.__buffer.append(
+            [
+                _counters(stats[n]) if n in stats else last[i]
+                for i, n in enumerate(self.names)
+            ],
+            now,
+        )
+
+    def __wait(self, seconds):
+        self.__sampler.wait(seconds)
+        self.__sampler.check()
+
+    def run(self, event, *args, timeout=120, **kwargs):
+        """
+        Samples the baseline, calls `event(*args, **kwargs)` and samples
+        until the flows converged or `timeout` seconds after the event
+        returned. The event should return once it is done on the DUT, e.g.
+        after the DUT is up again.
+
+        Returns:
+            An AttrDict of `duration` (seconds the event took), `flows` (a
+            dict of flow name -> FlowImpact) and `samples`.
+        """
+        self.__buffer = None
+        self.__sampler = PeriodicSampler(
+            self.__sample, self.interval, name="impact"
+        )
+        if self.transmit:
+            self.__tg.start_transmit()
+        self.__sampler.start()
+        completed = False
+        try:
+            self.__wait(self.baseline)
+            if self.samples < 2:
+                raise RuntimeError(
+                    f"{self.samples} samples in the {self.baseline}s "
+                    f"baseline, the interval is too short for the stats"
+                )
+
+            self.__event = (self.samples - 1, time.monotonic())
+            event(*args, **kwargs)
+            returned_at = time.monotonic()
+            while time.monotonic() - returned_at < timeout:
+                self.__wait(self.interval)
+                if self.__settled(returned_at):
+                    break
+            completed = True
+        finally:
+            # traffic is stopped even if the event or sampling failed
+            try:
+                if self.transmit:
+                    self.__tg.stop_transmit()
+                    if completed:
+                        self.__drain()
+            finally:
+                self.__sampler.stop(check=False)
+        self.__sampler.check()
+
+        return AttrDict(
+            duration=returned_at - self.__event[1],
+            flows=self.report(),
+            samples=self.samples,
+        )
+
+    def __drain(self, timeout=5.0):
+        # the frames in flight are received after transmit stopped
+        deadline = time.monotonic() + timeout
+        samples = self.samples
+        while time.monotonic() < deadline:
+            self.__wait(self.interval)
+            if self.samples - samples >= 3:
+                data, _ = self.__buffer.snapshot()
+                rx = data[:, -3:, _RX]
+                if (rx == rx[:, -1:]).all():
+                    return
+
+    def __slack(self, tx_rate):
+        # tx and rx counters of a sample are not read at the same instant,
+        # differences within one interval of traffic are not loss
+        return np.maximum(tx_rate * self.interval, 1.0)
+
+    def __analyze(self):
+        # one snapshot, the sampler may append while it is analyzed
+        data, times = self.__buffer.snapshot()
+        start, started_at = self.__event
+
+        tx_rate = (data[:, start, _TX] - data[:, 0, _TX]) / (
+            times[start] - times[0]
+        )
+        # frames lost since the event at every sample after it
+        delta = data[:, start:] - data[:, start, None]
+        lost = np.maximum(delta[:, :, _TX] - delta[:, :, _RX], 0)
+        return tx_rate, lost, times[start:] - started_at
+
+    def __settled(self, returned_at):
+        tx_rate, lost, times = self.__analyze()
+        slack = self.__slack(tx_rate)[:, None]
+        recent = times >= times[-1] - self.settle
+        if returned_at - self.__event[1] > times[-1] - self.settle:
+            return False
+        # the loss grew less than the slack in the last `settle` seconds
+        window = lost[:, recent]
+        return bool((window.max(axis=1) - window.min(axis=1) < slack).all())
+
+    def report(self):
+        """
+        Returns:
+            A dict of flow name -> FlowImpact of the last run.
+        """
+        if self.__event is None or self.samples < 2:
+            return dict()
+
+        tx_rate, lost, times = self.__analyze()
+        slack = self.__slack(tx_rate)
+        final = lost[:, -1]
+        ret = dict()
+        for i, name in enumerate(self.names):
+            loss_start = converged_at = None
+            lossy = lost[i] >= slack[i]
+            if lossy.any():
+                # the loss started after the last sample without loss
+                loss_start = float(times[max(np.argmax(lossy) - 1, 0)])
+            # the first sample after which the loss stayed within the slack
+            # of its final value
+            unsettled = np.nonzero(final[i] - lost[i] >= slack[i])[0]
+            if not len(unsettled):
+                converged_at = 0.0 if loss_start is None else loss_start
+            elif unsettled[-1] + 1 < len(times):
+                converged_at = float(times[unsettled[-1] + 1])
+                if loss_start is not None:
+                    converged_at = max(converged_at, loss_start)
+
+            ret[name] = FlowImpact(
+                name,
+                float(tx_rate[i]),
+                int(final[i]),
+                float(final[i] / tx_rate[i]) if tx_rate[i] else None,
+                loss_start,
+                converged_at,
+            )
+        return ret
+
+    def series(self, name):
+        """
+        Returns:
+            An AttrDict of `times` (seconds since the event) and `lost`
+            (frames lost since the event) arrays of the flow `name`.
+        """
+        _, lost, times = self.__analyze()
+        return AttrDict(times=times, lost=lost[self.names.index(name)])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+
+class ConfigIndex(object):
+    """
+    Hash indexes of an applied snappi config, rebuilt from the config at
+    every update so they never refer to objects of a replaced config.
+
+    Attributes:
+        ports: port name -> port
+        devices: device name -> device
+        endpoints: device endpoint (ethernet/ipv4/ipv6) name -> port name
+        flows: flow name -> flow
+        flow_ports: flow name -> (tx port names, rx port names)
+        captures: capture name -> capture
+        capture_ports: port name -> capture names
+    """
+
+    def __init__(self):
+        self.ports = dict()
+        self.devices = dict()
+        self.endpoints = dict()
+        self.flows = dict()
+        self.flow_ports = dict()
+        self.captures = dict()
+        self.capture_ports = dict()
+
+    def update(self, cfg):
+        """Rebuilds the indexes of the applied `cfg`."""
+        self.ports = {p.name: p for p in cfg.ports}
+
+        self.devices = dict()
+        self.endpoints = dict()
+        for d in cfg.devices:
+            self.devices[d.name] = d
+            port_name = getattr(d, "container_name", None)
+            eth = getattr(d, "ethernet", None)
+            if eth is None:
+                continue
+            self.endpoints[eth.name] = port_name
+            for mode in ("ipv4", "ipv6"):
+                ip = getattr(eth, mode, None)
+                if ip is not None and ip.name:
+                    self.endpoints[ip.name] = port_name
+
+        self.flows = {f.name: f for f in cfg.flows}
+        self.flow_ports = {
+            name: self.__flow_ports(f) for name, f in self.flows.items()
+        }
+
+        self.captures = dict()
+        self.capture_ports = dict()
+        for c in cfg.captures:
+            self.captures[c.name] = c
+            for p in c.port_names:
+                self.capture_ports.setdefault(p, list()).append(c.name)
+
+    def __flow_ports(self, flow):
+        if flow.tx_rx.choice == "port":
+            port = flow.tx_rx.port
+            return [port.tx_name], [port.rx_name]
+
+        device = flow.tx_rx.device
+        return (
+            self.__endpoint_ports(device.tx_names),
+            self.__endpoint_ports(device.rx_names),
+        )
+
+    def __endpoint_ports(self, names):
+        ports = list()
+        for name in names:
+            port = self.endpoints.get(name)
+            if port is not None and port not in ports:
+                ports.append(port)
+        return ports
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import time
+import warnings
+
+import numpy as np
+
+from apis.utils import AttrDict
+from apis.utils import PeriodicSampler
+from apis.utils import Record
+from apis.utils import SampleBuffer
+
+# columns of a latency sample
+_MIN, _AVG, _MAX = range(3)
+
+
+class FlowLatency(Record):
+    """
+    Latency summary of a flow, values are nanoseconds.
+
+    Attributes:
+        name: Name of the flow.
+        samples: Number of samples with latency reported.
+        min: The minimum of minimum_ns.
+        avg: The mean of average_ns.
+        max: The maximum of maximum_ns.
+        p50, p90, p99: Percentiles of average_ns over time.
+        jitter: Mean absolute difference of consecutive average_ns.
+        outliers: Number of samples whose average_ns deviates from the
+            median more than `threshold` scaled MADs.
+    """
+
+    __slots__ = (
+        "name",
+        "samples",
+        "min",
+        "avg",
+        "max",
+        "p50",
+        "p90",
+        "p99",
+        "jitter",
+        "outliers",
+    )
+
+
+def _latency(metric):
+    latency = getattr(metric, "latency", None)
+    if latency is None:
+        return (np.nan, np.nan, np.nan)
+    values = (
+        getattr(latency, "minimum_ns", None),
+        getattr(latency, "average_ns", None),
+        getattr(latency, "maximum_ns", None),
+    )
+    # a flow without received frames reports no (or zero) latency
+    if not values[_AVG]:
+        return (np.nan, np.nan, np.nan)
+    return tuple(float(v) for v in values)
+
+
+def _reduce(func, arr, *args, **kwargs):
+    # the nan-aware reductions are several times slower, they are only used
+    # when some flows did not report latency in some samples
+    if np.isnan(arr).any():
+        func = "nan" + func
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return getattr(np, func)(arr, *args, axis=-1, **kwargs)
+    return getattr(np, func)(arr, *args, axis=-1, **kwargs)
+
+
+class LatencyCollector(object):
+    """
+    Samples latency of flows through TrafficGenerator.get_flow_stats and
+    keeps the series in a (flows, samples, 3) NumPy array of
+    min/avg/max nanoseconds, summaries are computed over all flows at once.
+
+    The flows must have latency metrics enabled, e.g.
+    `Flow(..., metrics=Metrics(enable=True, latency_enable=True))`.
+
+    Args:
+        tg: <type apis.traffic_generator.TrafficGenerator>
+        flows: Names of flows to sample, all flows of the first sample if
+            None.
+        interval: Seconds between samples of the background thread.
+        capacity: Initial number of samples to allocate, the buffer grows
+            when it is full.
+
+    Typical usage example:
+
+    with LatencyCollector(tg, interval=1) as collector:
+        tg.start_transmit()
+        time.sleep(3600)
+
+    summary = collector.summary()
+    summary["f1"].p99
+    collector.outliers()
+    """
+
+    def __init__(self, tg, flows=None, interval=1.0, capacity=3600):
+        self.__tg = tg
+        self.interval = interval
+        self.names = list(flows) if flows else None
+        self.__capacity = capacity
+        self.__buffer = None
+        self.__start = None
+        self.__sampler = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def samples(self):
+        return 0 if self.__buffer is None else self.__buffer.size
+
+    def sample(self, stats=None):
+        """
+        Records one sample, `stats` is the return of get_flow_stats and is
+        fetched if None.
+        """
+        if stats is None:
+            stats = self.__tg.get_flow_stats()
+        if self.__start is None:
+            self.__start = time.monotonic()
+        if self.names is None:
+            self.names = list(stats)
+        if self.__buffer is None:
+            self.__buffer = SampleBuffer(len(self.names), 3, self.__capacity)
+
+        missing = (np.nan, np.nan, np.nan)
+        rows = [
+            _latency(stats[n]) if n in stats else missing for n in self.names
+        ]
+        self.__buffer.append(rows, time.monotonic() - self.__start)
+
+    def start(self):
+        self.__sampler = PeriodicSampler(
+            self.sample, self.interval, name="latency"
+        )
+        self.__sampler.start()
+
+    def stop(self):
+        if self.__sampler is not None:
+            self.__sampler.stop()
+
+    def __snapshot(self):
+        # data and times of the same samples, the sampler may be appending
+        if self.__buffer is None:
+            return np.empty((0, 0, 3)), np.empty(0)
+        return self.__buffer.snapshot()
+
+    @property
+    def data(self):
+        """The (flows, samples, 3) array of min/avg/max nanoseconds."""
+        return self.__snapshot()[0]
+
+    @property
+    def times(self):
+        """Seconds since the first sample of each sample."""
+        return self.__snapshot()[1]
+
+    def series(self, name):
+        """
+        Returns:
+            An AttrDict of `times`, `min`, `avg` and `max` arrays of the flow
+            `name`.
+        """
+        data, times = self.__snapshot()
+        row = data[self.names.index(name)]
+        return AttrDict(
+            times=times,
+            min=row[:, _MIN],
+            avg=row[:, _AVG],
+            max=row[:, _MAX],
+        )
+
+    def __outlier_mask(self, avg, threshold):
+        median = _reduce("median", avg, keepdims=True)
+        deviation = np.abs(avg - median)
+        # scaled MAD, a robust estimate of the standard deviation
+        mad = 1.4826 * _reduce("median", deviation, keepdims=True)
+        with np.errstate(invalid="ignore"):
+            return deviation > threshold * np.maximum(mad, 1.0)
+
+    def summary(self, threshold=3.5):
+        """
+        Summarizes every flow, see FlowLatency.
+
+        Args:
+            threshold: Samples further than `threshold` scaled MADs from the
+                median of the flow are counted as outliers.
+
+        Returns:
+            A dict of flow name -> FlowLatency.
+        """
+        data = self.data
+        if not data.size:
+            return dict()
+
+        avg = data[:, :, _AVG]
+        counts = np.sum(~np.isnan(avg), axis=1)
+        reported = counts > 0
+        ret = dict()
+        if not reported.any():
+            for name in self.names:
+                ret[name] = FlowLatency(name, 0, *([None] * 7), 0)
+            return ret
+
+        mins = np.full(len(self.names), np.nan)
+        maxs = np.full(len(self.names), np.nan)
+        means = np.full(len(self.names), np.nan)
+        pcts = np.full((3, len(self.names)), np.nan)
+        jitter = np.full(len(self.names), np.nan)
+
+        rows = avg[reported]
+        mins[reported] = _reduce("min", data[reported, :, _MIN])
+        maxs[reported] = _reduce("max", data[reported, :, _MAX])
+        means[reported] = _reduce("mean", rows)
+        pcts[:, reported] = _reduce("percentile", rows, (50, 90, 99))
+        if rows.shape[1] > 1:
+            jitter[reported] = _reduce("mean", np.abs(np.diff(rows, axis=1)))
+        outliers = np.sum(self.__outlier_mask(avg, threshold), axis=1)
+
+        def _value(v):
+            return None if np.isnan(v) else float(v)
+
+        for i, name in enumerate(self.names):
+            ret[name] = FlowLatency(
+                name,
+                int(counts[i]),
+                _value(mins[i]),
+                _value(means[i]),
+                _value(maxs[i]),
+                _value(pcts[0, i]),
+                _value(pcts[1, i]),
+                _value(pcts[2, i]),
+                _value(jitter[i]),
+                int(outliers[i]),
+            )
+        return ret
+
+    def outliers(self, threshold=3.5):
+        """
+        Flags outliers of every flow, see `summary` for `threshold`.
+
+        Returns:
+            A dict of flow name -> list of (time, average_ns) of the outlier
+            samples, flows without outliers are omitted.
+        """
+        data, times = self.__snapshot()
+        if not data.size:
+            return dict()
+
+        mask = self.__outlier_mask(data[:, :, _AVG], threshold)
+
+        ret = dict()
+        for i, j in zip(*np.nonzero(mask)):
+            ret.setdefault(self.names[i], list()).append(
+                (float(times[j]), float(data[i, j, _AVG]))
+            )
+        return ret
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from apis.utils.classes import Record
+
+
+class PortMetric(Record):
+    """A sample of TrafficGenerator.get_port_stats"""
+
+    __slots__ = (
+        "name",
+        "location",
+        "link",
+        "capture",
+        "frames_tx",
+        "frames_rx",
+        "bytes_tx",
+        "bytes_rx",
+        "frames_tx_rate",
+        "frames_rx_rate",
+        "bytes_tx_rate",
+        "bytes_rx_rate",
+    )
+
+
+class FlowMetric(Record):
+    """A sample of TrafficGenerator.get_flow_stats"""
+
+    __slots__ = (
+        "name",
+        "port_tx",
+        "port_rx",
+        "transmit",
+        "frames_tx",
+        "frames_rx",
+        "bytes_tx",
+        "bytes_rx",
+        "frames_tx_rate",
+        "frames_rx_rate",
+        "loss",
+        "timestamps",
+        "latency",
+    )
+
+
+class BgpMetric(Record):
+    """A sample of TrafficGenerator.get_bgpv4_stats/get_bgpv6_stats"""
+
+    __slots__ = (
+        "name",
+        "session_state",
+        "session_flap_count",
+        "routes_advertised",
+        "routes_received",
+        "route_withdraws_sent",
+        "route_withdraws_received",
+        "updates_sent",
+        "updates_received",
+        "opens_sent",
+        "opens_received",
+        "keepalives_sent",
+        "keepalives_received",
+        "notifications_sent",
+        "notifications_received",
+    )
+
+
+def to_records(metrics, record_class):
+    """
+    Converts the AttrDict returned by TrafficGenerator.get_*_stats to a dict
+    of `record_class` records, e.g. to_records(tg.get_flow_stats(),
+    FlowMetric).
+    """
+    return {
+        name: record_class.from_object(item) for name, item in metrics.items()
+    }
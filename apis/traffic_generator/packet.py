@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
 import binascii
 
-from scapy.all import ARP
-from scapy.all import Dot1Q
-from scapy.all import Ether
-from scapy.all import IP
-from scapy.all import IPv6
-from scapy.all import Packet
-from scapy.all import TCP
-from scapy.all import UDP
-from scapy.all import VXLAN
+from scapy.layers.inet import IP
+from scapy.layers.inet import TCP
+from scapy.layers.inet import UDP
+from scapy.layers.inet6 import IPv6
+from scapy.layers.l2 import ARP
+from scapy.layers.l2 import Dot1Q
+from scapy.layers.l2 import Ether
+from scapy.layers.vxlan import VXLAN
+from scapy.packet import Packet
 
 
 def serialize(pkt):
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+A broker of pre-warmed traffic generator sessions shared by parallel test
+processes (e.g. pytest-xdist workers).
+
+The broker owns one TrafficGenerator session per port slice, the sessions
+are created (and `apply_config` is done) once when the broker starts. A
+test process leases a slice through local IPC and drives the session of
+the slice remotely, so it can start transmitting right away and never
+fights other processes over port ownership.
+
+Usage:
+
+    # start the broker, see `load_broker_config` for the YAML format
+    pipenv run python -m apis.traffic_generator.pool broker.yml
+
+    # run tests in parallel, `tg_lease` fixture leases a slice per worker
+    TG_POOL_ADDRESS=127.0.0.1:50100 TG_POOL_AUTHKEY=secret \\
+        pipenv run pytest -n 4 ...
+"""
+import ipaddress
+import logging
+import os
+import sys
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+import yaml
+
+from apis.traffic_generator.metrics import BgpMetric
+from apis.traffic_generator.metrics import FlowMetric
+from apis.traffic_generator.metrics import PortMetric
+from apis.traffic_generator.metrics import to_records
+from apis.traffic_generator.setting import Setting
+from apis.traffic_generator.traffic_generator import TrafficGenerator
+
+# snappi objects are not meant to be pickled, metrics are sent back to the
+# test processes as records
+_RECORD_METHODS = {
+    "get_port_stats": PortMetric,
+    "get_flow_stats": FlowMetric,
+    "get_bgpv4_stats": BgpMetric,
+    "get_bgpv6_stats": BgpMetric,
+}
+# methods of TrafficGenerator which can be called through the broker, the
+# others return snappi objects (e.g. get_flow) or act on the whole session
+# (e.g. teardown)
+_FORWARDED_METHODS = frozenset(
+    (
+        "apply_config",
+        "set_flows",
+        "update_flows",
+        "clear_flows",
+        "set_captures",
+        "clear_captures",
+        "set_devices",
+        "clear_devices",
+        "set_lags",
+        "clear_lags",
+        "clear_all",
+        "get_flow_ports",
+        "get_capture_names",
+        "get_captures",
+        "is_transmit_stopped",
+        "is_transmit_started",
+        "send_pings",
+        "start_traffic",
+        "start_transmit",
+        "start_capture",
+        "start_protocol",
+        "stop_traffic",
+        "stop_transmit",
+        "stop_capture",
+        "stop_protocol",
+        "stop_all",
+        "link_up_ports",
+        "link_down_ports",
+    )
+).union(_RECORD_METHODS)
+# seconds between liveness checks of the owners while waiting for a slice
+_REAP_INTERVAL = 1.0
+
+
+def _check_forwarded(name):
+    if name not in _FORWARDED_METHODS:
+        raise AttributeError(
+            f"TrafficGenerator.{name} can not be called through the "
+            f"session broker, forwarded methods are "
+            f"{', '.join(sorted(_FORWARDED_METHODS))}"
+        )
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists but belongs to another user
+        return True
+    return True
+
+
+def slice_ports(port_names, size):
+    """Splits `port_names` to slices of `size` ports, e.g. tx/rx pairs."""
+    port_names = list(port_names)
+    return [
+        port_names[i:i + size]
+        for i in range(0, len(port_names) - size + 1, size)
+    ]
+
+
+class SessionPool(object):
+    """
+    Pre-warmed TrafficGenerator sessions, one per port slice.
+
+    Args:
+        setting: <type apis.traffic_generator.Setting> of all ports.
+        slices: A list of port name lists, each slice gets its own session.
+        location_preemption: see TrafficGenerator.
+    """
+
+    def __init__(self, setting, slices, location_preemption=False):
+        self.__slices = [list(s) for s in slices]
+        self.__sessions = [
+            TrafficGenerator(setting.subset(s), location_preemption)
+            for s in self.__slices
+        ]
+        self.__free = list(range(len(self.__sessions)))
+        self.__leases = dict()
+        self.__pids = dict()
+        self.__cond = threading.Condition()
+
+    def lease(self, owner, timeout=None, pid=None):
+        """
+        Leases a free slice to `owner`, waits for up to `timeout` seconds
+        if all slices are in use. The same slice is returned if `owner`
+        already holds one.
+
+        Args:
+            owner: Name of the owner, e.g. the pytest-xdist worker id.
+            timeout: Seconds to wait for a free slice, forever if None.
+            pid: Process id of the owner on the broker host. The slice is
+                released once the process is gone (e.g. a crashed worker)
+                and another owner waits for a slice.
+
+        Returns:
+            The port names of the slice.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.__reap()
+            with self.__cond:
+                if owner not in self.__leases and self.__free:
+                    self.__leases[owner] = self.__free.pop(0)
+                if owner in self.__leases:
+                    if pid is not None:
+                        self.__pids[owner] = pid
+                    return self.__slices[self.__leases[owner]]
+
+                wait = _REAP_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free port slice for {owner}")
+                    wait = min(wait, remaining)
+                self.__cond.wait(wait)
+
+    def __reap(self):
+        with self.__cond:
+            gone = [(o, p) for o, p in self.__pids.items() if not _alive(p)]
+        for owner, pid in gone:
+            logging.warning(
+                f"{owner} (pid {pid}) is gone, releasing its port slice"
+            )
+            self.release(owner)
+
+    def release(self, owner):
+        """Resets the session of `owner` and returns it to the pool."""
+        with self.__cond:
+            idx = self.__leases.pop(owner, None)
+            self.__pids.pop(owner, None)
+        if idx is None:
+            return
+
+        try:
+            self.__sessions[idx].clear_all()
+        finally:
+            with self.__cond:
+                self.__free.append(idx)
+                self.__cond.notify()
+
+    def leases(self):
+        with self.__cond:
+            return {o: self.__slices[i] for o, i in self.__leases.items()}
+
+    def call(self, owner, name, *args, **kwargs):
+        """
+        Calls method `name` of the owner's session, only the methods whose
+        returns can be sent back to the test process are forwarded.
+
+        Raises:
+            AttributeError: if `name` is not forwarded.
+            KeyError: if `owner` does not hold a slice.
+        """
+        _check_forwarded(name)
+        with self.__cond:
+            if owner not in self.__leases:
+                raise KeyError(f"{owner} does not hold a port slice")
+            tg = self.__sessions[self.__leases[owner]]
+
+        ret = getattr(tg, name)(*args, **kwargs)
+        if name in _RECORD_METHODS:
+            ret = to_records(ret, _RECORD_METHODS[name])
+        return ret
+
+    def teardown(self):
+        for tg in self.__sessions:
+            tg.teardown()
+
+
+class SessionBroker(BaseManager):
+    """The IPC server/client of a SessionPool."""
+
+
+SessionBroker.register("get_pool")
+
+
+def serve_pool(pool, address=("127.0.0.1", 0), authkey=b""):
+    """
+    Serves `pool` in a background thread of the current process.
+
+    Returns:
+        A tuple of (server, (host, port)), the server stops with the
+        process.
+    """
+
+    class _Broker(BaseManager):
+        pass
+
+    _Broker.register("get_pool", callable=lambda: pool)
+    server = _Broker(address=address, authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, server.address
+
+
+def connect_pool(address, authkey=b""):
+    """Returns a proxy of the SessionPool served at `address`."""
+    if isinstance(address, str):
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+
+    broker = SessionBroker(address=address, authkey=authkey)
+    broker.connect()
+    return broker.get_pool()
+
+
+class LeasedTrafficGenerator(object):
+    """
+    The TrafficGenerator interface of a leased port slice, every method
+    call is forwarded to the session in the broker. Metrics are returned as
+    records of apis.traffic_generator.metrics.
+
+    Typical usage example:
+
+    with LeasedTrafficGenerator("127.0.0.1:50100", "gw0", b"secret") as tg:
+        tx, rx = tg.port_names
+        tg.start_traffic(Flow("f1", PortTxRx(tx, rx)))
+    """
+
+    def __init__(self, address, owner, authkey=b"", timeout=None):
+        self.owner = owner
+        self.__pool = connect_pool(address, authkey)
+        # the broker checks the process is alive only on the same host
+        pid = os.getpid() if _is_local(address) else None
+        self.port_names = list(self.__pool.lease(owner, timeout, pid))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        _check_forwarded(name)
+
+        def _call(*args, **kwargs):
+            return self.__pool.call(self.owner, name, *args, **kwargs)
+
+        return _call
+
+    def release(self):
+        self.__pool.release(self.owner)
+
+
+def _is_local(address):
+    if isinstance(address, str):
+        address = address.rsplit(":", 1)
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def worker_id():
+    """The pytest-xdist worker id, or "master" if not running in xdist."""
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def load_broker_config(path):
+    """
+    Loads the broker config from a YAML file, for example:
+
+    address: 127.0.0.1:50100
+    authkey: secret
+    location_preemption: true
+    slice_size: 2           # or list `slices` explicitly
+    setting:                # the kwargs of Setting
+      api_server: https://10.1.1.1:443
+      ext: ixnetwork
+      config:
+        ports:
+          - {name: port1, location: "10.1.1.2;1;1"}
+          - {name: port2, location: "10.1.1.2;1;2"}
+    """
+    with open(path) as f:
+        conf = yaml.safe_load(f)
+
+    slices = conf.get("slices") or slice_ports(
+        [p["name"] for p in conf["setting"]["config"]["ports"]],
+        conf.get("slice_size", 2),
+    )
+    setting = Setting(**conf["setting"])
+    host, port = conf.get("address", "127.0.0.1:0").rsplit(":", 1)
+
+    return dict(
+        setting=setting,
+        slices=slices,
+        location_preemption=conf.get("location_preemption", False),
+        address=(host, int(port)),
+        authkey=str(conf.get("authkey", "")).encode(),
+    )
+
+
+def __main():
+    conf = load_broker_config(sys.argv[1])
+    pool = SessionPool(
+        conf["setting"], conf["slices"], conf["location_preemption"]
+    )
+    server, (host, port) = serve_pool(pool, conf["address"], conf["authkey"])
+    print(f"TG_POOL_ADDRESS={host}:{port} ({len(conf['slices'])} slices)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.teardown()
+
+
+if __name__ == "__main__":
+    __main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from apis.traffic_generator.flow import FixedSeconds
+from apis.traffic_generator.flow import FixedSize
+from apis.traffic_generator.flow import Percentage
+from apis.utils import AttrDict
+from apis.utils import draw_line_chart
+from apis.utils import LineChartData
+from apis.utils import wait_for
+
+RFC2544_FRAME_SIZES = (64, 128, 256, 512, 1024, 1280, 1518)
+
+
+def _frame_size(size):
+    if isinstance(size, dict):
+        if size.get("choice") != "fixed":
+            raise ValueError(f"only FixedSize is supported, got {size}")
+        return size["fixed"]
+    return int(size)
+
+
+class ThroughputTest(object):
+    """
+    RFC 2544 throughput test, finds the maximum rate (in percentage of line
+    rate) without frame loss for each frame size by binary search.
+
+    The flows are applied once, every trial only updates the rate (and the
+    frame size when moving to the next size) of the applied flows through
+    TrafficGenerator.update_flows.
+
+    Args:
+        tg: <type apis.traffic_generator.TrafficGenerator>
+        flows: A Flow or a list of Flow objects to measure, the rate, size
+            and duration of their copies are managed by the test.
+        frame_sizes: A list of frame sizes in bytes or FixedSize objects.
+        duration: Seconds of each trial.
+        resolution: The search stops when the pass/fail rates are closer
+            than `resolution` percent.
+        min_rate: The lower bound of the search.
+        max_rate: The upper bound of the search, it is tried first.
+        loss_tolerance: Acceptable frame loss in percent, 0 by RFC 2544.
+        settle: Seconds to wait for in-flight frames after a trial.
+
+    Typical usage example:
+
+    test = ThroughputTest(
+        tg,
+        Flow("f1", PortTxRx("port1", "port2"), packet=pkt),
+        frame_sizes=[FixedSize(64), FixedSize(1518)],
+        duration=30,
+    )
+    test.run()
+    print(test.table())
+    allure.attach(test.chart().getvalue(), ...)
+    """
+
+    def __init__(
+        self,
+        tg,
+        flows,
+        frame_sizes=RFC2544_FRAME_SIZES,
+        duration=10,
+        resolution=0.5,
+        min_rate=0,
+        max_rate=100,
+        loss_tolerance=0,
+        settle=2,
+    ):
+        self.tg = tg
+        self.flows = flows if isinstance(flows, list) else [flows]
+        self.frame_sizes = [_frame_size(s) for s in frame_sizes]
+        self.duration = duration
+        self.resolution = resolution
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.loss_tolerance = loss_tolerance
+        self.settle = settle
+        self.results = list()
+
+    def __flow_names(self):
+        return [f["name"] for f in self.flows]
+
+    def __frames(self):
+        stats = self.tg.get_flow_stats()
+        names = self.__flow_names()
+        return (
+            sum(stats[n].frames_tx for n in names),
+            sum(stats[n].frames_rx for n in names),
+        )
+
+    def trial(self, rate):
+        """
+        Transmits at `rate` percent for `duration` seconds.
+
+        Returns:
+            An AttrDict of rate, frames_tx, frames_rx, loss (frames) and
+            passed.
+        """
+        self.tg.update_flows(*self.__flow_names(), rate=Percentage(rate))
+        tx_before, rx_before = self.__frames()
+
+        self.tg.start_transmit()
+        wait_for(
+            self.tg.is_transmit_stopped,
+            timeout=self.duration * 2 + 60,
+            delay=self.duration,
+        )
+        time.sleep(self.settle)
+
+        tx, rx = self.__frames()
+        tx, rx = tx - tx_before, rx - rx_before
+        loss = max(tx - rx, 0)
+        passed = tx > 0 and loss * 100 <= tx * self.loss_tolerance
+        logging.info(
+            f"throughput trial: rate={rate}% tx={tx} rx={rx} "
+            f"loss={loss} {'pass' if passed else 'fail'}"
+        )
+
+        return AttrDict(
+            rate=rate, frames_tx=tx, frames_rx=rx, loss=loss, passed=passed
+        )
+
+    def search(self, frame_size):
+        """Returns the result row of the binary search for `frame_size`."""
+        self.tg.update_flows(*self.__flow_names(), size=FixedSize(frame_size))
+
+        trials = list()
+        best = None
+        lo, hi = self.min_rate, self.max_rate
+        rate = hi
+        while True:
+            t = self.trial(rate)
+            trials.append(t)
+            if t.passed:
+                best = t
+                lo = rate
+            else:
+                hi = rate
+
+            if hi - lo <= self.resolution:
+                break
+            rate = round((lo + hi) / 2, 6)
+
+        return AttrDict(
+            frame_size=frame_size,
+            rate=best.rate if best else 0,
+            frames_tx=best.frames_tx if best else 0,
+            frames_rx=best.frames_rx if best else 0,
+            trials=trials,
+        )
+
+    def run(self):
+        """
+        Runs the search for every frame size.
+
+        Returns:
+            A list of AttrDict(frame_size, rate, frames_tx, frames_rx,
+            trials), `rate` is the max zero-loss rate in percent.
+        """
+        # the caller's flows are kept as they are, copies are pushed
+        flows = [flow.clone() for flow in self.flows]
+        for flow in flows:
+            flow.update(
+                size=FixedSize(self.frame_sizes[0]),
+                rate=Percentage(self.max_rate),
+                duration=FixedSeconds(self.duration),
+            )
+        self.tg.set_flows(flows)
+        self.tg.apply_config()
+
+        self.results = [self.search(size) for size in self.frame_sizes]
+        return self.results
+
+    def table(self):
+        lines = [
+            f"{'frame size':>12}{'rate (%)':>12}{'frames tx':>16}"
+            f"{'frames rx':>16}{'trials':>8}"
+        ]
+        for r in self.results:
+            lines.append(
+                f"{r.frame_size:>12}{r.rate:>12.3f}{r.frames_tx:>16}"
+                f"{r.frames_rx:>16}{len(r.trials):>8}"
+            )
+        return "\n".join(lines)
+
+    def chart(self, fmt="PNG"):
+        return draw_line_chart(
+            LineChartData(
+                "zero-loss throughput",
+                [r.frame_size for r in self.results],
+                [r.rate for r in self.results],
+                style="o-",
+            ),
+            xlabel="Frame size (bytes)",
+            ylabel="Throughput (% of line rate)",
+            title="RFC 2544 throughput",
+            fmt=fmt,
+        )
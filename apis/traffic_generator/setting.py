@@ -21,6 +21,24 @@ class Setting(object):
         self.l1_config = json.dumps(dict(layer1=[layer1]))
         self.ports_config = json.dumps(dict(ports=ports))
 
+    def subset(self, port_names):
+        """
+        Returns a new Setting which only contains the ports in `port_names`.
+        """
+        port_names = list(port_names)
+        (layer1,) = json.loads(self.l1_config)["layer1"]
+        ports = [
+            p
+            for p in json.loads(self.ports_config)["ports"]
+            if p["name"] in port_names
+        ]
+        layer1.update(
+            ports=ports,
+            port_names=[n for n in layer1["port_names"] if n in port_names],
+        )
+
+        return Setting(api_server=self.api_server, ext=self.ext, config=layer1)
+
     def __str__(self):
         return json.dumps(
             dict(ports=self.ports_config, layer1=[self.l1_config])
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import time
+
+import numpy as np
+
+from apis.utils.sampler import PeriodicSampler
+from apis.utils.series import SeriesReader
+from apis.utils.series import SeriesWriter
+
+PORT_FIELDS = (
+    "frames_tx",
+    "frames_rx",
+    "bytes_tx",
+    "bytes_rx",
+    "frames_tx_rate",
+    "frames_rx_rate",
+)
+FLOW_FIELDS = (
+    "frames_tx",
+    "frames_rx",
+    "frames_tx_rate",
+    "frames_rx_rate",
+    "loss",
+)
+
+_COUNTER_RE = re.compile(
+    r"^\s*([\w.\-/]+)(?:\s*[:=]\s*|\s+)(-?\d+(?:\.\d+)?)\s*$"
+)
+
+
+def parse_counters(output):
+    """
+    The default parser of DUT counters, it accepts lines of
+    `name value`, `name: value` or `name=value`, e.g. the output of
+    `grep . /sys/class/net/eth0/statistics/* | sed 's|.*/||'`.
+    """
+    counters = dict()
+    for line in output.splitlines():
+        match = _COUNTER_RE.match(line)
+        if match:
+            counters[match.group(1)] = float(match.group(2))
+    return counters
+
+
+class DutCounters(object):
+    """
+    Counters collected by a shell command on a DUT.
+
+    Args:
+        dut: <type apis.openwrt.Dut>
+        cmd: The shell command that prints counters.
+        parse: A function of the command output -> dict of name -> number.
+        every: Collects every `every` samples of the runner, the command
+            costs a round trip to the DUT so it is usually polled slower
+            than the traffic generator. The other samples are NaN.
+
+    Typical usage example:
+
+    DutCounters(
+        dut,
+        "grep . /sys/class/net/eth0/statistics/* | sed 's|.*/||'",
+        every=10,
+    )
+    """
+
+    def __init__(self, dut, cmd, parse=parse_counters, every=1):
+        self.dut = dut
+        self.cmd = cmd
+        self.parse = parse
+        self.every = every
+
+    def collect(self):
+        stdout, _ = self.dut.shell(self.cmd)
+        return {
+            f"dut.{self.dut.name}.{k}": v
+            for k, v in self.parse(stdout).items()
+        }
+
+
+class SoakRunner(object):
+    """
+    Polls port/flow metrics of the traffic generator and DUT counters, and
+    streams them to a series file (see apis.utils.series) instead of
+    keeping them in memory.
+
+    The columns are fixed by the first sample plus `columns`. Counters
+    appearing later are dropped with a warning (see `dropped`) and missing
+    values are NaN, so the DUTs should be reachable when the runner starts
+    or their counters be declared in `columns`. Every start() writes a new
+    file.
+
+    Args:
+        path: The series file to write.
+        tg: <type apis.traffic_generator.TrafficGenerator>, or None to
+            collect DUT counters only.
+        counters: A list of DutCounters.
+        interval: Seconds between samples.
+        fsync_interval: Seconds between fsync of the file.
+        ports: Whether to collect port metrics.
+        flows: Whether to collect flow metrics.
+        meta: A dict of extra information stored in the file header.
+        columns: Names of columns which may be missing in the first
+            sample, e.g. "dut.dut1.rx_packets".
+
+    Typical usage example:
+
+    runner = SoakRunner("soak.bin", tg, [DutCounters(dut, cmd, every=10)])
+    tg.start_transmit()
+    runner.run(24 * 3600)
+
+    series = runner.reader()
+    allure.attach(series.chart("port*.frames_rx_rate").getvalue(), ...)
+    """
+
+    def __init__(
+        self,
+        path,
+        tg=None,
+        counters=(),
+        interval=1.0,
+        fsync_interval=10,
+        ports=True,
+        flows=True,
+        meta=None,
+        columns=(),
+    ):
+        self.path = path
+        self.__tg = tg
+        self.counters = list(counters)
+        self.interval = interval
+        self.fsync_interval = fsync_interval
+        self.ports = ports and tg is not None
+        self.flows = flows and tg is not None
+        self.meta = meta or dict()
+        self.columns = list(columns)
+        self.samples = 0
+        self.errors = 0
+        # names of values dropped because they are not columns of the file
+        self.dropped = set()
+        self.__writer = None
+        self.__sampler = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __collect(self):
+        values = dict(time=time.time())
+        if self.ports:
+            for name, m in self.__tg.get_port_stats().items():
+                for field in PORT_FIELDS:
+                    values[f"port.{name}.{field}"] = getattr(m, field)
+        if self.flows:
+            for name, m in self.__tg.get_flow_stats().items():
+                for field in FLOW_FIELDS:
+                    values[f"flow.{name}.{field}"] = getattr(m, field)
+
+        for counters in self.counters:
+            if self.samples % counters.every:
+                continue
+            try:
+                values.update(counters.collect())
+            except Exception as e:
+                # a DUT hiccup must not stop a soak run, the gap is NaN
+                self.errors += 1
+                logging.warning(
+                    f"soak: failed to collect counters of "
+                    f"{counters.dut.name}: {e}"
+                )
+        return values
+
+    def sample(self):
+        """Collects and writes one sample."""
+        values = self.__collect()
+        if self.__writer is None:
+            self.__writer = SeriesWriter(
+                self.path,
+                list(values) + [c for c in self.columns if c not in values],
+                meta=dict(self.meta, interval=self.interval),
+                fsync_interval=self.fsync_interval,
+            )
+
+        unknown = values.keys() - set(self.__writer.columns)
+        if unknown:
+            new = unknown - self.dropped
+            if new:
+                logging.warning(
+                    f"soak: {', '.join(sorted(new))} are not columns of "
+                    f"{self.path}, they are dropped"
+                )
+                self.dropped |= new
+            values = {k: v for k, v in values.items() if k not in unknown}
+
+        self.__writer.append(
+            {k: np.nan if v is None else v for k, v in values.items()}
+        )
+        self.samples += 1
+
+    def run(self, duration):
+        """Samples for `duration` seconds, blocks until it is done."""
+        self.start()
+        try:
+            # returns early if sampling failed
+            self.__sampler.wait(duration)
+        finally:
+            self.stop()
+
+    def start(self):
+        self.samples = 0
+        self.dropped = set()
+        self.__sampler = PeriodicSampler(
+            self.sample, self.interval, name="soak"
+        )
+        self.__sampler.start()
+
+    def stop(self):
+        if self.__sampler is not None:
+            self.__sampler.stop(check=False)
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+        if self.__sampler is not None:
+            self.__sampler.check()
+
+    def reader(self):
+        """Returns a SeriesReader of the file, also during the run."""
+        return SeriesReader(self.path)
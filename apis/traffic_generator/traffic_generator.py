@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
+import contextlib
+import copy
 import ipaddress
 import json
+from collections import Counter
 
 import snappi
 from pyrsistent import freeze
 
+from apis.traffic_generator.index import ConfigIndex
 from apis.utils import AttrDict
 from apis.utils import wait_for
 
@@ -26,17 +30,171 @@ class TrafficGenerator(object):
         self.setting = setting
         self.__location_preemption = location_preemption
         self.__config_cache = None
+        self.__config_view = None
+        self.__config_index = ConfigIndex()
         self.__flows_config = None
         self.__captures_config = None
         self.__devices_config = None
         self.__lags_config = None
+        self.__protocol_started = False
+        self.__batch = None
+        # number of REST calls made to the API server, by snappi method
+        self.api_calls = Counter()
 
         self.apply_config()
 
     def __repr__(self):
         return str(self.setting)
 
+    def __rest(self, name, *args):
+        self.api_calls[name] += 1
+        return getattr(self.__api, name)(*args)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Defers `apply_config` and transmit/capture/protocol state changes
+        made within the block, and flushes them at the end of the block in
+        the minimum number of API calls:
+
+        1. stop transmit/capture/protocol once if any stop is queued,
+        2. apply config once if any apply is queued,
+        3. start capture/protocol/transmit if its last queued state is
+           start, capture first so it sees all transmitted frames.
+
+        Calls which read the applied config or the ports (e.g.
+        get_flow_stats, send_pings) flush the changes queued so far before
+        they run. Queued state changes are discarded if the block raises.
+        Nested blocks are merged to the outermost one.
+
+        Typical usage example:
+
+        with tg.batch():
+            tg.clear_flows()
+            tg.clear_captures()
+            tg.start_traffic(flows, captures)
+        """
+        if self.__batch is not None:
+            yield self
+            return
+
+        self.__batch = list()
+        try:
+            yield self
+        except BaseException:
+            self.__batch = None
+            raise
+
+        ops, self.__batch = self.__batch, None
+        self.__flush(ops)
+
+    def __sync(self):
+        # flushes the changes queued by the current batch, the batch goes on
+        if not self.__batch:
+            return
+
+        ops, self.__batch = self.__batch, None
+        try:
+            self.__flush(ops)
+        finally:
+            self.__batch = list()
+
+    def __flush(self, ops):
+        states = [op for op in ops if op != "apply"]
+        stops = set(op for op, state in states if state == "stop")
+        last = dict(states)
+        # without ixnetwork, protocols are started/stopped by the transmit
+        # state, one call does both
+        shared = self.setting.ext != "ixnetwork"
+
+        for op in ("transmit", "capture", "protocol"):
+            if op not in stops:
+                continue
+            if op == "protocol" and shared and "transmit" in stops:
+                self.__protocol_started = False
+                continue
+            self.__set_state(op, "stop")
+
+        if "apply" in ops:
+            self.apply_config()
+
+        # capture first, in shared mode starting protocols starts transmit
+        for op in ("capture", "protocol", "transmit"):
+            if last.get(op) != "start":
+                continue
+            if op == "transmit" and shared and last.get("protocol") == "start":
+                continue
+            self.__set_state(op, "start")
+
+    def __queue(self, op, state=None):
+        if self.__batch is None:
+            return False
+
+        self.__batch.append(op if state is None else (op, state))
+        return True
+
+    def __set_state(self, op, state):
+        if op == "transmit":
+            if state == "start" and not self.__config_cache.flows:
+                return
+            ts = self.__api.transmit_state()
+            ts.state = ts.START if state == "start" else ts.STOP
+            self.__rest("set_transmit_state", ts)
+            # without ixnetwork, stopping transmit stops protocols too
+            if state == "stop" and self.setting.ext != "ixnetwork":
+                self.__protocol_started = False
+
+        elif op == "capture":
+            cs = self.__api.capture_state()
+            if state == "start":
+                if not self.__config_cache.captures:
+                    return
+                cs.port_names = list(self.__config_index.capture_ports)
+            cs.state = cs.START if state == "start" else cs.STOP
+            self.__rest("set_capture_state", cs)
+
+        elif state == "start":
+            # FIXME
+            # see: https://github.com/open-traffic-generator/models/pull/154
+            if self.setting.ext == "ixnetwork":
+                self.api_calls["StartAllProtocols"] += 1
+                self.__api._assistant.Ixnetwork.StartAllProtocols(Arg1="sync")
+            else:
+                ts = self.__api.transmit_state()
+                ts.state = ts.START
+                self.__rest("set_transmit_state", ts)
+            self.__protocol_started = True
+
+        else:
+            # FIXME
+            # see: https://github.com/open-traffic-generator/models/pull/154
+            if self.setting.ext == "ixnetwork":
+
+                def __is_ixn_protocol_stopped():
+                    if (
+                        "started"
+                        == self.__api._globals.Topology.refresh().Status
+                    ):
+                        self.__api._assistant.Ixnetwork.StopAllProtocols(
+                            Arg1="sync"
+                        )
+                    return (
+                        "notStarted"
+                        == self.__api._globals.Topology.refresh().Status
+                    )
+
+                self.api_calls["StopAllProtocols"] += 1
+                wait_for(__is_ixn_protocol_stopped, timeout=120)
+            else:
+                ts = self.__api.transmit_state()
+                ts.state = ts.STOP
+                self.__rest("set_transmit_state", ts)
+            self.__protocol_started = False
+
     def apply_config(self):
+        if self.__queue("apply"):
+            return
+
         cfg = self.__api.config()
 
         if self.__config_cache is None or self.setting.ext != "ixnetwork":
@@ -60,16 +218,88 @@ class TrafficGenerator(object):
         if self.__captures_config:
             cfg.captures.deserialize(self.__captures_config)
 
-        self.__api.set_config(cfg)
+        self.__rest("set_config", cfg)
         self.__config_cache = cfg
+        # setting config restarts the topology, protocols need to be started
+        # again
+        self.__protocol_started = False
+        # the view is rebuilt at its next access
+        self.__config_view = None
+        self.__config_index.update(cfg)
 
     @property
     def config(self):
-        return freeze(self.__config_cache)
+        """
+        A read-only view of the applied config, it is built once per
+        `apply_config`.
+        """
+        self.__sync()
+        if self.__config_view is None:
+            self.__config_view = freeze(self.__config_cache)
+        return self.__config_view
+
+    def get_port(self, name):
+        """Returns the applied port config named `name`."""
+        self.__sync()
+        return self.__config_index.ports[name]
+
+    def get_flow(self, name):
+        """Returns the applied flow config named `name`."""
+        self.__sync()
+        return self.__config_index.flows[name]
+
+    def get_device(self, name):
+        """Returns the applied device config named `name`."""
+        self.__sync()
+        return self.__config_index.devices[name]
+
+    def get_flow_ports(self, name):
+        """Returns a tuple of (tx port names, rx port names) of a flow."""
+        self.__sync()
+        return self.__config_index.flow_ports[name]
+
+    def get_capture_names(self, port_name):
+        """Returns the names of captures configured on a port."""
+        self.__sync()
+        return self.__config_index.capture_ports.get(port_name, list())
 
     def set_flows(self, flows_config):
         self.__flows_config = flows_config
 
+    def update_flows(self, *flow_names, **sections):
+        """
+        Replaces sections (e.g. rate, size, duration) of applied flows and
+        pushes the config again without rebuilding the rest of it, which is
+        cheap enough to be called between iterations of a test.
+
+        Args:
+            flow_names: Names of flows to update, all flows if empty.
+            sections: The new value of each section, e.g.
+                rate=Percentage(50), size=FixedSize(128).
+        """
+        flows_config = self.__flows_config or list()
+        names = set(flow_names or (f["name"] for f in flows_config))
+        # the flows given to set_flows are not changed, updated ones are
+        # copies
+        self.__flows_config = [
+            copy.copy(f) if f["name"] in names else f for f in flows_config
+        ]
+        for flow in self.__flows_config:
+            if flow["name"] in names:
+                flow.update(sections)
+
+        if self.__queue("apply"):
+            return
+
+        for flow in self.__config_cache.flows:
+            if flow.name in names:
+                for key, value in sections.items():
+                    getattr(flow, key).deserialize(json.dumps(value))
+
+        self.__rest("set_config", self.__config_cache)
+        self.__protocol_started = False
+        self.__config_view = None
+
     def clear_flows(self):
         self.__flows_config = None
         self.stop_traffic()
@@ -138,11 +368,12 @@ class TrafficGenerator(object):
             }
         }
         """
+        self.__sync()
         metrics = AttrDict()
 
         req = self.__api.metrics_request()
         req.port.port_names = list()
-        for item in self.__api.get_metrics(req).port_metrics:
+        for item in self.__rest("get_metrics", req).port_metrics:
             metrics[item.name] = item
 
         return metrics
@@ -174,12 +405,13 @@ class TrafficGenerator(object):
             }
         }
         """
+        self.__sync()
         metrics = AttrDict()
 
         req = self.__api.metrics_request()
         req.flow.flow_names = list()
 
-        for item in self.__api.get_metrics(req).flow_metrics:
+        for item in self.__rest("get_metrics", req).flow_metrics:
             metrics[item.name] = item
 
         return metrics
@@ -212,11 +444,12 @@ class TrafficGenerator(object):
             }
         }
         """
+        self.__sync()
         metrics = AttrDict()
 
         req = self.__api.metrics_request()
         req.bgpv4.peer_names = list()
-        for item in self.__api.get_metrics(req).bgpv4_metrics:
+        for item in self.__rest("get_metrics", req).bgpv4_metrics:
             metrics[item.name] = item
 
         return metrics
@@ -249,11 +482,12 @@ class TrafficGenerator(object):
             }
         }
         """
+        self.__sync()
         metrics = AttrDict()
 
         req = self.__api.metrics_request()
         req.bgpv6.peer_names = list()
-        for item in self.__api.get_metrics(req).bgpv6_metrics:
+        for item in self.__rest("get_metrics", req).bgpv6_metrics:
             metrics[item.name] = item
 
         return metrics
@@ -267,16 +501,13 @@ class TrafficGenerator(object):
           "port2": <type 'BytesIO'>,
         }
         """
+        self.__sync()
         captures = AttrDict()
 
-        port_names = set(
-            sum([c.port_names for c in self.__config_cache.captures], list())
-        )
-
-        for p in port_names:
+        for p in self.__config_index.capture_ports:
             req = self.__api.capture_request()
             req.port_name = p
-            captures[p] = self.__api.get_capture(req)
+            captures[p] = self.__rest("get_capture", req)
 
         return captures
 
@@ -319,9 +550,8 @@ class TrafficGenerator(object):
         """
         mode = f"ipv{ipaddress.ip_address(dst_ip).version}"
         self.start_protocol()
-        device = next(
-            d for d in self.__config_cache.devices if d.name == device_name
-        )
+        self.__sync()
+        device = self.get_device(device_name)
 
         req = self.__api.ping_request()
 
@@ -331,10 +561,69 @@ class TrafficGenerator(object):
         ip.src_name = getattr(device.ethernet, mode).name
         ip.dst_ip = dst_ip
 
-        res = self.__api.send_ping(req).responses[-1]
+        res = self.__rest("send_ping", req).responses[-1]
 
         return res
 
+    def send_pings(self, endpoints, restart_protocol=False):
+        """
+        API to send ICMP Echo Requests from many endpoints within one ping
+        request. Protocols are only (re)started if they are not started
+        since the last `apply_config` or `restart_protocol` is true.
+
+        Args:
+            endpoints: An iterable of (device name, dst ip) tuples.
+            restart_protocol: Restart protocols before sending pings.
+
+        Returns:
+            A list of AttrDict in the order of `endpoints`, for example:
+
+            [
+                {
+                    "device": "dev1",
+                    "src_name": "dev1_ipv4",
+                    "dst_ip": "1.1.1.2",
+                    "result": "success",
+                },
+            ]
+
+            `result` is None if the endpoint got no response.
+        """
+        endpoints = list(endpoints)
+        self.__sync()
+        if restart_protocol or not self.__protocol_started:
+            self.start_protocol()
+            self.__sync()
+
+        req = self.__api.ping_request()
+        rows = list()
+        for device_name, dst_ip in endpoints:
+            mode = f"ipv{ipaddress.ip_address(dst_ip).version}"
+            device = self.get_device(device_name)
+
+            # FIXME
+            # see: https://github.com/open-traffic-generator/models/pull/154
+            ip = getattr(req.endpoints, mode)()[-1]
+            ip.src_name = getattr(device.ethernet, mode).name
+            ip.dst_ip = dst_ip
+            rows.append(
+                AttrDict(
+                    device=device_name,
+                    src_name=ip.src_name,
+                    dst_ip=dst_ip,
+                    result=None,
+                )
+            )
+
+        responses = {
+            (r.src_name, r.dst_ip): r.result
+            for r in self.__rest("send_ping", req).responses
+        }
+        for row in rows:
+            row.result = responses.get((row.src_name, row.dst_ip))
+
+        return rows
+
     def start_traffic(self, flows, captures=None):
         """
         A high level api to applies flows/captures configuration,
@@ -360,38 +649,21 @@ class TrafficGenerator(object):
             self.set_flows(list(flows))
             self.apply_config()
 
-        if not self.__config_cache.flows:
-            return
-
-        ts = self.__api.transmit_state()
-        ts.state = ts.START
-        self.__api.set_transmit_state(ts)
+        if not self.__queue("transmit", "start"):
+            self.__set_state("transmit", "start")
 
     def start_capture(self, *captures):
         if captures:
             self.set_captures(list(captures))
             self.apply_config()
 
-        if not self.__config_cache.captures:
-            return
-
-        cs = self.__api.capture_state()
-        cs.port_names = set(
-            sum([c.port_names for c in self.__config_cache.captures], list())
-        )
-        cs.state = cs.START
-        self.__api.set_capture_state(cs)
+        if not self.__queue("capture", "start"):
+            self.__set_state("capture", "start")
 
     def start_protocol(self):
-        # FIXME
-        # see: https://github.com/open-traffic-generator/models/pull/154
         self.apply_config()
-        if self.setting.ext == "ixnetwork":
-            self.__api._assistant.Ixnetwork.StartAllProtocols(Arg1="sync")
-        else:
-            ts = self.__api.transmit_state()
-            ts.state = ts.START
-            self.__api.set_transmit_state(ts)
+        if not self.__queue("protocol", "start"):
+            self.__set_state("protocol", "start")
 
     def stop_traffic(self):
         # DEPRECATE WARNING: The naming should be more explicit, use
@@ -400,35 +672,16 @@ class TrafficGenerator(object):
         self.stop_transmit()
 
     def stop_transmit(self):
-        ts = self.__api.transmit_state()
-        ts.state = ts.STOP
-        self.__api.set_transmit_state(ts)
+        if not self.__queue("transmit", "stop"):
+            self.__set_state("transmit", "stop")
 
     def stop_capture(self):
-        cs = self.__api.capture_state()
-        cs.state = cs.STOP
-        self.__api.set_capture_state(cs)
+        if not self.__queue("capture", "stop"):
+            self.__set_state("capture", "stop")
 
     def stop_protocol(self):
-        # FIXME
-        # see: https://github.com/open-traffic-generator/models/pull/154
-        if self.setting.ext == "ixnetwork":
-
-            def __is_ixn_protocol_stopped():
-                if "started" == self.__api._globals.Topology.refresh().Status:
-                    self.__api._assistant.Ixnetwork.StopAllProtocols(
-                        Arg1="sync"
-                    )
-                return (
-                    "notStarted"
-                    == self.__api._globals.Topology.refresh().Status
-                )
-
-            wait_for(__is_ixn_protocol_stopped, timeout=120)
-        else:
-            ts = self.__api.transmit_state()
-            ts.state = ts.STOP
-            self.__api.set_transmit_state(ts)
+        if not self.__queue("protocol", "stop"):
+            self.__set_state("protocol", "stop")
 
     def stop_all(self):
         self.stop_transmit()
@@ -436,21 +689,23 @@ class TrafficGenerator(object):
         self.stop_protocol()
 
     def link_up_ports(self, *port_names):
+        self.__sync()
         ls = self.__api.link_state()
         ls.port_names = port_names
         ls.state = "up"
-        self.__api.set_link_state(ls)
+        self.__rest("set_link_state", ls)
 
     def link_down_ports(self, *port_names):
+        self.__sync()
         ls = self.__api.link_state()
         ls.port_names = port_names
         ls.state = "down"
-        self.__api.set_link_state(ls)
+        self.__rest("set_link_state", ls)
 
     def teardown(self):
         self.stop_all()
 
         # clear all settings (includes l1 settings)
-        self.__api.set_config(self.__api.config())
+        self.__rest("set_config", self.__api.config())
         if getattr(self.__api, "assistant", None):
             self.__api.assistant.Session.remove()
@@ -1,9 +1,32 @@
 # -*- coding: utf-8 -*-
-from apis.utils.classes import AttrDict
-from apis.utils.functions import gen_allure_env
-from apis.utils.functions import mac_int_to_str
-from apis.utils.functions import mac_str_to_int
-from apis.utils.functions import wait_for
-from apis.utils.graph import draw_line_chart
-from apis.utils.graph import LineChartData
-from apis.utils.template import parse_output
+from apis.utils.lazy import lazy_import
+
+_ATTRS = {
+    "build_devices": "apis.utils.address",
+    "format_ipv4": "apis.utils.address",
+    "format_ipv6": "apis.utils.address",
+    "format_macs": "apis.utils.address",
+    "ipv4_range": "apis.utils.address",
+    "ipv6_range": "apis.utils.address",
+    "mac_range": "apis.utils.address",
+    "pattern_values": "apis.utils.address",
+    "AttrDict": "apis.utils.classes",
+    "Record": "apis.utils.classes",
+    "TTLCache": "apis.utils.classes",
+    "gen_allure_env": "apis.utils.functions",
+    "mac_int_to_str": "apis.utils.functions",
+    "mac_str_to_int": "apis.utils.functions",
+    "wait_for": "apis.utils.functions",
+    "draw_line_chart": "apis.utils.graph",
+    "LineChartData": "apis.utils.graph",
+    "local_addresses": "apis.utils.netif",
+    "NetworkIndex": "apis.utils.netif",
+    "PeriodicSampler": "apis.utils.sampler",
+    "SampleBuffer": "apis.utils.sampler",
+    "SeriesReader": "apis.utils.series",
+    "SeriesWriter": "apis.utils.series",
+    "parse_output": "apis.utils.template",
+}
+
+__all__ = list(_ATTRS)
+__getattr__, __dir__ = lazy_import(__name__, _ATTRS)
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+MAC/IPv4/IPv6 address ranges as NumPy integer arrays, formatted in bulk by
+lookup tables, for test beds of thousands of emulated devices.
+
+MACs are uint64, IPv4 addresses are uint32 and IPv6 addresses are
+(count, 2) uint64 arrays of the high and low 64 bits. Ranges do not wrap
+around, a range past the end of the address space raises ValueError.
+
+Usage:
+
+    pipenv run python -m apis.utils.address [count]
+
+benchmarks generating and formatting `count` (default 1M) addresses.
+"""
+import gc
+import sys
+import time
+from ipaddress import IPv4Address
+from ipaddress import IPv6Address
+
+import numpy as np
+
+from apis.utils.functions import mac_int_to_str
+from apis.utils.functions import mac_str_to_int
+
+# left aligned ASCII digits of a byte/16-bit group, padded with NUL which
+# is dropped after the rows are assembled
+_HEX2 = np.frombuffer(
+    "".join(f"{i:02x}" for i in range(256)).encode(), dtype=np.uint8
+).reshape(256, 2)
+_DEC3 = np.frombuffer(
+    b"".join(str(i).encode().ljust(3, b"\0") for i in range(256)),
+    dtype=np.uint8,
+).reshape(256, 3)
+_HEX4 = None
+
+
+def _hex4():
+    # 256 KB, only built by the first IPv6 formatting
+    global _HEX4
+    if _HEX4 is None:
+        _HEX4 = np.frombuffer(
+            b"".join(f"{i:x}".encode().ljust(4, b"\0") for i in range(65536)),
+            dtype=np.uint8,
+        ).reshape(65536, 4)
+    return _HEX4
+
+
+def _lines(buf):
+    """Decodes (count, width) ASCII rows ending with newline, minus NULs."""
+    data = buf.ravel()
+    return data[data != 0].tobytes().decode("ascii").split("\n")[:-1]
+
+
+def _mac_int(mac):
+    return mac_str_to_int(mac) if isinstance(mac, str) else int(mac)
+
+
+def _ipv4_int(address):
+    return int(IPv4Address(address))
+
+
+def _ipv6_int(address):
+    return int(IPv6Address(address))
+
+
+def _check_range(start, count, step, bits):
+    last = start + (count - 1) * step
+    if count > 0 and last >= 1 << bits:
+        raise ValueError(
+            f"{count} addresses from {start:#x} every {step:#x} overflow "
+            f"the {bits}-bit address space"
+        )
+
+
+def mac_range(start, count, step=1):
+    """
+    Returns `count` MACs from `start` (a string or an integer) every `step`
+    as a uint64 array, e.g. step=0x100 increments the fifth byte.
+
+    Raises:
+        ValueError: if the range overflows ff:ff:ff:ff:ff:ff.
+    """
+    start, step = _mac_int(start), _mac_int(step)
+    _check_range(start, count, step, 48)
+    index = np.arange(count, dtype=np.uint64)
+    return index * np.uint64(step) + np.uint64(start)
+
+
+def ipv4_range(start, count, step=1):
+    """
+    Returns `count` IPv4 addresses from `start` every `step` as a uint32
+    array, `step` is an integer or an address, e.g. "0.0.1.0".
+
+    Raises:
+        ValueError: if the range overflows 255.255.255.255.
+    """
+    start, step = _ipv4_int(start), _ipv4_int(step)
+    _check_range(start, count, step, 32)
+    return (
+        np.arange(count, dtype=np.uint64) * np.uint64(step) + np.uint64(start)
+    ).astype(np.uint32)
+
+
+def ipv6_range(start, count, step=1):
+    """
+    Returns `count` IPv6 addresses from `start` every `step` as a (count,
+    2) uint64 array of the high and low 64 bits, `step` is an integer or an
+    address, e.g. "0:0:0:1::".
+
+    Raises:
+        ValueError: if the range overflows the IPv6 address space.
+    """
+    start, step = _ipv6_int(start), _ipv6_int(step)
+    _check_range(start, count, step, 128)
+    index = np.arange(count, dtype=np.uint64)
+    ret = np.empty((count, 2), dtype=np.uint64)
+
+    # index * step + start by 32-bit limbs, so the carries fit in uint64
+    limbs = [
+        np.full(count, (start >> (32 * i)) & 0xFFFFFFFF, dtype=np.uint64)
+        for i in range(4)
+    ]
+    index_limbs = (index & np.uint64(0xFFFFFFFF), index >> np.uint64(32))
+    for i in range(4):
+        s = np.uint64((step >> (32 * i)) & 0xFFFFFFFF)
+        if not s:
+            continue
+        for j, part in enumerate(index_limbs):
+            if i + j < 4:
+                product = part * s
+                limbs[i + j] += product & np.uint64(0xFFFFFFFF)
+                if i + j + 1 < 4:
+                    limbs[i + j + 1] += product >> np.uint64(32)
+    for i in range(3):
+        limbs[i + 1] += limbs[i] >> np.uint64(32)
+        limbs[i] &= np.uint64(0xFFFFFFFF)
+    limbs[3] &= np.uint64(0xFFFFFFFF)
+
+    ret[:, 0] = (limbs[3] << np.uint64(32)) | limbs[2]
+    ret[:, 1] = (limbs[1] << np.uint64(32)) | limbs[0]
+    return ret
+
+
+def format_macs(macs, sep=":"):
+    """Formats a uint64 array of MACs to a list of strings."""
+    macs = np.asarray(macs, dtype=np.uint64)
+    octets = macs.astype(">u8").view(np.uint8).reshape(-1, 8)[:, 2:]
+    buf = np.empty((len(macs), 6, 3), dtype=np.uint8)
+    buf[:, :, :2] = _HEX2[octets]
+    buf[:, :, 2] = ord(sep) if sep else 0
+    buf[:, -1, 2] = ord("\n")
+    return _lines(buf)
+
+
+def format_ipv4(addresses):
+    """Formats a uint32 array of IPv4 addresses to a list of strings."""
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    octets = addresses.astype(">u4").view(np.uint8).reshape(-1, 4)
+    buf = np.empty((len(addresses), 4, 4), dtype=np.uint8)
+    buf[:, :, :3] = _DEC3[octets]
+    buf[:, :, 3] = ord(".")
+    buf[:, -1, 3] = ord("\n")
+    return _lines(buf)
+
+
+def format_ipv6(addresses):
+    """
+    Formats a (count, 2) uint64 array of IPv6 addresses to a list of
+    strings in the RFC 5952 form, e.g. "2001:db8::1".
+    """
+    addresses = np.asarray(addresses, dtype=np.uint64).reshape(-1, 2)
+    count = len(addresses)
+    groups = addresses.astype(">u8").view(">u2").reshape(-1, 8)
+
+    # the longest run of 2+ zero groups (the first one of equal runs) is
+    # compressed to "::"
+    runs = np.zeros((count, 8), dtype=np.int8)
+    zero = groups == 0
+    runs[:, 0] = zero[:, 0]
+    for j in range(1, 8):
+        runs[:, j] = (runs[:, j - 1] + 1) * zero[:, j]
+    length = runs.max(axis=1)
+    end = runs.argmax(axis=1)
+    start = end - length + 1
+
+    buf = np.empty((count, 8, 5), dtype=np.uint8)
+    buf[:, :, :4] = _hex4()[groups.astype(np.uint16)]
+    buf[:, :, 4] = ord(":")
+    buf[:, -1, 4] = ord("\n")
+
+    rows = np.nonzero(length >= 2)[0]
+    if len(rows):
+        column = np.arange(8)
+        compressed = (column >= start[rows, None]) & (
+            column <= end[rows, None]
+        )
+        view = buf[rows]
+        view[compressed] = 0
+        view[:, -1, 4] = ord("\n")
+        view[np.arange(len(rows)), start[rows], 0] = ord(":")
+        # "::" at the beginning takes both colons
+        leading = start[rows] == 0
+        view[leading, 0, 1] = ord(":")
+        buf[rows] = view
+    return _lines(buf)
+
+
+def pattern_values(addresses):
+    """
+    Returns a `values` pattern of a flow packet header field, e.g.
+
+    flow.packet[0]["ethernet"]["src"] = pattern_values(
+        format_macs(mac_range("00:00:11:01:00:01", 1000))
+    )
+    """
+    return {"choice": "values", "values": list(addresses)}
+
+
+def build_devices(
+    port_name,
+    count,
+    mac,
+    ipv4=None,
+    ipv4_gateway=None,
+    ipv4_prefix=24,
+    ipv6=None,
+    ipv6_gateway=None,
+    ipv6_prefix=64,
+    step=1,
+    name="{port}_dev{index}",
+):
+    """
+    Builds `count` emulated devices of a port for
+    TrafficGenerator.set_devices, one ethernet with an optional IPv4 and
+    IPv6 address per device.
+
+    Args:
+        port_name: Name of the port of the devices.
+        count: Number of devices.
+        mac, ipv4, ipv6: The first address, or an array of `count`
+            addresses from mac_range/ipv4_range/ipv6_range.
+        ipv4_gateway, ipv6_gateway: The gateway of all devices.
+        step: Step of the addresses given by the first address, an integer
+            or a dict of "mac", "ipv4" and "ipv6" steps.
+        name: Format of the device names by `port` and `index`, names of
+            the ethernet and IP interfaces get ".eth", ".ipv4" and
+            ".ipv6" appended.
+
+    Returns:
+        A list of snappi device dicts, e.g.
+
+        {
+            "name": "port1_dev0",
+            "container_name": "port1",
+            "ethernet": {
+                "name": "port1_dev0.eth",
+                "mac": "00:00:11:01:00:01",
+                "ipv4": {
+                    "name": "port1_dev0.ipv4",
+                    "address": "11.1.0.1",
+                    "gateway": "11.1.255.254",
+                    "prefix": 16,
+                },
+            },
+        }
+
+    Typical usage example:
+
+    devices = build_devices(
+        "port1", 1000, "00:00:11:01:00:01", ipv4="11.1.0.1",
+        ipv4_gateway="11.1.255.254", ipv4_prefix=16,
+    )
+    tg.set_devices(devices)
+    flw = Flow(
+        "f1",
+        DeviceTxRx([d["name"] for d in devices], ["port2_dev0"]),
+        ...
+    )
+    """
+    steps = step if isinstance(step, dict) else dict.fromkeys(
+        ("mac", "ipv4", "ipv6"), step
+    )
+
+    def _addresses(value, generate, format, key):
+        if value is None:
+            return None
+        if isinstance(value, (str, int)):
+            value = generate(value, count, steps.get(key, 1))
+        return format(value)
+
+    macs = _addresses(mac, mac_range, format_macs, "mac")
+    ipv4s = _addresses(ipv4, ipv4_range, format_ipv4, "ipv4")
+    ipv6s = _addresses(ipv6, ipv6_range, format_ipv6, "ipv6")
+
+    # the device dicts are acyclic, the cyclic GC only slows the build down
+    # as it keeps scanning the growing list
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return [
+            _device(
+                name.format(port=port_name, index=i),
+                port_name,
+                macs[i],
+                ipv4s and (ipv4s[i], ipv4_gateway, ipv4_prefix),
+                ipv6s and (ipv6s[i], ipv6_gateway, ipv6_prefix),
+            )
+            for i in range(count)
+        ]
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _device(name, port_name, mac, ipv4, ipv6):
+    # a snappi device, one ethernet on the port `container_name`
+    eth = {"name": f"{name}.eth", "mac": mac}
+    for key, address in (("ipv4", ipv4), ("ipv6", ipv6)):
+        if address:
+            eth[key] = {
+                "name": f"{name}.{key}",
+                "address": address[0],
+                "gateway": address[1],
+                "prefix": address[2],
+            }
+    return {"name": name, "container_name": port_name, "ethernet": eth}
+
+
+def _bench(count):
+    rows = list()
+
+    def _run(label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        rows.append((label, time.perf_counter() - start))
+        return result
+
+    macs = _run("mac_range", mac_range, "00:00:11:00:00:01", count)
+    _run("format_macs", format_macs, macs)
+    _run(
+        "mac_int_to_str (loop)",
+        lambda: [mac_int_to_str(int(m)) for m in macs],
+    )
+    ipv4s = _run("ipv4_range", ipv4_range, "11.0.0.1", count)
+    _run("format_ipv4", format_ipv4, ipv4s)
+    _run(
+        "IPv4Address (loop)",
+        lambda: [str(IPv4Address(int(a))) for a in ipv4s],
+    )
+    ipv6s = _run("ipv6_range", ipv6_range, "2001:db8::1", count)
+    _run("format_ipv6", format_ipv6, ipv6s)
+    _run(
+        "IPv6Address (loop)",
+        lambda: [
+            str(IPv6Address((int(hi) << 64) | int(lo))) for hi, lo in ipv6s
+        ],
+    )
+    _run(
+        "build_devices",
+        build_devices,
+        "port1",
+        count,
+        "00:00:11:00:00:01",
+        "11.0.0.1",
+        "11.255.255.254",
+        8,
+        "2001:db8::1",
+        "2001:db8::ffff",
+    )
+
+    print(f"{count} addresses")
+    for label, seconds in rows:
+        print(f"{label:<32}{seconds * 1000:>13.1f} ms")
+
+
+if __name__ == "__main__":
+    _bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Micro benchmark helpers.
+
+Usage:
+
+    pipenv run python -m apis.utils.benchmark [module ...]
+
+reports the cold import time of the `apis` packages (or the given modules),
+each measured in a fresh interpreter.
+
+    pipenv run python -m apis.utils.benchmark --classes
+
+compares AttrDict and Record with the previous AttrDict implementation.
+"""
+import copy
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_TARGETS = (
+    "apis.utils",
+    "apis.openwrt.device",
+    "apis.openwrt.dvt",
+    "apis.traffic_generator",
+    "apis.fixtures",
+)
+
+_IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+
+def bench(func, *args, number=10000, repeat=5, **kwargs):
+    """
+    Returns the best average seconds per call of `func(*args, **kwargs)`
+    over `repeat` rounds of `number` calls.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args, **kwargs)
+        best = min(best, (time.perf_counter() - start) / number)
+
+    return best
+
+
+def import_time(module, repeat=5):
+    """
+    Returns the median seconds of importing `module` in a fresh interpreter,
+    None if the module can not be imported.
+    """
+    samples = list()
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return None
+        samples.append(float(proc.stdout.strip()))
+
+    return statistics.median(samples)
+
+
+def bench_classes():
+    """Prints micro benchmarks of AttrDict and Record."""
+    from apis.utils.classes import AttrDict
+    from apis.utils.classes import Record
+
+    class LegacyAttrDict(dict):
+        def __init__(self, *args, **kwargs):
+            super().__init__()
+            self.update(*args, **kwargs)
+
+        def __getattr__(self, attr):
+            if attr in self.keys():
+                return self[attr]
+            else:
+                raise AttributeError(attr)
+
+        def clone(self):
+            return copy.deepcopy(self)
+
+    class FlowMetric(Record):
+        __slots__ = ("name", "frames_tx", "frames_rx", "loss")
+
+    def _flow(cls):
+        return cls(
+            name="f1",
+            tx_rx=cls(choice="port", port=dict(tx_name="p1", rx_name="p2")),
+            packet=[
+                {"choice": "ethernet", "ethernet": {"src": {"value": "0"}}},
+                {"choice": "ipv4", "ipv4": {"src": {"value": "1.1.1.1"}}},
+            ],
+            size=cls(choice="fixed", fixed=128),
+            rate=cls(choice="percentage", percentage=1),
+        )
+
+    legacy, current = _flow(LegacyAttrDict), _flow(AttrDict)
+    fields = dict(name="f1", frames_tx=10, frames_rx=10, loss=0)
+    metric_dict, metric_record = AttrDict(fields), FlowMetric(**fields)
+    cases = (
+        ("attribute hit", lambda: legacy.size, lambda: current.size),
+        (
+            "attribute miss",
+            lambda: hasattr(legacy, "x"),
+            lambda: hasattr(current, "x"),
+        ),
+        ("clone", legacy.clone, current.clone),
+        (
+            "metric attribute",
+            lambda: metric_dict.frames_tx,
+            lambda: metric_record.frames_tx,
+        ),
+        (
+            "metric build",
+            lambda: AttrDict(fields),
+            lambda: FlowMetric(**fields),
+        ),
+    )
+
+    print(f"{'case':<20}{'before (ns)':>14}{'after (ns)':>14}")
+    for name, before, after in cases:
+        number = 2000 if name == "clone" else 200000
+        print(
+            f"{name:<20}"
+            f"{bench(before, number=number) * 1e9:>14.1f}"
+            f"{bench(after, number=number) * 1e9:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--classes"]:
+        bench_classes()
+        sys.exit()
+
+    for module in sys.argv[1:] or IMPORT_TARGETS:
+        seconds = import_time(module)
+        if seconds is None:
+            print(f"{module:<32}{'import failed':>16}")
+        else:
+            print(f"{module:<32}{seconds * 1000:>13.1f} ms")
@@ -1,5 +1,54 @@
 # -*- coding: utf-8 -*-
 import copy
+import threading
+import time
+
+# values of these types are immutable, clones share them
+_IMMUTABLE_TYPES = frozenset(
+    (str, bytes, int, float, complex, bool, type(None), frozenset, range)
+)
+
+
+def _clone(obj, memo):
+    # copy.deepcopy of the containers of configs and stats, objects reached
+    # more than once (shared or cyclic) are copied once as by deepcopy
+    cls = obj.__class__
+    if cls in _IMMUTABLE_TYPES:
+        return obj
+    key = id(obj)
+    if key in memo:
+        return memo[key]
+
+    if cls is dict:
+        new = memo[key] = dict()
+        for k, v in obj.items():
+            new[k] = _clone(v, memo)
+        return new
+    if cls is list:
+        new = memo[key] = list()
+        for v in obj:
+            new.append(_clone(v, memo))
+        return new
+    if cls is tuple:
+        new = tuple([_clone(v, memo) for v in obj])
+        # a tuple in a cycle got copied through one of its items
+        return memo.setdefault(key, new)
+    if isinstance(obj, AttrDict):
+        # bypass __init__ and __setitem__ of subclasses, the items have been
+        # validated (or serialized) when they were set on the original one
+        new = memo[key] = cls.__new__(cls)
+        for k, v in obj.items():
+            dict.__setitem__(new, k, _clone(v, memo))
+        for k, v in obj.__dict__.items():
+            new.__dict__[k] = _clone(v, memo)
+        return new
+    if isinstance(obj, Record):
+        new = memo[key] = cls.__new__(cls)
+        for field in cls._fields:
+            setattr(new, field, _clone(getattr(obj, field), memo))
+        return new
+
+    return copy.deepcopy(obj, memo)
 
 
 class AttrDict(dict):
@@ -8,18 +57,186 @@ class AttrDict(dict):
         self.update(*args, **kwargs)
 
     def __getattr__(self, attr):
-        if attr in self.keys():
+        # only reached when the normal attribute lookup fails
+        try:
             return self[attr]
-        else:
+        except KeyError:
             raise AttributeError(
-                f"'{self.__class__.__name__}' object has no attribute '{attr}'"
-            )
+                f"'{self.__class__.__name__}' object has no attribute "
+                f"'{attr}'"
+            ) from None
 
     def __setattr__(self, attr, value):
-        if attr in self.keys():
+        if attr in self:
             self[attr] = value
         else:
             super().__setattr__(attr, value)
 
     def clone(self):
-        return copy.deepcopy(self)
+        """
+        Returns a deep copy as copy.deepcopy does, containers (dict, list,
+        tuple, AttrDict and Record) are copied while immutable values are
+        shared with the original one.
+        """
+        return _clone(self, dict())
+
+
+class Record(object):
+    """
+    A compact, typed alternative of AttrDict for records created in bulk
+    (e.g. metrics samples). Subclasses list their fields in `__slots__`,
+    the fields of a subclass of a record follow the fields of its parents,
+    fields are readable as attributes or items.
+
+    Typical usage example:
+
+    class PortMetric(Record):
+        __slots__ = ("name", "frames_tx", "frames_rx")
+
+    m = PortMetric("port1", frames_tx=10)
+    m.frames_tx == m["frames_tx"] == 10
+    m.frames_rx is None
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = list()
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            fields.extend(f for f in slots if f not in fields)
+        cls._fields = tuple(fields)
+        cls._field_set = frozenset(fields)
+
+    def __init__(self, *args, **kwargs):
+        if args:
+            if len(args) > len(self._fields):
+                raise TypeError(
+                    f"{self.__class__.__name__} takes {len(self._fields)} "
+                    f"fields but {len(args)} were given"
+                )
+            positional = dict(zip(self._fields, args))
+            if not positional.keys().isdisjoint(kwargs):
+                raise TypeError(
+                    f"{self.__class__.__name__} got repeated fields "
+                    f"{', '.join(positional.keys() & kwargs.keys())}"
+                )
+            kwargs.update(positional)
+        if not kwargs.keys() <= self._field_set:
+            raise TypeError(
+                f"{self.__class__.__name__} got unexpected fields "
+                f"{', '.join(kwargs.keys() - self._field_set)}"
+            )
+        get = kwargs.get
+        for field in self._fields:
+            setattr(self, field, get(field))
+
+    @classmethod
+    def from_object(cls, obj):
+        """Builds a record from the same named attributes of `obj`."""
+        record = cls.__new__(cls)
+        for field in cls._fields:
+            setattr(record, field, getattr(obj, field, None))
+        return record
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and all(
+            getattr(self, f) == getattr(other, f) for f in self._fields
+        )
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"{', '.join(f'{k}={v!r}' for k, v in self.items())})"
+        )
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return [getattr(self, f) for f in self._fields]
+
+    def items(self):
+        return [(f, getattr(self, f)) for f in self._fields]
+
+    def to_dict(self):
+        return AttrDict(self.items())
+
+    def clone(self):
+        return _clone(self, dict())
+
+
+class TTLCache(object):
+    """
+    A dict-like cache whose entries expire `ttl` seconds after they are set.
+
+    Args:
+        ttl: Seconds an entry stays valid, None never expires.
+        clock: A function returning the current time in seconds.
+
+    Typical usage example:
+
+    cache = TTLCache(ttl=300)
+    facts = cache.get_or_set("dut1", lambda: gather_facts("dut1"))
+    cache.invalidate("dut1")
+    """
+
+    _MISSING = object()
+
+    def __init__(self, ttl=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.__entries = dict()
+        self.__lock = threading.RLock()
+
+    def __contains__(self, key):
+        return self.get(key, self._MISSING) is not self._MISSING
+
+    def get(self, key, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                del self.__entries[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        """Sets `key`, `ttl` overrides the default ttl of the cache."""
+        ttl = self.ttl if ttl is self._MISSING else ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+        with self.__lock:
+            self.__entries[key] = (value, expires_at)
+
+    def get_or_set(self, key, func):
+        """
+        Returns the cached value of `key`, or sets it to `func()` if it is
+        missing or expired. Callers of the same cache are serialized, so
+        `func` is called once for concurrent misses.
+        """
+        with self.__lock:
+            value = self.get(key, self._MISSING)
+            if value is self._MISSING:
+                value = func()
+                self.set(key, value)
+            return value
+
+    def invalidate(self, key=_MISSING):
+        """Drops `key`, or all entries if `key` is not given."""
+        with self.__lock:
+            if key is self._MISSING:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 import multiprocessing
-import re
 import time
-from ipaddress import ip_network
+import weakref
 from pathlib import Path
 
+from apis.utils.classes import AttrDict
+from apis.utils.classes import TTLCache
+from apis.utils.netif import local_addresses
+from apis.utils.netif import NetworkIndex
+
+# management networks of dut1 by get_host_ips, keyed by a weak reference
+# of the AdHoc object, so a new AdHoc never gets the networks of a freed
+# one at the same address
+_MGMT_NETWORKS = TTLCache(ttl=300)
+
 
 def wait_for(*func, condition_str=None, interval=1, timeout=60, delay=0):
     """
@@ -50,7 +59,8 @@ def mac_str_to_int(macstr):
 
 
 def mac_int_to_str(macint):
-    return ":".join(re.findall("..", "%012x" % macint))
+    h = f"{macint:012x}"
+    return f"{h[0:2]}:{h[2:4]}:{h[4:6]}:{h[6:8]}:{h[8:10]}:{h[10:12]}"
 
 
 def gen_allure_env(request, properties_str):
@@ -62,46 +72,42 @@ def gen_allure_env(request, properties_str):
         fp.write(properties_str)
 
 
-def get_host_ips(adhoc, ip_type="ipv4"):
-    ip_type = ip_type.lower()
-    localhost_facts = adhoc.run(
-        ["localhost"],
-        "setup",
-        gather_subset="network",
-    )["localhost"]["ansible_facts"]
-    mgmt_nets = adhoc.run(["dut1"], "setup", filter="ansible_eth0")["dut1"][
+def _mgmt_networks(adhoc):
+    eth0 = adhoc.run(["dut1"], "setup", gather_subset="network")["dut1"][
         "ansible_facts"
-    ]["ansible_eth0"][ip_type]
-    if not isinstance(mgmt_nets, list):
-        mgmt_nets = [mgmt_nets]
-
-    # get all available ip addresses
-    networks = []
-    for iface_name in localhost_facts.get("ansible_interfaces", []):
-        inf = localhost_facts.get(f"ansible_{iface_name}", {})
-        if ip_type == "ipv4":
-            networks.append(inf.get(f"{ip_type}", None))
-            networks.extend(inf.get(f"{ip_type}_secondaries", [None]))
-        else:
-            networks.extend(inf.get(f"{ip_type}", [None]))
-
-    def _is_same_network(network):
-        key = "prefix" if ip_type == "ipv6" else "netmask"
-        return any(
-            ip_network(f"{n['address']}/{n[key]}", strict=False)
-            == ip_network(f"{network['address']}/{network[key]}", strict=False)
-            for n in mgmt_nets
-        )
-
-    ip_addresses = []
-    for net in filter(None, networks):
-        # ignore ipv6 link local
-        if ip_type == "ipv6" and net["scope"] == "link":
-            continue
-
-        if not _is_same_network(net):
-            continue
+    ]["ansible_eth0"]
+
+    ipv4 = eth0.get("ipv4")
+    ipv4 = ipv4 if isinstance(ipv4, list) else [ipv4]
+    return AttrDict(
+        ipv4=NetworkIndex(
+            f"{n['address']}/{n['netmask']}" for n in filter(None, ipv4)
+        ),
+        ipv6=NetworkIndex(
+            f"{n['address']}/{n['prefix']}" for n in eth0.get("ipv6", [])
+        ),
+    )
 
-        ip_addresses.append(net["address"])
 
-    return ip_addresses
+def get_host_ips(adhoc, ip_type="ipv4", refresh=False):
+    """
+    Returns the addresses of localhost in the management networks of dut1.
+    The local addresses are read by netlink on every call, the networks of
+    dut1 are gathered once and cached for 5 minutes unless `refresh` is
+    set.
+    """
+    ip_type = ip_type.lower()
+    key = weakref.ref(adhoc)
+    if refresh:
+        _MGMT_NETWORKS.invalidate(key)
+    mgmt_nets = _MGMT_NETWORKS.get_or_set(
+        key, lambda: _mgmt_networks(adhoc)
+    )[ip_type]
+
+    return [
+        a.address
+        for a in local_addresses(ip_type)
+        # ignore ipv6 link local
+        if not (ip_type == "ipv6" and a.scope == "link")
+        and mgmt_nets.match(a.address, a.prefixlen)
+    ]
@@ -2,14 +2,17 @@
 import io
 from dataclasses import dataclass
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
+_ARRAY_TYPES = (list, tuple, np.ndarray)
+
+
 @dataclass
 class LineChartData:
     """
-    The struct of line for plotting
+    The struct of line for plotting, `x` and `y` can be lists or NumPy
+    arrays.
     """
 
     name: str
@@ -20,10 +23,14 @@ class LineChartData:
     def validate(self):
         ret = True
         for field_name, field_def in self.__dataclass_fields__.items():
-            actual_type = type(getattr(self, field_name))
-            if actual_type != field_def.type:
+            value = getattr(self, field_name)
+            expected = field_def.type
+            if expected is list:
+                expected = _ARRAY_TYPES
+            if not isinstance(value, expected):
                 print(
-                    f"\t{field_name}: '{actual_type}' instead of '{field_def.type}'"
+                    f"\t{field_name}: '{type(value)}' "
+                    f"instead of '{field_def.type}'"
                 )
                 ret = False
         return ret
@@ -33,15 +40,65 @@ class LineChartData:
             raise ValueError("Wrong types")
 
 
-def draw_line_chart(*lines, xlabel=None, ylabel=None, fmt="PNG", title=None):
+def decimate(x, y, buckets):
     """
-    A line chart maker by matplotlib.pyplot
+    Reduces a series to the min and max points of each of `buckets` equal
+    slices, the shape of the line is kept at the resolution of `buckets`
+    pixels while the number of points drawn is at most `2 * buckets`.
+
+    Args:
+        x: X values in ascending order.
+        y: Y values.
+        buckets: The number of slices, usually the width of plot in pixels.
+
+    Returns:
+        A tuple of decimated (x, y) NumPy arrays.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if buckets <= 0 or len(y) <= 2 * buckets:
+        return x, y
+
+    size = -(-len(y) // buckets)
+    pad = size * buckets - len(y)
+    rows = np.pad(y, (0, pad), mode="edge").reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + rows.argmin(axis=1)
+    hi = base + rows.argmax(axis=1)
+
+    # keep the points of each slice in their original order
+    idx = np.empty(buckets * 2, dtype=np.intp)
+    idx[0::2] = np.minimum(lo, hi)
+    idx[1::2] = np.maximum(lo, hi)
+    idx = np.minimum(idx, len(y) - 1)
+
+    return x[idx], y[idx]
+
+
+def draw_line_chart(
+    *lines,
+    xlabel=None,
+    ylabel=None,
+    fmt="PNG",
+    title=None,
+    size=(6.4, 4.8),
+    dpi=100,
+    max_points=None,
+):
+    """
+    A line chart maker by the Agg backend of matplotlib. It does not touch
+    the global state of matplotlib.pyplot, so charts can be drawn from
+    threads, and matplotlib is only imported at the first call.
 
     Args:
         # #line: a serial of LineChartData object
         # xlabel: A label of X-axis
         # ylabel: A label of Y-axis
         # fmt: a kind of output format
+        # size: figure size in inches
+        # dpi: dots per inch of the figure
+        # max_points: series longer than `2 * max_points` are decimated by
+        #     `decimate`, defaults to the width of figure in pixels
 
     Returns:
         return io.BytesIO object
@@ -73,20 +130,24 @@ def draw_line_chart(*lines, xlabel=None, ylabel=None, fmt="PNG", title=None):
                 name="Attach to report",
             )
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if max_points is None:
+        max_points = int(size[0] * dpi)
+
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     for line in lines:
-        plt.plot(
-            np.array(line.x),
-            np.array(line.y),
-            line.style,
-            label=line.name,
-        )
-    plt.legend()
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+        x, y = decimate(line.x, line.y, max_points)
+        ax.plot(x, y, line.style, label=line.name)
+    ax.legend()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
     if title:
-        plt.title(title)
+        ax.set_title(title)
 
     figure = io.BytesIO()
-    plt.savefig(figure, format=fmt)
-    plt.close()
+    fig.savefig(figure, format=fmt)
     return figure
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import importlib
+import sys
+import threading
+
+
+def lazy_import(package, attrs):
+    """
+    Builds the module level `__getattr__` and `__dir__` (PEP 562) of a
+    package whose public names are imported at their first access.
+
+    Args:
+        package: The `__name__` of the package.
+        attrs: A dict maps each public name to the module providing it.
+
+    Typical usage example:
+
+    __all__ = ["AttrDict"]
+    __getattr__, __dir__ = lazy_import(
+        __name__, {"AttrDict": "apis.utils.classes"}
+    )
+    """
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name):
+        if name not in attrs:
+            raise AttributeError(
+                f"module '{package}' has no attribute '{name}'"
+            )
+
+        value = getattr(importlib.import_module(attrs[name]), name)
+        # cache it, later accesses do not reach __getattr__ anymore
+        namespace[name] = value
+        _run_pending()
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(attrs))
+
+    return __getattr__, __dir__
+
+
+# module name -> callbacks of when_imported, run by the lazy imports of
+# lazy_import once the module shows up in sys.modules
+_PENDING = dict()
+_PENDING_LOCK = threading.Lock()
+
+
+def _run_pending():
+    if not _PENDING:
+        return
+    with _PENDING_LOCK:
+        ready = [
+            (name, _PENDING.pop(name))
+            for name in list(_PENDING)
+            if name in sys.modules
+        ]
+    for name, callbacks in ready:
+        for callback in callbacks:
+            callback(sys.modules[name])
+
+
+def when_imported(module, callback):
+    """
+    Calls `callback(module)` at once if `module` is imported, otherwise
+    after the member of a lazy_import package which imports it is first
+    accessed, so patches of an optional dependency do not import it up
+    front. No import hook is installed, a module imported by other means
+    is only seen at the next lazy import.
+
+    Returns:
+        A function which drops the callback if it was not called yet.
+
+    Typical usage example:
+
+    when_imported(
+        "scapy.packet",
+        lambda module: setattr(module.Packet, "__repr__", _packet_repr),
+    )
+    """
+    with _PENDING_LOCK:
+        if module not in sys.modules:
+            callbacks = _PENDING.setdefault(module, list())
+            callbacks.append(callback)
+
+            def _cancel():
+                with _PENDING_LOCK:
+                    if callback in _PENDING.get(module, ()):
+                        callbacks.remove(callback)
+
+            return _cancel
+
+    callback(sys.modules[module])
+    return lambda: None
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Local interface addresses read by one rtnetlink dump, and an index of
+networks keyed by prefix length, so matching an address is a set lookup
+per prefix length instead of comparing ip_network objects.
+"""
+import os
+import socket
+import struct
+from ipaddress import ip_address
+from ipaddress import ip_network
+
+from apis.utils.classes import AttrDict
+
+_NLMSG_ERROR = 2
+_NLMSG_DONE = 3
+_RTM_NEWADDR = 20
+_RTM_GETADDR = 22
+_NLM_F_REQUEST = 0x1
+_NLM_F_DUMP = 0x300
+_IFA_ADDRESS = 1
+_IFA_LOCAL = 2
+_IFA_LABEL = 3
+
+_NLMSGHDR = struct.Struct("=LHHLL")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTATTR = struct.Struct("=HH")
+
+# the scope names of `ip addr`, also used by the Ansible network facts
+_SCOPES = {0: "global", 200: "site", 253: "link", 254: "host"}
+_FAMILIES = {socket.AF_INET: "ipv4", socket.AF_INET6: "ipv6"}
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attrs(data, offset, end):
+    while offset + _RTATTR.size <= end:
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        start, stop = offset + _RTATTR.size, offset + length
+        yield kind, data[start:stop]
+        offset += _align(length)
+
+
+def _dump(family):
+    sock = socket.socket(
+        socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE
+    )
+    try:
+        sock.bind((0, 0))
+        body = _IFADDRMSG.pack(family, 0, 0, 0, 0)
+        sock.send(
+            _NLMSGHDR.pack(
+                _NLMSGHDR.size + len(body),
+                _RTM_GETADDR,
+                _NLM_F_REQUEST | _NLM_F_DUMP,
+                1,
+                0,
+            )
+            + body
+        )
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                length, kind, _, _, _ = _NLMSGHDR.unpack_from(data, offset)
+                if kind == _NLMSG_DONE:
+                    return
+                if kind == _NLMSG_ERROR:
+                    (errno,) = struct.unpack_from(
+                        "=i", data, offset + _NLMSGHDR.size
+                    )
+                    raise OSError(-errno, os.strerror(-errno))
+                if kind == _RTM_NEWADDR:
+                    yield data, offset + _NLMSGHDR.size, offset + length
+                offset += _align(length)
+    finally:
+        sock.close()
+
+
+def local_addresses(ip_type=None):
+    """
+    Returns the addresses of the local interfaces, like `ip addr`, read by
+    one rtnetlink dump instead of the Ansible setup module.
+
+    Args:
+        ip_type: "ipv4", "ipv6" or None for both.
+
+    Returns:
+        A list of AttrDict(interface, address, prefixlen, ip_type, scope)
+        in the order of interface index.
+    """
+    family = {"ipv4": socket.AF_INET, "ipv6": socket.AF_INET6, None: 0}[
+        ip_type and ip_type.lower()
+    ]
+    names = dict(socket.if_nameindex())
+    ret = list()
+    for data, offset, end in _dump(family):
+        af, prefixlen, _, scope, index = _IFADDRMSG.unpack_from(data, offset)
+        if af not in _FAMILIES:
+            continue
+
+        attrs = dict(_attrs(data, offset + _IFADDRMSG.size, end))
+        # IFA_ADDRESS is the peer of point-to-point IPv4 interfaces
+        raw = attrs.get(_IFA_LOCAL) or attrs.get(_IFA_ADDRESS)
+        if raw is None:
+            continue
+        label = attrs.get(_IFA_LABEL)
+        ret.append(
+            AttrDict(
+                interface=names.get(index)
+                or (label.rstrip(b"\0").decode() if label else str(index)),
+                address=socket.inet_ntop(af, raw),
+                prefixlen=prefixlen,
+                ip_type=_FAMILIES[af],
+                scope=_SCOPES.get(scope, str(scope)),
+            )
+        )
+    return ret
+
+
+class NetworkIndex(object):
+    """
+    A set of IPv4/IPv6 networks keyed by prefix length, each network is
+    kept as the integer of its network bits.
+
+    Typical usage example:
+
+    index = NetworkIndex(["192.168.1.0/24", "fd00::/64"])
+    index.match("192.168.1.10", 24)  # True, in the same /24
+    index.lookup("192.168.1.10")  # "192.168.1.0/24"
+    """
+
+    def __init__(self, networks=()):
+        self.__prefixes = {4: dict(), 6: dict()}
+        for network in networks:
+            self.add(network)
+
+    def __len__(self):
+        return sum(
+            len(keys) for p in self.__prefixes.values() for keys in p.values()
+        )
+
+    def add(self, network, prefixlen=None):
+        """
+        Adds `network`, a string of "address/prefixlen" or an address with
+        `prefixlen`, host bits are ignored.
+        """
+        if prefixlen is not None:
+            network = f"{network}/{prefixlen}"
+        network = ip_network(network, strict=False)
+        bits = network.max_prefixlen - network.prefixlen
+        self.__prefixes[network.version].setdefault(
+            network.prefixlen, set()
+        ).add(int(network.network_address) >> bits)
+
+    def match(self, address, prefixlen):
+        """Whether the network of `address`/`prefixlen` is in the index."""
+        address = ip_address(address)
+        keys = self.__prefixes[address.version].get(prefixlen)
+        if not keys:
+            return False
+        return int(address) >> (address.max_prefixlen - prefixlen) in keys
+
+    def lookup(self, address):
+        """
+        Returns the longest network containing `address` as a string, None
+        if no network contains it.
+        """
+        address = ip_address(address)
+        value = int(address)
+        prefixes = self.__prefixes[address.version]
+        for prefixlen in sorted(prefixes, reverse=True):
+            bits = address.max_prefixlen - prefixlen
+            if value >> bits in prefixes[prefixlen]:
+                network = type(address)(value >> bits << bits)
+                return f"{network}/{prefixlen}"
+        return None
@@ -1,2 +1,9 @@
 # -*- coding: utf-8 -*-
-from apis.utils.packet.mask import Mask
+from apis.utils.lazy import lazy_import
+
+_ATTRS = {
+    "Mask": "apis.utils.packet.mask",
+}
+
+__all__ = list(_ATTRS)
+__getattr__, __dir__ = lazy_import(__name__, _ATTRS)
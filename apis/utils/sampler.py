@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import numpy as np
+
+
+class PeriodicSampler(object):
+    """
+    Calls `func` every `interval` seconds in a background thread. The calls
+    are scheduled at fixed deadlines, so the time `func` takes does not
+    drift the period. The first exception of `func` stops sampling and is
+    raised by `check` and `stop`.
+
+    Args:
+        func: The function to call, without arguments.
+        interval: Seconds between calls.
+        name: Name of the thread.
+
+    Typical usage example:
+
+    sampler = PeriodicSampler(collector.sample, interval=1)
+    sampler.start()
+    ...
+    sampler.stop()
+    """
+
+    def __init__(self, func, interval, name=None):
+        self.func = func
+        self.interval = interval
+        self.name = name
+        self.error = None
+        self.__thread = None
+        self.__stop = threading.Event()
+
+    def __run(self):
+        deadline = time.monotonic()
+        while not self.__stop.is_set():
+            try:
+                self.func()
+            except Exception as e:
+                self.error = e
+                return
+
+            deadline += self.interval
+            self.__stop.wait(max(0, deadline - time.monotonic()))
+
+    def start(self):
+        self.error = None
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__run, name=self.name, daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self, check=True):
+        """
+        Stops sampling, raises the error of `func` if it failed and
+        `check`.
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if check:
+            self.check()
+
+    def wait(self, seconds):
+        """
+        Blocks for `seconds`, or until sampling stopped (or failed) if it
+        is sooner.
+        """
+        thread = self.__thread
+        if thread is None:
+            return
+        thread.join(seconds)
+
+    def check(self):
+        """Raises the error of `func` if it failed."""
+        if self.error is not None:
+            raise self.error
+
+
+class SampleBuffer(object):
+    """
+    A (rows, samples, columns) float64 array of samples, e.g. flows x time
+    x counters, and the time of each sample. The capacity is doubled when
+    it is full. Samples may be appended by one thread while others read
+    them through `snapshot`.
+
+    Args:
+        rows: Number of rows of a sample.
+        columns: Number of values of a row.
+        capacity: Initial number of samples.
+        fill: Value of rows not set yet.
+    """
+
+    def __init__(self, rows, columns, capacity=1024, fill=np.nan):
+        self.fill = fill
+        self.size = 0
+        self.__lock = threading.Lock()
+        self.__data = np.full((rows, capacity, columns), fill)
+        self.__times = np.zeros(capacity)
+
+    def __len__(self):
+        return self.size
+
+    def __grow(self):
+        self.__data = np.concatenate(
+            (self.__data, np.full_like(self.__data, self.fill)), axis=1
+        )
+        self.__times = np.concatenate(
+            (self.__times, np.zeros_like(self.__times))
+        )
+
+    def append(self, rows, at):
+        """Appends a sample of `rows` (rows x columns) taken at `at`."""
+        with self.__lock:
+            if self.size == self.__times.shape[0]:
+                self.__grow()
+            self.__data[:, self.size] = rows
+            self.__times[self.size] = at
+            self.size += 1
+
+    def last(self):
+        """The rows of the last sample, None if empty."""
+        return self.__data[:, self.size - 1] if self.size else None
+
+    def snapshot(self):
+        """
+        Returns:
+            A tuple of the (rows, samples, columns) array of the samples and
+            the time of each sample, both of the same samples. Later
+            appends do not change them.
+        """
+        with self.__lock:
+            size = self.size
+            return self.__data[:, :size], self.__times[:size]
+
+    @property
+    def data(self):
+        """The (rows, samples, columns) array of the samples."""
+        return self.snapshot()[0]
+
+    @property
+    def times(self):
+        """The time of each sample."""
+        return self.snapshot()[1]
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+An append-only file of fixed-width float64 records, for time series that
+are too long to be kept in memory (e.g. metrics of a 24 hours soak test).
+
+File layout:
+
+    MAGIC (8 bytes) | header length (uint32 LE) | JSON header | padding
+    record 0 | record 1 | ...
+
+The JSON header has the column names and user metadata, padding aligns the
+records to 8 bytes. Every record is len(columns) little-endian float64, so
+the number of records is known from the file size, and a partially written
+record of a crashed run is simply ignored by the reader.
+"""
+import fnmatch
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from apis.utils.graph import draw_line_chart
+from apis.utils.graph import LineChartData
+
+MAGIC = b"MSPSER01"
+DTYPE = np.dtype("<f8")
+
+
+class SeriesWriter(object):
+    """
+    Appends records to a series file, the records are flushed and fsync'ed
+    every `fsync_interval` seconds.
+
+    Args:
+        path: The file to create, it is truncated if it exists.
+        columns: Names of the columns, the first one is usually "time".
+        meta: A JSON serializable dict stored in the header.
+        fsync_interval: Seconds between fsync, 0 to fsync every record.
+
+    Typical usage example:
+
+    with SeriesWriter("soak.bin", ["time", "port1.frames_rx"]) as w:
+        w.append([time.time(), 100])
+    """
+
+    def __init__(self, path, columns, meta=None, fsync_interval=10):
+        self.path = path
+        self.columns = list(columns)
+        self.__index = set(self.columns)
+        self.fsync_interval = fsync_interval
+        self.records = 0
+
+        header = json.dumps(
+            dict(columns=self.columns, meta=meta or dict())
+        ).encode()
+        offset = len(MAGIC) + 4 + len(header)
+        header += b" " * (-offset % DTYPE.itemsize)
+
+        self.__file = open(path, "wb")
+        self.__file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.__sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __sync(self):
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__synced_at = time.monotonic()
+
+    def append(self, values):
+        """
+        Appends a record, `values` is a sequence of len(columns) numbers, or
+        a dict of column name -> number where missing columns are NaN.
+
+        Raises:
+            ValueError: if the dict has keys which are not columns.
+        """
+        if isinstance(values, dict):
+            unknown = values.keys() - self.__index
+            if unknown:
+                raise ValueError(
+                    f"unknown columns {', '.join(sorted(unknown))}, columns "
+                    f"are fixed when the file is created"
+                )
+            values = [values.get(c, np.nan) for c in self.columns]
+
+        record = np.asarray(values, dtype=DTYPE)
+        if record.shape != (len(self.columns),):
+            raise ValueError(
+                f"expected {len(self.columns)} values, got {record.shape}"
+            )
+
+        self.__file.write(record.tobytes())
+        self.records += 1
+        if time.monotonic() - self.__synced_at >= self.fsync_interval:
+            self.__sync()
+
+    def close(self):
+        if not self.__file.closed:
+            self.__sync()
+            self.__file.close()
+
+
+class SeriesReader(object):
+    """
+    Memory-maps a series file, only the pages of accessed columns/rows are
+    read from disk.
+
+    Typical usage example:
+
+    series = SeriesReader("soak.bin")
+    series["port1.frames_rx"]
+    series.select("port*.frames_rx_rate")
+    series.chart("port*.frames_rx", ylabel="Frames")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a series file")
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+
+        self.columns = header["columns"]
+        self.meta = header["meta"]
+        self.__index = {c: i for i, c in enumerate(self.columns)}
+
+        offset = len(MAGIC) + 4 + length
+        width = len(self.columns) * DTYPE.itemsize
+        # a partially written tail record is ignored
+        rows = (os.path.getsize(path) - offset) // width
+        if rows:
+            self.data = np.memmap(
+                path,
+                dtype=DTYPE,
+                mode="r",
+                offset=offset,
+                shape=(rows, len(self.columns)),
+            )
+        else:
+            self.data = np.empty((0, len(self.columns)), dtype=DTYPE)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, column):
+        return self.data[:, self.__index[column]]
+
+    def select(self, *patterns):
+        """
+        Returns:
+            A dict of column name -> array of the columns matching any of
+            the fnmatch `patterns`.
+        """
+        return {
+            c: self[c]
+            for c in self.columns
+            if any(fnmatch.fnmatchcase(c, p) for p in patterns)
+        }
+
+    def chart(
+        self,
+        *patterns,
+        x="time",
+        xlabel="Time (s)",
+        ylabel="",
+        title="",
+        max_points=None,
+        fmt="PNG",
+    ):
+        """
+        Draws the columns matching `patterns` against column `x`, `x` is
+        shifted to start from 0. See apis.utils.draw_line_chart.
+        """
+        xs = np.asarray(self[x])
+        if xs.size:
+            xs = xs - xs[0]
+
+        lines = [
+            LineChartData(name, xs, np.asarray(ys))
+            for name, ys in self.select(*patterns).items()
+            if name != x
+        ]
+        return draw_line_chart(
+            *lines,
+            xlabel=xlabel,
+            ylabel=ylabel,
+            title=title,
+            fmt=fmt,
+            max_points=max_points,
+        )
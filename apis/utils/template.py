@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from io import BytesIO
+import threading
+from io import StringIO
 from pathlib import Path
 
 from textfsm import TextFSM
@@ -8,15 +9,31 @@ _BASEDIR = Path(
     str(Path(__file__).parent),
     "templates",
 )
+# template name -> template text
 TEMPLATES = dict()
+# compiled TextFSM objects are stateful, they are cached per thread
+_COMPILED = threading.local()
 
 
-def parse_output(tmpl, output):
-    if tmpl not in TEMPLATES.keys():
-        with open(Path(_BASEDIR, tmpl), "rb") as f:
-            TEMPLATES[tmpl] = BytesIO(f.read())
+def compile_template(tmpl):
+    """
+    Returns the TextFSM of template `tmpl` (a name under templates/ or a
+    path), it is compiled once per thread and reset before it is returned,
+    so parsing many outputs does not recompile the template.
+    """
+    compiled = _COMPILED.__dict__.setdefault("fsms", dict())
+    fsm = compiled.get(tmpl)
+    if fsm is None:
+        if tmpl not in TEMPLATES:
+            TEMPLATES[tmpl] = Path(_BASEDIR, tmpl).read_text()
+        fsm = compiled[tmpl] = TextFSM(StringIO(TEMPLATES[tmpl]))
 
-    return TextFSM(TEMPLATES[tmpl]).ParseTextToDicts(output)
+    fsm.Reset()
+    return fsm
+
+
+def parse_output(tmpl, output):
+    return compile_template(tmpl).ParseTextToDicts(output)
 
 
 def __utest():
@@ -2,6 +2,7 @@
 import pytest
 
 from apis.openwrt.device import Dut
+from apis.openwrt.topology import init_duts
 from apis.utils import AttrDict
 
 
@@ -24,10 +25,20 @@ def topo(request, adhoc):
     # clingenv_url = request.config.getoption("--clingenv_url")
     # skip_tg = request.config.getoption("--skip_tg_init")
     for host in adhoc.hosts:
-        print(f"Connected by {str(host.name)}")
         topo[host.name] = Dut(adhoc, host, [])
 
-    yield topo
+    try:
+        # connectivity check and board info of all DUTs in parallel
+        init_duts(
+            topo.values(),
+            timeout=request.config.getoption("--topo_timeout"),
+            max_workers=request.config.getoption("--topo_workers"),
+        )
+
+        yield topo
+    finally:
+        for dut in topo.values():
+            dut.close()
 
 
 def pytest_addoption(parser):
@@ -37,6 +48,20 @@ def pytest_addoption(parser):
         default="dev",
         help="Specifyi test environment",
     )
+    parser.addoption(
+        "--topo_timeout",
+        action="store",
+        type=float,
+        default=120,
+        help="Seconds to wait for the DUTs to be set up",
+    )
+    parser.addoption(
+        "--topo_workers",
+        action="store",
+        type=int,
+        default=None,
+        help="Number of DUTs set up in parallel, all at once by default",
+    )
 
 
 @pytest.fixture(scope="function")
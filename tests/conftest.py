@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import functools
+import json
+import os
+
+import pytest
+import snappi
+
+from apis.traffic_generator import Setting
+from apis.traffic_generator import TrafficGenerator
+
+# the DVT modules are generated by protoc 3, newer protobuf runtimes only
+# load them by the pure Python implementation
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "python")
+
+_REST_METHODS = (
+    "set_config",
+    "set_transmit_state",
+    "set_capture_state",
+    "set_link_state",
+)
+
+
+def _record(calls, name, payload):
+    calls.append((name, json.loads(payload.serialize())))
+
+
+def _ping(api, payload):
+    # every endpoint succeeds
+    _record(api.calls, "send_ping", payload)
+    response = api.ping_response()
+    for endpoint in api.calls[-1][1]["endpoints"]:
+        ip = endpoint[endpoint["choice"]]
+        response.responses.response(
+            src_name=ip["src_name"], dst_ip=ip["dst_ip"], result="success"
+        )
+    return response
+
+
+@pytest.fixture
+def snappi_api(monkeypatch):
+    """
+    A snappi API without server which snappi.api returns, its set_* and
+    send_ping calls are kept as (method name, payload dict) in `calls`.
+    """
+    api = snappi.api(location="https://127.0.0.1:1", ext=None)
+    api.calls = list()
+    for name in _REST_METHODS:
+        monkeypatch.setattr(
+            api, name, functools.partial(_record, api.calls, name)
+        )
+    monkeypatch.setattr(api, "send_ping", functools.partial(_ping, api))
+    monkeypatch.setattr(snappi, "api", lambda **kwargs: api)
+    return api
+
+
+@pytest.fixture
+def setting():
+    return Setting(
+        api_server="https://127.0.0.1:1",
+        config=dict(
+            ports=[
+                dict(name="port1", location="10.0.0.1;1;1"),
+                dict(name="port2", location="10.0.0.1;1;2"),
+            ],
+        ),
+    )
+
+
+@pytest.fixture
+def tg(snappi_api, setting):
+    return TrafficGenerator(setting)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+from ipaddress import IPv4Address
+from ipaddress import IPv6Address
+
+import pytest
+
+from apis.traffic_generator.index import ConfigIndex
+from apis.utils.address import build_devices
+from apis.utils.address import format_ipv4
+from apis.utils.address import format_ipv6
+from apis.utils.address import format_macs
+from apis.utils.address import ipv4_range
+from apis.utils.address import ipv6_range
+from apis.utils.address import mac_range
+from apis.utils.functions import mac_int_to_str
+
+
+def _ipv6_values():
+    rng = random.Random(0)
+    values = [0, 1, (1 << 128) - 1, int(IPv6Address("2001:db8::1"))]
+    # zero groups at every position, so every "::" placement is formatted
+    for _ in range(2000):
+        groups = [rng.choice((0, 0, 1, 0xABCD)) for _ in range(8)]
+        values.append(int("".join(f"{g:04x}" for g in groups), 16))
+    return values
+
+
+def test_format_macs_matches_mac_int_to_str():
+    rng = random.Random(0)
+    values = [0, (1 << 48) - 1] + [rng.getrandbits(48) for _ in range(1000)]
+
+    assert format_macs(values) == [mac_int_to_str(v) for v in values]
+
+
+def test_format_ipv4_matches_ipaddress():
+    rng = random.Random(0)
+    values = [0, (1 << 32) - 1] + [rng.getrandbits(32) for _ in range(1000)]
+
+    assert format_ipv4(values) == [str(IPv4Address(v)) for v in values]
+
+
+def test_format_ipv6_matches_ipaddress():
+    values = _ipv6_values()
+    addresses = [(v >> 64, v & ((1 << 64) - 1)) for v in values]
+
+    assert format_ipv6(addresses) == [str(IPv6Address(v)) for v in values]
+
+
+def test_ranges_step_and_reach_the_last_address():
+    assert format_macs(mac_range("ff:ff:ff:ff:fe:ff", 2, 0x100)) == [
+        "ff:ff:ff:ff:fe:ff",
+        "ff:ff:ff:ff:ff:ff",
+    ]
+    assert format_ipv4(ipv4_range("10.0.0.1", 3, "0.0.1.0")) == [
+        "10.0.0.1",
+        "10.0.1.1",
+        "10.0.2.1",
+    ]
+    assert format_ipv6(ipv6_range("2001:db8::ffff:ffff", 2)) == [
+        "2001:db8::ffff:ffff",
+        "2001:db8::1:0:0",
+    ]
+
+
+@pytest.mark.parametrize(
+    "generate, start, step",
+    [
+        (mac_range, "ff:ff:ff:ff:ff:ff", 1),
+        (ipv4_range, "255.255.255.0", "0.0.1.0"),
+        (ipv6_range, "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff", 1),
+    ],
+)
+def test_ranges_do_not_wrap(generate, start, step):
+    with pytest.raises(ValueError, match="overflow"):
+        generate(start, 2, step)
+
+
+def test_devices_are_deserialized_by_snappi(snappi_api):
+    devices = build_devices(
+        "port1",
+        3,
+        "00:00:11:01:00:01",
+        ipv4="11.1.0.1",
+        ipv4_gateway="11.1.255.254",
+        ipv4_prefix=16,
+        ipv6="2001:db8::1",
+        ipv6_gateway="2001:db8::ffff",
+    )
+    cfg = snappi_api.config()
+    cfg.devices.deserialize(json.dumps(devices))
+    index = ConfigIndex()
+    index.update(cfg)
+
+    device = index.devices["port1_dev2"]
+    assert device.container_name == "port1"
+    assert device.ethernet.mac == "00:00:11:01:00:03"
+    assert device.ethernet.ipv4.address == "11.1.0.3"
+    assert device.ethernet.ipv4.prefix == 16
+    assert device.ethernet.ipv6.address == "2001:db8::3"
+    assert device.ethernet.ipv6.gateway == "2001:db8::ffff"
+    assert index.endpoints["port1_dev2.ipv6"] == "port1"
+    assert len(index.endpoints) == 9
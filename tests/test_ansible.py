@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+from ansible.errors import AnsibleError
+
+from apis.ansible import ansible
+from apis.utils import AttrDict
+
+
+class _TaskQueueManager(object):
+    # reports every host of the play ok, except "down"
+    active = 0
+    overlapped = False
+    forks = list()
+
+    def __init__(self, stdout_callback, forks=None, **kwargs):
+        self.callback = stdout_callback
+        _TaskQueueManager.forks.append(forks)
+
+    def run(self, play):
+        cls = _TaskQueueManager
+        cls.active += 1
+        cls.overlapped |= cls.active > 1
+        time.sleep(0.02)
+        cls.active -= 1
+        for host in play.hosts:
+            result = AttrDict(
+                _host=AttrDict(name=host), _result=dict(stdout=host)
+            )
+            if host == "down":
+                self.callback.v2_runner_on_unreachable(result)
+            else:
+                self.callback.v2_runner_on_ok(result)
+
+    def cleanup(self):
+        pass
+
+
+class _Play(object):
+    def load(self, source, **kwargs):
+        return AttrDict(hosts=source["hosts"])
+
+
+@pytest.fixture
+def adhoc(tmp_path, monkeypatch):
+    monkeypatch.setattr(ansible, "TaskQueueManager", _TaskQueueManager)
+    monkeypatch.setattr(ansible, "Play", _Play)
+    _TaskQueueManager.forks = list()
+    _TaskQueueManager.overlapped = False
+    inventory = tmp_path / "hosts"
+    inventory.write_text("[topology]\ndut1\ndut2\n")
+    return ansible.AdHoc(str(inventory))
+
+
+def test_runs_are_serialized(adhoc):
+    threads = [
+        threading.Thread(target=adhoc.run, args=([f"dut{i}"], "raw", "id"))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(_TaskQueueManager.forks) == 4
+    assert not _TaskQueueManager.overlapped
+
+
+def test_unreachable_hosts(adhoc):
+    with pytest.raises(AnsibleError, match="unreachable"):
+        adhoc.run(["dut1", "down"], "raw", "id")
+
+    results = adhoc.run_each(["dut1", "down"], "raw", "id", forks=2)
+    assert results.dut1.ok and results.dut1.stdout == "dut1"
+    assert results.down.unreachable and results.down.failed
+    assert _TaskQueueManager.forks[-1] == 2
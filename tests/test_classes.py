@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from apis.utils import AttrDict
+from apis.utils import Record
+
+
+class _Port(Record):
+    __slots__ = ("name", "frames_tx")
+
+
+class _LinkPort(_Port):
+    __slots__ = ("speed",)
+
+
+def test_attr_dict_attributes():
+    d = AttrDict(a=1)
+    d.a = 2
+
+    assert d.a == d["a"] == 2
+    with pytest.raises(AttributeError, match="has no attribute 'b'"):
+        d.b
+
+
+def test_record_fields_follow_the_parents():
+    port = _LinkPort("port1", speed=100)
+
+    assert _LinkPort._fields == ("name", "frames_tx", "speed")
+    assert list(port.keys()) == ["name", "frames_tx", "speed"]
+    assert port.items() == [
+        ("name", "port1"),
+        ("frames_tx", None),
+        ("speed", 100),
+    ]
+    assert port["speed"] == 100
+    with pytest.raises(KeyError):
+        port["other"]
+    assert port == port.clone()
+    assert port != _LinkPort("port1", speed=10)
+    assert _LinkPort.from_object(port) == port
+
+
+def test_record_rejects_unknown_and_repeated_fields():
+    with pytest.raises(TypeError, match="unexpected fields other"):
+        _Port(other=1)
+    with pytest.raises(TypeError, match="repeated fields name"):
+        _Port("port1", name="port2")
+    with pytest.raises(TypeError, match="takes 2 fields"):
+        _Port(1, 2, 3)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import time
+
+from apis.traffic_generator import BgpConvergenceTracker
+from apis.utils import AttrDict
+
+
+class _Peers(object):
+    def __init__(self):
+        self.state = "up"
+
+    def get_bgpv4_stats(self):
+        return AttrDict(
+            dev1=AttrDict(session_state=self.state, routes_received=10)
+        )
+
+
+def test_tracker_samples_after_convergence():
+    peers = _Peers()
+    with BgpConvergenceTracker(peers, interval=0.01, plateau=0.05) as tracker:
+        assert tracker.wait(timeout=5)
+
+        peers.state = "down"
+        time.sleep(0.1)
+        assert tracker.report().not_converged == ["dev1"]
+
+        peers.state = "up"
+        time.sleep(0.2)
+
+    report = tracker.report()
+    assert report.converged == 1
+    states = [s for _, s in tracker.peers["dev1"].transitions]
+    assert states == ["up", "down", "up"]
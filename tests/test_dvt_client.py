@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+import pytest
+
+from apis.openwrt.errors import OpenwrtError
+
+
+class _Recorder(object):
+    """Answers "begin" and "body" with more input, "fail" with a failure."""
+
+    def __init__(self):
+        self.lines = list()
+        self.lock = threading.Lock()
+
+    def __call__(self, cmd):
+        from apis.openwrt.dvt.dvt_pb2 import PROCESS_FAILURE
+        from apis.openwrt.dvt.dvt_pb2 import PROCESS_MORE_INPUT
+        from apis.openwrt.dvt.dvt_pb2 import PROCESS_SUCCESS
+        from apis.openwrt.dvt.dvt_pb2 import ResultValue
+
+        with self.lock:
+            self.lines.append(cmd)
+        status = {
+            "begin": PROCESS_MORE_INPUT,
+            "body": PROCESS_MORE_INPUT,
+            "fail": PROCESS_FAILURE,
+        }.get(cmd, PROCESS_SUCCESS)
+        return ResultValue(status=status, isValid=True, output=cmd)
+
+
+@pytest.fixture
+def dvt():
+    from apis.openwrt.dvt.server import LocalDVTServicer
+    from apis.openwrt.dvt.server import serve
+
+    recorder = _Recorder()
+    server, target = serve(
+        LocalDVTServicer(responder=recorder, latency=0.05), max_workers=32
+    )
+    recorder.target = target
+    yield recorder
+    server.stop(None)
+
+
+def test_process_calls_overlap(dvt):
+    from apis.openwrt.dvt.client import DvtClient
+
+    client = DvtClient(dvt.target)
+    client.process("warm up")
+    threads = [
+        threading.Thread(target=client.process, args=(f"cmd {i}",))
+        for i in range(8)
+    ]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    client.close()
+
+    # 8 serialized calls take 0.4s
+    assert elapsed < 0.3
+
+
+def test_execute_sends_a_block_back_to_back(dvt):
+    from apis.openwrt.dvt.client import DvtClient
+
+    client = DvtClient(dvt.target)
+    stop = threading.Event()
+
+    def _spam():
+        while not stop.is_set():
+            client.process("other")
+
+    threads = [threading.Thread(target=_spam) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        result = client.execute("begin\nbody")
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    client.close()
+
+    assert result.output == ""
+    index = dvt.lines.index("begin")
+    assert dvt.lines[index:index + 3] == ["begin", "body", ""]
+
+
+def test_process_batch_keeps_order_and_checks(dvt):
+    from apis.openwrt.dvt.client import DvtClient
+
+    client = DvtClient(dvt.target)
+    cmds = ["a", "b", "begin\nbody", "c"]
+    results = client.process_batch(cmds, window=2)
+    assert [r.cmd for r in results] == cmds
+    assert [r.output for r in results] == ["a", "b", "", "c"]
+    assert client.process_many(["d"])[0].ok
+
+    with pytest.raises(OpenwrtError, match="command: fail"):
+        client.process_batch(["a", "fail", "b"])
+    assert not client.process_batch(["fail"], check=False)[0].ok
+    client.close()
+
+
+def test_async_process_batch_overlaps(dvt):
+    from apis.openwrt.dvt.client import AsyncDvtClient
+
+    async def _run():
+        async with AsyncDvtClient(dvt.target) as client:
+            await client.process("warm up")
+            start = time.monotonic()
+            results = await client.process_batch(
+                [f"cmd {i}" for i in range(8)] + ["begin\nbody"], window=8
+            )
+            return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(_run())
+
+    assert [r.cmd for r in results][-1] == "begin\nbody"
+    # 8 lines in flight at once, then the 3 lines of the block
+    assert elapsed < 0.35
+    index = dvt.lines.index("begin")
+    assert dvt.lines[index:index + 3] == ["begin", "body", ""]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from apis.openwrt.facts import FactCache
+from apis.openwrt.facts import facts_command
+from apis.openwrt.facts import probe_command
+
+
+class _Dut(object):
+    def __init__(self):
+        self.revision = "r1"
+        self.operstate = "up"
+        self.commands = list()
+
+    def run(self, cmd):
+        volatile = (
+            f"@@mspsuck@@system\n{{}}\n"
+            f"@@mspsuck@@links\neth0 aa {self.operstate}\n"
+        )
+        if cmd == probe_command():
+            self.commands.append("probe")
+            return f"@@mspsuck@@revision\n{self.revision}\n" + volatile
+        assert cmd == facts_command()
+        self.commands.append("facts")
+        return (
+            f"@@mspsuck@@release\nDISTRIB_REVISION='{self.revision}'\n"
+            "@@mspsuck@@cpus\n4\n" + volatile
+        )
+
+
+def test_persisted_facts_outlive_volatile_changes(tmp_path):
+    dut = _Dut()
+    cache = FactCache("dut1", dut.run, cache_dir=tmp_path)
+    assert cache.get().resources.cpus == 4
+
+    # port changes only drop the facts in memory
+    dut.operstate = "down"
+    cache.invalidate()
+    facts = cache.get()
+    assert facts.links.eth0.operstate == "down"
+    assert facts.resources.cpus == 4
+    assert dut.commands == ["probe", "facts", "probe"]
+
+    # a new firmware revision replaces the persisted facts
+    dut.revision = "r2"
+    cache.invalidate()
+    assert cache.get().revision == "r2"
+    assert dut.commands[-2:] == ["probe", "facts"]
+    assert [p.name for p in tmp_path.iterdir()] == ["dut1.json"]
+
+    cache.invalidate(persisted=True)
+    assert not list(tmp_path.iterdir())
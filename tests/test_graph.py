@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from apis.utils.graph import decimate
+
+
+def test_decimate_keeps_short_series():
+    x, y = np.arange(8), np.arange(8) * 2.0
+
+    for buckets in (0, -1, 4, 100):
+        dx, dy = decimate(x, y, buckets)
+        assert dx is x and dy is y
+
+
+@pytest.mark.parametrize("count, buckets", [(1000, 10), (9, 4), (10, 4)])
+def test_decimate_keeps_extremes_in_order(count, buckets):
+    rng = np.random.default_rng(0)
+    x = np.arange(count) * 0.5
+    y = rng.normal(size=count)
+
+    dx, dy = decimate(x, y, buckets)
+
+    assert len(dx) == len(dy) <= 2 * buckets
+    # every point is an original point, in the original order
+    assert np.all(np.diff(dx) >= 0)
+    assert np.array_equal(dy, y[(dx * 2).astype(int)])
+    assert dy.max() == y.max() and dy.min() == y.min()
+
+
+def test_decimate_takes_min_and_max_of_each_bucket():
+    y = np.array([0, 5, -1, 2, 7, 3, 3, 3, -4, 1], dtype=float)
+
+    dx, dy = decimate(np.arange(10), y, 2)
+
+    # [0, 5, -1, 2, 7] and [3, 3, 3, -4, 1]
+    assert dx.tolist() == [2, 4, 5, 8]
+    assert dy.tolist() == y[dx].tolist()
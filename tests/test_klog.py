@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+
+import pytest
+
+from apis.openwrt import klog
+
+
+class _Channel(object):
+    # the kernel log follower, recv blocks until `put` or close
+    def __init__(self):
+        self.received = queue.Queue()
+
+    def exec_command(self, command):
+        pass
+
+    def recv(self, size):
+        return self.received.get()
+
+    def exit_status_ready(self):
+        return False
+
+    def put(self, data):
+        self.received.put(data)
+
+
+class _Client(object):
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        return self.channel
+
+    def close(self):
+        self.channel.put(b"")
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    channel = _Channel()
+    monkeypatch.setattr(
+        klog.ssh, "connect", lambda *args, **kwargs: _Client(channel)
+    )
+    return channel
+
+
+def test_lines_of_a_command(channel):
+    tailer = klog.KernelLogTailer("dut1", "root")
+    channel.put(b"backlog\n")
+    tailer.start(backlog_quiet=0.05)
+
+    start = time.time()
+    channel.put(b"first\nsec")
+    channel.put(b"ond\n")
+    time.sleep(0.02)
+    end = time.time()
+    # logged by the command, received after it returned
+    threading.Timer(0.05, channel.put, (b"late\n",)).start()
+    assert tailer.lines(start, end, grace=1) == ["first", "second", "late"]
+
+    # without grace only the lines received until `end`
+    assert tailer.lines(start, end) == ["first", "second"]
+    after = time.time()
+    channel.put(b"after\n")
+    time.sleep(0.02)
+    assert tailer.lines(after) == ["after"]
+
+    # a closed tail does not wait for the grace
+    tailer.stop()
+    started = time.monotonic()
+    assert tailer.lines(start, grace=1)[-1] == "after"
+    assert time.monotonic() - started < 0.5
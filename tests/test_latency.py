@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import time
+
+from apis.traffic_generator import LatencyCollector
+from apis.utils import AttrDict
+
+
+def _stats(**flows):
+    # flow name -> average_ns, None for a flow without latency
+    return AttrDict(
+        {
+            name: AttrDict(
+                latency=AttrDict(
+                    minimum_ns=avg - 10, average_ns=avg, maximum_ns=avg + 10
+                )
+                if avg
+                else None
+            )
+            for name, avg in flows.items()
+        }
+    )
+
+
+class _Generator(object):
+    def __init__(self):
+        self.count = 0
+
+    def get_flow_stats(self):
+        self.count += 1
+        return _stats(f1=100 + self.count % 2, f2=None)
+
+
+def test_summary_and_outliers():
+    collector = LatencyCollector(None, flows=["f1", "f2", "f3"], capacity=2)
+    for avg in (100, 102, 100, 102, 100, 5000, 100):
+        collector.sample(_stats(f1=avg, f2=None))
+
+    summary = collector.summary()
+    assert collector.samples == 7
+    assert summary["f1"].samples == 7
+    assert summary["f1"].min == 90
+    assert summary["f1"].max == 5010
+    assert summary["f1"].p50 == 100
+    assert summary["f2"].samples == summary["f3"].samples == 0
+    assert summary["f2"].avg is None
+    assert collector.outliers() == {"f1": [(collector.times[5], 5000.0)]}
+    assert collector.series("f1").avg.tolist()[-2:] == [5000, 100]
+
+
+def test_sampling_in_background():
+    tg = _Generator()
+    with LatencyCollector(tg, interval=0.01) as collector:
+        time.sleep(0.2)
+        # read while the sampler appends
+        for _ in range(100):
+            series = collector.series("f1")
+            assert len(series.times) == len(series.avg)
+
+    assert collector.names == ["f1", "f2"]
+    assert collector.samples == tg.count
+    summary = collector.summary()
+    assert summary["f1"].min == 90
+    assert summary["f1"].max == 111
+    assert summary["f2"].samples == 0
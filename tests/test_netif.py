@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import socket
+import struct
+
+import pytest
+
+from apis.utils import netif
+from apis.utils.functions import get_host_ips
+
+
+def _attr(kind, value):
+    length = 4 + len(value)
+    return struct.pack("=HH", length, kind) + value + b"\0" * (-length % 4)
+
+
+def _message(kind, body):
+    return struct.pack("=LHHLL", 16 + len(body), kind, 0x2, 1, 0) + body
+
+
+def _address(family, prefixlen, scope, index, *attrs):
+    return _message(
+        20,
+        struct.pack("=BBBBI", family, prefixlen, 0, scope, index)
+        + b"".join(attrs),
+    )
+
+
+class _Socket(object):
+    # replies the canned dump, one datagram per recv
+    def __init__(self, datagrams):
+        self.datagrams = list(datagrams)
+        self.sent = list()
+
+    def bind(self, address):
+        pass
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def recv(self, size):
+        return self.datagrams.pop(0)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def dump(monkeypatch):
+    def _dump(*datagrams):
+        sock = _Socket(datagrams)
+        monkeypatch.setattr(netif.socket, "socket", lambda *args: sock)
+        monkeypatch.setattr(
+            netif.socket, "if_nameindex", lambda: [(1, "lo"), (2, "eth0")]
+        )
+        return sock
+
+    return _dump
+
+
+def test_addresses_of_a_dump(dump):
+    local = socket.inet_pton(socket.AF_INET, "192.168.1.10")
+    peer = socket.inet_pton(socket.AF_INET, "10.0.0.1")
+    link = socket.inet_pton(socket.AF_INET6, "fe80::1")
+    sock = dump(
+        # IFA_LOCAL is preferred over the peer address of IFA_ADDRESS
+        _address(2, 24, 0, 2, _attr(1, peer), _attr(2, local))
+        + _address(10, 64, 253, 2, _attr(1, link)),
+        # an interface missing in if_nameindex is named by its label
+        _address(2, 8, 254, 9, _attr(1, peer), _attr(3, b"ppp0\0"))
+        + _message(3, b"\0" * 4),
+    )
+
+    addresses = netif.local_addresses()
+
+    assert [
+        (a.interface, a.address, a.prefixlen, a.ip_type, a.scope)
+        for a in addresses
+    ] == [
+        ("eth0", "192.168.1.10", 24, "ipv4", "global"),
+        ("eth0", "fe80::1", 64, "ipv6", "link"),
+        ("ppp0", "10.0.0.1", 8, "ipv4", "host"),
+    ]
+    # an RTM_GETADDR dump request of all families
+    assert struct.unpack_from("=LHH", sock.sent[0]) == (24, 22, 0x301)
+
+
+def test_dump_errors(dump):
+    dump(_message(2, struct.pack("=i", -1)))
+    with pytest.raises(OSError) as info:
+        netif.local_addresses("ipv4")
+    assert info.value.errno == 1
+
+
+class _AdHoc(object):
+    # dut1 has eth0 in `network`
+    def __init__(self, network):
+        self.network = network
+
+    def run(self, hosts, module_name, **kwargs):
+        address, netmask = self.network.split("/")
+        eth0 = dict(ipv4=dict(address=address, netmask=netmask))
+        return dict(dut1=dict(ansible_facts=dict(ansible_eth0=eth0)))
+
+
+def test_host_ips_of_each_adhoc(dump):
+    local = socket.inet_pton(socket.AF_INET, "192.168.1.10")
+    dump(*[_address(2, 24, 0, 2, _attr(2, local)) + _message(3, b"")] * 2)
+
+    adhoc = _AdHoc("192.168.1.1/255.255.255.0")
+    assert get_host_ips(adhoc) == ["192.168.1.10"]
+    # a new AdHoc may reuse the address of the freed one
+    del adhoc
+    adhoc = _AdHoc("10.0.0.1/255.0.0.0")
+    assert get_host_ips(adhoc) == []
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+import pytest
+
+from apis.openwrt.netns import FramedShell
+
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    # a dmesg printing the file `ring`, it counts its calls in `calls`
+    ring = tmp_path / "ring"
+    ring.write_text("boot\n")
+    dmesg = tmp_path / "dmesg"
+    dmesg.write_text(f"#!/bin/sh\necho >>{tmp_path}/calls\ncat {ring}\n")
+    dmesg.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return ring
+
+
+def test_frames_of_commands(ring):
+    shell = FramedShell(["sh"])
+    try:
+        result = shell.run(f"echo out; echo err >&2; echo new >>{ring}")
+        assert result == dict(
+            rc=0, stdout="out\n", stderr="err\n", kernel_log="new\n"
+        )
+        assert shell.run("exit_code() { return 3; }; exit_code").rc == 3
+        assert shell.run("true").kernel_log == ""
+
+        # the ring buffer wrapped, the lines after the last mark are kept
+        result = shell.run(f"printf 'new\\nwrapped\\n' >{ring}")
+        assert result.kernel_log == "wrapped\n"
+        assert shell.run("true").kernel_log == ""
+        # one dmesg per command, and one when the shell started
+        assert (ring.parent / "calls").read_text().count("\n") == 6
+    finally:
+        shell.close()
+
+
+def test_timeout_kills_the_shell(ring):
+    shell = FramedShell(["sh"])
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            shell.run("while :; do :; done", timeout=0.2)
+        assert time.monotonic() - started < 0.8
+        assert not shell.alive
+
+        assert shell.run("echo again").stdout == "again\n"
+    finally:
+        shell.close()
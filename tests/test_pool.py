@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pytest
+
+from apis.traffic_generator.pool import SessionPool
+
+
+@pytest.fixture
+def pool(snappi_api, setting):
+    return SessionPool(setting, [["port1", "port2"]])
+
+
+def test_call_forwards_allowed_methods_only(pool):
+    pool.lease("gw0")
+    assert pool.call("gw0", "get_capture_names", "port1") == []
+    for name in ("get_flow", "teardown", "config"):
+        with pytest.raises(AttributeError, match=name):
+            pool.call("gw0", name)
+
+
+def test_lease_of_a_gone_process_is_released(pool):
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    pool.lease("gw0", pid=proc.pid)
+
+    assert pool.lease("gw1", timeout=5) == ["port1", "port2"]
+    assert list(pool.leases()) == ["gw1"]
+
+
+def test_lease_times_out_while_the_owner_is_alive(pool):
+    pool.lease("gw0", pid=os.getpid())
+    with pytest.raises(TimeoutError):
+        pool.lease("gw1", timeout=0.1)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from apis.traffic_generator import FixedSize
+from apis.traffic_generator import Flow
+from apis.traffic_generator import PortTxRx
+from apis.traffic_generator import ThroughputTest
+from apis.utils import AttrDict
+
+
+class _Generator(object):
+    # frames are lost above `limits[frame size]` percent of line rate
+    def __init__(self, limits):
+        self.limits = limits
+        self.flows = None
+        self.rate = None
+        self.size = None
+        self.tx = 0
+        self.rx = 0
+
+    def set_flows(self, flows):
+        self.flows = flows
+
+    def apply_config(self):
+        pass
+
+    def update_flows(self, *names, rate=None, size=None):
+        if rate is not None:
+            self.rate = rate.percentage
+        if size is not None:
+            self.size = size.fixed
+
+    def start_transmit(self):
+        self.tx += 1000
+        self.rx += 1000 if self.rate <= self.limits[self.size] else 990
+
+    def is_transmit_stopped(self):
+        return True
+
+    def get_flow_stats(self):
+        return AttrDict(f1=AttrDict(frames_tx=self.tx, frames_rx=self.rx))
+
+
+def test_search_finds_the_zero_loss_rate():
+    tg = _Generator({64: 30, 1518: 100})
+    flow = Flow("f1", PortTxRx("port1", "port2"), size=FixedSize(128))
+    test = ThroughputTest(
+        tg, flow, frame_sizes=[64, 1518], duration=0, resolution=1, settle=0
+    )
+
+    results = test.run()
+
+    assert [r.frame_size for r in results] == [64, 1518]
+    assert 29 <= results[0].rate <= 30
+    assert [t.rate for t in results[0].trials][:3] == [100, 50, 25]
+    assert results[1].rate == 100
+    assert len(results[1].trials) == 1
+    assert all(not t.passed for t in results[0].trials if t.rate > 30)
+
+    # copies are pushed, the caller's flow is untouched
+    assert tg.flows[0] is not flow
+    assert tg.flows[0].size.fixed == 64
+    assert flow.size.fixed == 128
+    assert "rate" not in flow and "duration" not in flow
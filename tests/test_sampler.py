@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from apis.utils import PeriodicSampler
+from apis.utils import SampleBuffer
+
+
+def test_sampler_keeps_the_period():
+    calls = list()
+
+    def _sample():
+        calls.append(time.monotonic())
+        # slower than half of the interval, the period must not drift
+        time.sleep(0.006)
+
+    sampler = PeriodicSampler(_sample, 0.01)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+
+    assert 25 <= len(calls) <= 32
+
+
+def test_sampler_raises_the_error_of_func():
+    def _sample():
+        raise ValueError("no stats")
+
+    sampler = PeriodicSampler(_sample, 0.01)
+    sampler.start()
+    # returns once the thread died instead of after 5 seconds
+    started = time.monotonic()
+    sampler.wait(5)
+    assert time.monotonic() - started < 1
+    with pytest.raises(ValueError, match="no stats"):
+        sampler.stop()
+
+
+def test_buffer_grows():
+    buf = SampleBuffer(2, 3, capacity=2)
+    for i in range(5):
+        buf.append([[i] * 3, [-i] * 3], i / 10)
+
+    assert buf.data.shape == (2, 5, 3)
+    assert buf.times.tolist() == [0.0, 0.1, 0.2, 0.3, 0.4]
+    assert buf.last().tolist() == [[4] * 3, [-4] * 3]
+    assert SampleBuffer(1, 1).last() is None
+
+
+def test_snapshot_is_consistent_while_appending():
+    buf = SampleBuffer(1, 1, capacity=1)
+    done = threading.Event()
+
+    def _append():
+        for i in range(20000):
+            buf.append([[i]], i)
+        done.set()
+
+    thread = threading.Thread(target=_append)
+    thread.start()
+    while not done.is_set():
+        data, times = buf.snapshot()
+        # the buffer grows under the reader, both arrays are of one size
+        assert data.shape[1] == times.shape[0]
+        assert (data[0, :, 0] == times).all()
+    thread.join()
+
+    assert len(buf.snapshot()[1]) == 20000
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from apis.traffic_generator import DutCounters
+from apis.traffic_generator import SoakRunner
+from apis.utils import SeriesReader
+from apis.utils import SeriesWriter
+
+
+class _Dut(object):
+    name = "dut1"
+
+    def __init__(self):
+        self.output = "rx_packets 1"
+
+    def shell(self, cmd):
+        return self.output, ""
+
+
+def test_writer_rejects_unknown_columns(tmp_path):
+    with SeriesWriter(tmp_path / "s.bin", ["time", "a"]) as writer:
+        writer.append(dict(time=1, a=2))
+        with pytest.raises(ValueError, match="unknown columns b"):
+            writer.append(dict(time=2, b=3))
+
+    assert SeriesReader(tmp_path / "s.bin")["a"].tolist() == [2]
+
+
+def test_soak_runner_drops_and_declares_columns(tmp_path):
+    dut = _Dut()
+    runner = SoakRunner(
+        tmp_path / "soak.bin",
+        counters=[DutCounters(dut, "cat stats")],
+        columns=["dut.dut1.tx_packets"],
+    )
+    runner.sample()
+    dut.output = "rx_packets 2\ntx_packets 3\nerrors 4"
+    runner.sample()
+    runner.stop()
+
+    series = runner.reader()
+    assert series["dut.dut1.rx_packets"].tolist() == [1, 2]
+    assert series["dut.dut1.tx_packets"].tolist()[1] == 3
+    assert runner.dropped == {"dut.dut1.errors"}
+
+    # a run after stop() writes a new file
+    runner.run(0.05)
+    assert 1 <= len(runner.reader()) <= 2
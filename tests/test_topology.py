@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from apis.openwrt.device import Dut
+from apis.openwrt.errors import OpenwrtError
+from apis.openwrt.topology import init_duts
+from apis.utils import AttrDict
+
+
+class _AdHoc(object):
+    # answers raw commands of many hosts by one call, `down` is unreachable
+    group_vars = dict()
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.runs = list()
+
+    def run_each(self, hosts, module_name, cmd, forks=None):
+        self.runs.append((list(hosts), forks))
+        results = AttrDict()
+        for host in hosts:
+            if host in self.down:
+                results[host] = AttrDict(
+                    ok=False, failed=True, unreachable=True, msg="no route"
+                )
+            else:
+                results[host] = AttrDict(
+                    ok=True,
+                    failed=False,
+                    stdout=f"@@mspsuck@@release\nDISTRIB_ID='{host}'\n",
+                )
+        return results
+
+
+def _duts(adhoc, *names):
+    return [
+        Dut(
+            adhoc,
+            AttrDict(
+                name=name,
+                vars=dict(ansible_host="192.168.1.1", klog_stream=False),
+            ),
+            [],
+        )
+        for name in names
+    ]
+
+
+def test_facts_of_all_duts_are_gathered_by_one_run():
+    adhoc = _AdHoc()
+    duts = _duts(adhoc, "dut3", "dut1", "dut2")
+
+    report = init_duts(duts, max_workers=2)
+
+    assert [r.name for r in report] == ["dut3", "dut1", "dut2"]
+    assert all(r.error is None and r.seconds >= 0 for r in report)
+    assert [d.facts.release.DISTRIB_ID for d in duts] == [
+        "dut3",
+        "dut1",
+        "dut2",
+    ]
+    # the facts are in memory, one run for all DUTs by `max_workers` forks
+    assert adhoc.runs == [(["dut3", "dut1", "dut2"], 2)]
+
+
+def test_failures_are_reported_in_order():
+    adhoc = _AdHoc(down=["dut2"])
+    duts = _duts(adhoc, "dut1", "dut2", "dut3")
+
+    with pytest.raises(OpenwrtError, match="dut2 is unreachable") as info:
+        init_duts(duts)
+
+    assert [(r.name, r.error is None) for r in info.value.report] == [
+        ("dut1", True),
+        ("dut2", False),
+        ("dut3", True),
+    ]
+    assert adhoc.runs == [(["dut1", "dut2", "dut3"], 3)]
+
+    with pytest.raises(OpenwrtError) as info:
+        init_duts(_duts(adhoc, "dut1", "dut2"), fail_fast=True)
+    assert info.value.report[0].error == "skipped after a failure"
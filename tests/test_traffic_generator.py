@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from apis.traffic_generator import Capture
+from apis.traffic_generator import FixedSize
+from apis.traffic_generator import Flow
+from apis.traffic_generator import PortTxRx
+
+
+def _flows():
+    return [
+        Flow("f1", PortTxRx("port1", "port2"), size=FixedSize(128)),
+        Flow("f2", PortTxRx("port2", "port1"), size=FixedSize(256)),
+    ]
+
+
+def test_lookups_follow_the_applied_config(tg):
+    tg.set_flows(_flows())
+    tg.apply_config()
+    stale = tg.get_flow("f1")
+
+    # only captures change, flows are deserialized again into a new config
+    tg.set_captures([Capture("c1", ["port1"])])
+    tg.apply_config()
+
+    flow = tg.get_flow("f1")
+    assert flow is not stale
+    assert flow.size.fixed == 128
+    assert tg.get_flow_ports("f2") == (["port2"], ["port1"])
+    assert tg.get_capture_names("port1") == ["c1"]
+    assert tg.get_port("port2").location == "10.0.0.1;1;2"
+
+
+def test_batch_flushes_before_reading_the_config(tg, snappi_api):
+    with tg.batch():
+        tg.set_flows(_flows())
+        tg.apply_config()
+        assert tg.get_flow("f2").size.fixed == 256
+
+    assert [n for n, _ in snappi_api.calls].count("set_config") == 2
+
+
+def test_batch_starts_capture_before_transmit(tg, snappi_api):
+    del snappi_api.calls[:]
+    with tg.batch():
+        tg.start_protocol()
+        tg.start_traffic(_flows(), [Capture("c1", ["port1"])])
+
+    assert [(n, c.get("state")) for n, c in snappi_api.calls] == [
+        ("set_config", None),
+        ("set_capture_state", "start"),
+        ("set_transmit_state", "start"),
+    ]
+
+
+def test_update_flows_pushes_the_applied_config(tg, snappi_api):
+    flows = _flows()
+    tg.set_flows(flows)
+    tg.apply_config()
+    tg.apply_config()
+
+    tg.update_flows("f1", size=FixedSize(512))
+
+    name, pushed = snappi_api.calls[-1]
+    assert name == "set_config"
+    assert [f["size"]["fixed"] for f in pushed["flows"]] == [512, 256]
+    assert tg.get_flow("f1").size.fixed == 512
+    assert flows[0].size.fixed == 128
+
+    # the update is kept by the next apply
+    tg.apply_config()
+    assert tg.get_flow("f1").size.fixed == 512
+
+
+def _devices():
+    return [
+        {
+            "name": "dev1",
+            "container_name": "port1",
+            "ethernet": {
+                "name": "dev1_eth",
+                "mac": "00:00:00:00:00:01",
+                "ipv4": {
+                    "name": "dev1_ipv4",
+                    "address": "1.1.1.1",
+                    "gateway": "1.1.1.2",
+                    "prefix": 24,
+                },
+            },
+        },
+    ]
+
+
+def _protocol_starts(calls):
+    return [n for n, c in calls if c.get("state") == "start"]
+
+
+def test_send_pings_starts_protocols_once(tg, snappi_api):
+    tg.set_devices(_devices())
+    tg.apply_config()
+
+    rows = tg.send_pings([("dev1", "1.1.1.2")])
+    assert rows == [
+        {
+            "device": "dev1",
+            "src_name": "dev1_ipv4",
+            "dst_ip": "1.1.1.2",
+            "result": "success",
+        }
+    ]
+    assert _protocol_starts(snappi_api.calls) == ["set_transmit_state"]
+
+    # protocols are still up
+    tg.send_pings([("dev1", "1.1.1.2")])
+    assert _protocol_starts(snappi_api.calls) == ["set_transmit_state"]
+
+    tg.send_pings([("dev1", "1.1.1.2")], restart_protocol=True)
+    assert len(_protocol_starts(snappi_api.calls)) == 2
+
+
+def test_send_pings_restarts_protocols_stopped_by_transmit(tg, snappi_api):
+    tg.set_devices(_devices())
+    tg.send_pings([("dev1", "1.1.1.2")])
+
+    # without ixnetwork, stopping transmit stops protocols as well
+    tg.stop_transmit()
+    tg.send_pings([("dev1", "1.1.1.2")])
+
+    assert [n for n, _ in snappi_api.calls][-3:] == [
+        "set_config",
+        "set_transmit_state",
+        "send_ping",
+    ]
+    assert len(_protocol_starts(snappi_api.calls)) == 2
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import io
+
+import numpy as np
+import pytest
+
+from apis.openwrt.wireless import WirelessMetric
+from apis.openwrt.wireless import WirelessPoller
+
+_OUTPUT = b"""@@sample 10.00
+@@metric 0
+sta1 -40
+sta2 -60
+@@metric 1
+raw output
+@@end
+@@sample 10.10
+@@metric 0
+sta2 -61
+@@metric 1
+raw output
+@@end
+"""
+
+
+class _Channel(object):
+    closed = False
+
+    def exec_command(self, command):
+        self.command = command
+
+    def shutdown_write(self):
+        pass
+
+    def makefile(self, mode):
+        return io.BytesIO(_OUTPUT)
+
+    def close(self):
+        self.closed = True
+
+
+class _Dut(object):
+    name = "dut1"
+
+    def __init__(self):
+        self.channel = _Channel()
+        self.ssh = self
+
+    def put_script(self, script, name):
+        return f"/tmp/{name}"
+
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        return self.channel
+
+
+def _parse(output):
+    return [
+        dict(zip(("STATION", "SIGNAL"), line.split()))
+        for line in output.splitlines()
+    ]
+
+
+def test_series_of_parsed_metrics():
+    dut = _Dut()
+    metrics = [
+        WirelessMetric("stations", "iw dev", parse=_parse),
+        WirelessMetric("ple", "iwpriv rax0 show pleinfo", klog=True),
+    ]
+    with WirelessPoller(dut, metrics, interval=0.1) as poller:
+        pass
+
+    assert dut.channel.command == "sh /tmp/wireless_poller.sh 100000"
+    times, values = poller.series("stations", "SIGNAL", ("STATION", "sta1"))
+    assert times.tolist() == [10.0, 10.1]
+    assert values[0] == -40 and np.isnan(values[1])
+    assert poller.series("stations", "SIGNAL")[1].tolist() == [-40, -61]
+
+    assert poller.samples("ple")[0].rows == "raw output"
+    with pytest.raises(ValueError, match="not parsed"):
+        poller.series("ple", "SIGNAL")